@@ -0,0 +1,240 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Literal
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+Priority = Literal["interactive", "batch"]
+
+# 调度顺序：交互式请求永远优先于批量请求
+PRIORITIES = ("interactive", "batch")
+
+
+class AdmissionTicket:
+    """一次已准入的请求，处理结束时必须 release (可重复调用)"""
+
+    def __init__(self, controller: "AdmissionController", key: str, priority: str):
+        self.controller = controller
+        self.key = key
+        self.priority = priority
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    入站准入控制
+    - 有界队列：并发满时排队，队列满 / 预计等待过长时立即 429 (Retry-After 基于实测服务时间)
+    - 优先级：interactive 先于 batch 调度；队列满时交互请求可以挤掉排队中的批量请求
+    - 公平性：同一优先级内按 key (租户或 thread_id) 轮询，并限制单个 key 的并发 + 排队数
+    """
+
+    def __init__(self,
+                 max_concurrency: int,
+                 max_queue: int,
+                 max_queue_wait: float,
+                 max_per_key: int,
+                 initial_service_time: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.max_per_key = max_per_key
+        self.active = 0
+        # priority -> key -> 排队中的 future (OrderedDict 实现按 key 轮询)
+        self._waiters: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+        self._per_key: Dict[str, int] = {}
+        # 单个请求服务时间的 EWMA (秒)
+        self._service_time = initial_service_time
+
+    # ---------------- 查询 ----------------
+
+    def queued(self, priority: str = None) -> int:
+        priorities = (priority,) if priority else PRIORITIES
+        return sum(len(q) for p in priorities for q in self._waiters[p].values())
+
+    def estimate_wait(self, priority: str) -> float:
+        """预计排队时间 (秒) = 前方排队数 × 平均服务时间 / 并发数"""
+        if self.active < self.max_concurrency and not self.queued():
+            return 0.0
+        # 交互请求只需要等前面的交互请求，批量请求要等所有人
+        ahead = self.queued("interactive") if priority == "interactive" else self.queued()
+        return (ahead + 1) * self._service_time / self.max_concurrency
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queued": {p: self.queued(p) for p in PRIORITIES},
+            "max_queue": self.max_queue,
+            "service_time_ms": round(self._service_time * 1000, 1),
+            "keys": len(self._per_key),
+        }
+
+    # ---------------- 准入 ----------------
+
+    def _reject(self, priority: str, reason: str, wait: float = None):
+        retry_after = max(1, math.ceil(wait if wait is not None else self.estimate_wait(priority)))
+        metrics.inc("admission_rejected_total", priority=priority, reason=reason)
+        logger.warning(f"🚦 请求被拒绝 (priority={priority}, reason={reason}, retry_after={retry_after}s)")
+        raise HTTPException(
+            status_code=429,
+            detail=f"Server overloaded ({reason})",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+    def _report(self):
+        metrics.set_gauge("admission_inflight", self.active)
+        for p in PRIORITIES:
+            metrics.set_gauge("admission_queue_depth", self.queued(p), priority=p)
+
+    def _evict_batch(self) -> bool:
+        """队列已满时，为交互请求挤掉最新排队的批量请求"""
+        batch = self._waiters["batch"]
+        for key in reversed(list(batch.keys())):
+            queue = batch[key]
+            while queue:
+                fut = queue.pop()
+                if not fut.done():
+                    fut.set_exception(HTTPException(
+                        status_code=429,
+                        detail="Server overloaded (preempted)",
+                        headers={"Retry-After": str(max(1, math.ceil(self.estimate_wait("batch"))))}
+                    ))
+                    metrics.inc("admission_rejected_total", priority="batch", reason="preempted")
+                    if not queue:
+                        del batch[key]
+                    return True
+            del batch[key]
+        return False
+
+    async def admit(self, key: str, priority: str = "interactive") -> AdmissionTicket:
+        """
+        申请准入，返回 AdmissionTicket；过载时抛出 429
+        """
+        if not settings.ADMISSION_ENABLED:
+            return AdmissionTicket(self, key, priority)
+
+        if self._per_key.get(key, 0) >= self.max_per_key:
+            self._reject(priority, "per_key_limit")
+
+        # 1. 有空闲并发且无人排队：直接放行
+        if self.active < self.max_concurrency and not self.queued():
+            return self._grant(key, priority)
+
+        # 2. 提前削峰：队列满 / 预计等待超出上限
+        if self.queued() >= self.max_queue:
+            if not (priority == "interactive" and self._evict_batch()):
+                self._reject(priority, "queue_full")
+        wait = self.estimate_wait(priority)
+        if wait > self.max_queue_wait:
+            self._reject(priority, "predicted_wait", wait)
+
+        # 3. 排队等待
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(key, deque()).append(fut)
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        self._report()
+        enqueued = time.monotonic()
+
+        try:
+            await asyncio.wait({fut}, timeout=self.max_queue_wait)
+        except asyncio.CancelledError:
+            self._abandon(key, priority, fut)
+            raise
+
+        if not fut.done():
+            self._abandon(key, priority, fut)
+            self._reject(priority, "queue_timeout")
+        if fut.exception() is not None:
+            self._abandon(key, priority, fut)
+            raise fut.exception()
+
+        metrics.observe("admission_queue_wait_seconds", time.monotonic() - enqueued, priority=priority)
+        return AdmissionTicket(self, key, priority)
+
+    def _grant(self, key: str, priority: str) -> AdmissionTicket:
+        self.active += 1
+        self._per_key[key] = self._per_key.get(key, 0) + 1
+        self._report()
+        return AdmissionTicket(self, key, priority)
+
+    def _abandon(self, key: str, priority: str, fut: asyncio.Future):
+        """排队者离开 (超时 / 取消 / 被挤掉)"""
+        if fut.done() and not fut.cancelled() and fut.exception() is None:
+            # 已经被放行，占用的名额要还回去
+            self.active -= 1
+        else:
+            fut.cancel()
+            queue = self._waiters[priority].get(key)
+            if queue and fut in queue:
+                queue.remove(fut)
+                if not queue:
+                    del self._waiters[priority][key]
+        self._dec_key(key)
+        self._dispatch()
+
+    def _dec_key(self, key: str):
+        remaining = self._per_key.get(key, 0) - 1
+        if remaining > 0:
+            self._per_key[key] = remaining
+        else:
+            self._per_key.pop(key, None)
+
+    def _release(self, ticket: AdmissionTicket):
+        if not settings.ADMISSION_ENABLED:
+            return
+        elapsed = time.monotonic() - ticket.started
+        self._service_time = 0.9 * self._service_time + 0.1 * elapsed
+        metrics.observe("admission_service_seconds", elapsed, priority=ticket.priority)
+        self.active -= 1
+        self._dec_key(ticket.key)
+        self._dispatch()
+
+    def _dispatch(self):
+        """按优先级 + key 轮询放行排队者"""
+        while self.active < self.max_concurrency:
+            fut = self._next_waiter()
+            if fut is None:
+                break
+            self.active += 1
+            fut.set_result(True)
+        self._report()
+
+    def _next_waiter(self):
+        for priority in PRIORITIES:
+            waiters = self._waiters[priority]
+            while waiters:
+                key, queue = next(iter(waiters.items()))
+                fut = queue.popleft()
+                # 轮询：本 key 还有排队者则移到队尾
+                if queue:
+                    waiters.move_to_end(key)
+                else:
+                    del waiters[key]
+                if not fut.done():
+                    return fut
+        return None
+
+
+# --- 单例导出 ---
+admission_controller = AdmissionController(
+    max_concurrency=settings.ADMISSION_MAX_CONCURRENCY,
+    max_queue=settings.ADMISSION_MAX_QUEUE,
+    max_queue_wait=settings.ADMISSION_MAX_QUEUE_WAIT_MS / 1000,
+    max_per_key=settings.ADMISSION_MAX_PER_KEY,
+    initial_service_time=settings.ADMISSION_INITIAL_SERVICE_MS / 1000,
+)
+
+__all__ = ["admission_controller", "AdmissionTicket", "Priority"]
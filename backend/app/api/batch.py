@@ -0,0 +1,151 @@
+import asyncio
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+from fastapi import HTTPException
+from langchain_core.messages import HumanMessage
+
+from app.api.admission import admission_controller
+from app.api.schemas import BatchChatItem, BatchChatResult
+from app.core.deadline import Deadline
+from app.core.graph import app as agent_app, memory
+from app.core.logger import logger, correlation_id
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+from app.core.profiler import sampling_profiler
+from app.services.limiter import request_class
+from app.services.singleflight import normalize_key
+
+BATCH_PRIORITY = "batch"
+
+
+async def _admit_with_retry(key: str):
+    """批量任务不怕等：被 429 拒绝时按 Retry-After 等待后重试，而不是失败"""
+    while True:
+        try:
+            return await admission_controller.admit(key, BATCH_PRIORITY)
+        except HTTPException as e:
+            if e.status_code != 429:
+                raise
+            await asyncio.sleep(float((e.headers or {}).get("Retry-After", 1)))
+
+
+def _forget_thread(thread_id: str):
+    """一次性会话跑完后从 checkpointer 中删除，避免夜间任务把内存撑爆"""
+    delete_thread = getattr(memory, "delete_thread", None)
+    if delete_thread is not None:
+        delete_thread(thread_id)
+
+
+async def run_item(item: BatchChatItem, batch_id: str, admission_key: Optional[str] = None) -> BatchChatResult:
+    """
+    执行单条查询，记录各节点耗时
+    admission_key: 准入公平调度的键 (租户或批次)，同一批的条目共用一个键，大批量不会挤占其他租户
+    """
+    request_class.set(BATCH_PRIORITY)
+    ephemeral = item.thread_id is None
+    thread_id = item.thread_id or f"batch-{batch_id}-{item.id}"
+    deadline = Deadline.for_request(item.latency_budget_ms)
+    config = {"configurable": {"thread_id": thread_id, "deadline": deadline, "search_mode": item.search_mode}}
+    inputs = {"query": item.query, "messages": [HumanMessage(content=item.query)]}
+
+    root = tracer.start_trace("chat.batch", thread_id=thread_id, item_id=item.id, batch_id=batch_id)
+    tracer.activate(root)
+    trace_id = root.trace.trace_id if root else None
+    correlation_id.set(trace_id or uuid.uuid4().hex)
+    status = "error"
+
+    start = time.perf_counter()
+    ticket = await _admit_with_retry(admission_key or f"batch-{batch_id}")
+    timings = {"queued_ms": round((time.perf_counter() - start) * 1000, 1)}
+    state: Dict = {}
+
+    try:
+        last = time.perf_counter()
+        async for event in agent_app.astream(inputs, config=config):
+            for node_name, state_update in event.items():
+                now = time.perf_counter()
+                timings[f"{node_name}_ms"] = round((now - last) * 1000, 1)
+                last = now
+                state.update(state_update or {})
+
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        metrics.inc("batch_items_total", status="ok")
+        status = "ok"
+        return BatchChatResult(
+            id=item.id,
+            answer=state.get("answer", ""),
+            sources=state.get("entities", []),
+            validation_status=state.get("validation_status", "unknown"),
+            degradations=deadline.degradations,
+            timings=timings,
+            trace_id=trace_id,
+        )
+    except Exception as e:
+        logger.error(f"❌ [BATCH] 条目 {item.id} 执行失败: {e}")
+        metrics.inc("batch_items_total", status="error")
+        timings["total_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return BatchChatResult(id=item.id, timings=timings, trace_id=trace_id, error=str(e))
+    finally:
+        ticket.release()
+        tracer.finish(root, status)
+        sampling_profiler.request_finished()
+        if ephemeral:
+            _forget_thread(thread_id)
+
+
+async def run_batch(items: List[BatchChatItem], concurrency: int,
+                    tenant: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    以有限并发执行一批查询，按完成顺序逐行产出 JSONL
+
+    - 同一 thread_id 的条目是同一会话的多轮，按输入顺序依次执行 (同一会话的 checkpointer 线程不能并发写)
+    - 没有 thread_id 的重复查询 (归一化后相同) 只执行一次，结果复制给其余条目
+    - 有重叠的查询通过检索层 single-flight / 微批处理共享抽取与检索
+    - 生成器被关闭 (客户端断开) 时取消所有未完成的条目
+    - 准入以租户 (未提供时为批次) 为键，整批与其他租户轮转调度
+    条目 id 需在批内唯一 (由接口层校验)
+    """
+    batch_id = uuid.uuid4().hex[:8]
+    admission_key = tenant or f"batch-{batch_id}"
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # 分组：key -> 条目列表 (保持输入顺序)
+    groups: Dict[tuple, List[BatchChatItem]] = {}
+    for item in items:
+        key = ("thread", item.thread_id) if item.thread_id else ("query", normalize_key(item.query), item.search_mode)
+        groups.setdefault(key, []).append(item)
+
+    async def _run_shared(members: List[BatchChatItem]) -> List[BatchChatResult]:
+        """重复查询：组内第一个条目执行，结果复制给其余条目"""
+        async with semaphore:
+            leader = await run_item(members[0], batch_id, admission_key)
+        results = [leader]
+        for member in members[1:]:
+            results.append(leader.model_copy(update={"id": member.id, "shared_with": leader.id}))
+        return results
+
+    async def _run_thread(members: List[BatchChatItem]) -> List[BatchChatResult]:
+        """同一会话的多轮：逐条执行，每轮单独占用并发名额"""
+        results = []
+        for member in members:
+            async with semaphore:
+                results.append(await run_item(member, batch_id, admission_key))
+        return results
+
+    logger.info(f"📦 [BATCH] {batch_id}: {len(items)} 条，分组后 {len(groups)} 组，并发 {concurrency}")
+    tasks = [
+        asyncio.ensure_future(_run_thread(members) if key[0] == "thread" else _run_shared(members))
+        for key, members in groups.items()
+    ]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            for result in await next_done:
+                yield result.model_dump_json() + "\n"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+__all__ = ["run_batch", "run_item"]
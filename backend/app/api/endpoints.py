@@ -1,44 +1,156 @@
 import json
-from fastapi import APIRouter, HTTPException
+import time
+import uuid
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Query
 from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from langchain_core.messages import HumanMessage
+from pydantic import ValidationError
 
-from app.api.schemas import ChatRequest, ChatResponse
+from app.api.schemas import ChatRequest, ChatResponse, BatchChatItem
+from app.api.batch import run_batch
+from app.api.admission import admission_controller, AdmissionTicket
 from app.core.graph import app as agent_app # 导入你编排好的图
-from app.core.logger import logger
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.logger import logger, correlation_id
+from app.core.metrics import metrics
+from app.core.startup import startup_state
+from app.core.tracing import tracer, Span
+from app.core.profiler import sampling_profiler
+from app.services.limiter import request_class
 
 router = APIRouter()
 
-async def event_generator(query: str, thread_id: str):
+# 客户端断开检测的轮询间隔 (秒)
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# 图执行结束 / 被取消时放入队列的哨兵
+_GRAPH_DONE = object()
+_GRAPH_CANCELLED = object()
+
+
+def _cancel_graph_task(task: asyncio.Task, endpoint: str, reason: str) -> bool:
+    """
+    取消仍在运行的图任务，并记录取消指标
+    取消会沿 await 链传递到 LLM 的 HTTP 请求、Qdrant 查询和 Neo4j 会话
+    """
+    if task.done():
+        return False
+    task.cancel()
+    metrics.inc("chat_cancellations_total", endpoint=endpoint, reason=reason)
+    logger.warning(f"🛑 客户端已断开，取消图执行 (endpoint={endpoint}, reason={reason})")
+    return True
+
+
+async def _watch_disconnect(request: Request, task: asyncio.Task, endpoint: str):
+    """后台轮询客户端连接状态，断开时取消图任务 (返回是否由本函数取消)"""
+    while not task.done():
+        if await request.is_disconnected():
+            return _cancel_graph_task(task, endpoint, "client_disconnect")
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+    return False
+
+
+async def _drive_graph(inputs: dict, config: dict, queue: asyncio.Queue, priority: str, root: Optional[Span]):
+    """在独立任务中驱动图执行，把每个节点的输出放入队列"""
+    # 出站限流按该类别公平排队
+    request_class.set(priority)
+    tracer.activate(root)
+    try:
+        async for event in agent_app.astream(inputs, config=config):
+            queue.put_nowait(event)
+        queue.put_nowait(_GRAPH_DONE)
+    except asyncio.CancelledError:
+        queue.put_nowait(_GRAPH_CANCELLED)
+        raise
+    except Exception as e:
+        queue.put_nowait(e)
+
+
+async def _invoke_graph(inputs: dict, config: dict, root: Optional[Span]) -> dict:
+    """在独立任务中一次性执行整张图 (同步接口)"""
+    tracer.activate(root)
+    return await agent_app.ainvoke(inputs, config=config)
+
+
+def _build_deadline(request: ChatRequest) -> Deadline:
+    """根据请求 (或默认配置) 创建本次请求的延迟预算"""
+    return Deadline.for_request(request.latency_budget_ms)
+
+
+def _ensure_ready():
+    """启动 (初始化 / 预热) 未完成时直接 503，让负载均衡器或客户端稍后重试"""
+    if not startup_state.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="服务正在启动，请稍后重试",
+            headers={"Retry-After": str(settings.STARTUP_RETRY_AFTER_S)},
+        )
+
+
+async def _admit(request: ChatRequest, http_request: Request) -> AdmissionTicket:
+    """准入控制：按租户 (X-Tenant-ID) 或 thread_id 做公平调度，过载时抛出 429"""
+    _ensure_ready()
+    key = http_request.headers.get("X-Tenant-ID") or request.thread_id
+    return await admission_controller.admit(key, request.priority or "interactive")
+
+
+async def event_generator(request: Request, query: str, thread_id: str, deadline: Deadline,
+                          ticket: AdmissionTicket, received_at: float, search_mode: Optional[str] = None):
     """
     生成 SSE 事件流
     格式: data: {...} \n\n
+    received_at: 收到请求的时间 (perf_counter)，用于统计首字节时间 sse_ttfb_seconds
     """
-    config = {"configurable": {"thread_id": thread_id}}
+    config = {"configurable": {"thread_id": thread_id, "deadline": deadline, "search_mode": search_mode}}
     inputs = {
         "query": query,
         "messages": [HumanMessage(content=query)]
     }
 
+    root = tracer.start_trace("chat.stream", thread_id=thread_id, priority=ticket.priority)
+    trace_id = root.trace.trace_id if root else None
+    # 日志关联ID 与 trace_id 一致，图任务创建时继承
+    correlation_id.set(trace_id or uuid.uuid4().hex)
+    # 生成器被提前关闭 (客户端断开) 时保持 cancelled
+    status = "cancelled"
+
+    queue: asyncio.Queue = asyncio.Queue()
+    graph_task = asyncio.create_task(_drive_graph(inputs, config, queue, ticket.priority, root))
+    watcher = asyncio.create_task(_watch_disconnect(request, graph_task, "stream"))
+    metrics.add_gauge("chat_inflight", 1, endpoint="stream")
+    first_frame = True
+
     try:
-        # 使用 astream 监听图的执行过程
-        async for event in agent_app.astream(inputs, config=config):
-            
+        while True:
+            event = await queue.get()
+
+            if event is _GRAPH_DONE:
+                break
+            if event is _GRAPH_CANCELLED:
+                # 客户端已经不在了，不再写任何数据
+                return
+            if isinstance(event, Exception):
+                raise event
+
             # 1. 监听节点完成事件
             for node_name, state_update in event.items():
-                
+
                 # 构造要发给前端的数据包
-                payload = {"type": "update", "node": node_name}
-                
+                payload = {"type": "update", "node": node_name, "trace_id": trace_id}
+
                 # 提取不同节点的关键信息
                 if node_name == "retrieve":
                     payload["status"] = "retrieval_done"
                     payload["entities"] = state_update.get("entities", [])
-                
+
                 elif node_name == "generate":
                     payload["status"] = "generation_done"
                     # 注意：此时 answer 还没校验，可以选择不发给前端，或者发给前端预览
-                
+
                 elif node_name == "validate":
                     payload["status"] = "validation_done"
                     payload["validation_status"] = state_update.get("validation_status")
@@ -46,50 +158,138 @@ async def event_generator(query: str, thread_id: str):
                     # 校验完成后的 Answer 才是最终 Answer
                     payload["final_answer"] = state_update.get("answer")
 
+                # 截至当前节点已触发的降级
+                payload["degradations"] = list(deadline.degradations)
+
+                if first_frame:
+                    first_frame = False
+                    metrics.observe("sse_ttfb_seconds", time.perf_counter() - received_at)
+
                 # 发送 SSE 数据帧
                 yield f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
 
         # 2. 发送结束信号
+        status = "ok"
         yield "data: [DONE]\n\n"
 
     except Exception as e:
+        status = "error"
         logger.error(f"流式生成出错: {e}")
-        err_payload = {"type": "error", "message": str(e)}
+        err_payload = {"type": "error", "message": str(e), "trace_id": trace_id}
         yield f"data: {json.dumps(err_payload, ensure_ascii=False)}\n\n"
 
+    finally:
+        # 生成器被关闭 (写入失败 / 连接被服务端取消) 时，图任务可能还在跑
+        _cancel_graph_task(graph_task, "stream", "stream_closed")
+        watcher.cancel()
+        ticket.release()
+        metrics.add_gauge("chat_inflight", -1, endpoint="stream")
+        tracer.finish(root, status)
+        sampling_profiler.request_finished()
+        metrics.observe("chat_request_seconds", time.perf_counter() - received_at, endpoint="stream")
+
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
+async def chat_stream(request: ChatRequest, http_request: Request):
     """
     流式对话接口 (Server-Sent Events)
     前端可以通过 EventSource 接收实时状态更新
     """
+    received_at = time.perf_counter()
     logger.info(f"收到请求: {request.query} (ID: {request.thread_id})")
-    
+    # 在开始推流之前完成准入，过载时直接返回 429
+    ticket = await _admit(request, http_request)
+
     return StreamingResponse(
-        event_generator(request.query, request.thread_id),
-        media_type="text/event-stream"
+        event_generator(http_request, request.query, request.thread_id, _build_deadline(request), ticket,
+                        received_at, request.search_mode),
+        media_type="text/event-stream",
+        # 兜底：生成器未被迭代时也要归还名额 (release 可重复调用)
+        background=BackgroundTask(ticket.release)
     )
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat_sync(request: ChatRequest):
+async def chat_sync(request: ChatRequest, http_request: Request):
     """
     同步对话接口 (等待所有步骤完成后一次性返回)
     """
+    received_at = time.perf_counter()
     logger.info(f"收到同步请求: {request.query}")
-    config = {"configurable": {"thread_id": request.thread_id}}
-    
+    ticket = await _admit(request, http_request)
+    metrics.add_gauge("chat_inflight", 1, endpoint="sync")
+    deadline = _build_deadline(request)
+    config = {"configurable": {"thread_id": request.thread_id, "deadline": deadline, "search_mode": request.search_mode}}
+
+    root = tracer.start_trace("chat.sync", thread_id=request.thread_id, priority=ticket.priority)
+    correlation_id.set(root.trace.trace_id if root else uuid.uuid4().hex)
+    status = "error"
+
+    request_class.set(ticket.priority)
+    graph_task = asyncio.create_task(_invoke_graph(
+        {"query": request.query, "messages": [HumanMessage(content=request.query)]},
+        config,
+        root
+    ))
+    watcher = asyncio.create_task(_watch_disconnect(http_request, graph_task, "sync"))
+
     try:
-        final_state = await agent_app.ainvoke(
-            {"query": request.query, "messages": [HumanMessage(content=request.query)]},
-            config=config
-        )
-        
+        final_state = await graph_task
+        status = "ok"
+
         return ChatResponse(
             answer=final_state["answer"],
             sources=final_state.get("entities", []),
             graph_data=final_state.get("graph_context", ""),
-            validation_status=final_state.get("validation_status", "unknown")
+            validation_status=final_state.get("validation_status", "unknown"),
+            degradations=deadline.degradations,
+            trace_id=root.trace.trace_id if root else None
         )
+    except asyncio.CancelledError:
+        status = "cancelled"
+        # 客户端断开导致的取消：没有人等待响应了，返回 499 仅用于日志
+        # 其他来源的取消 (如服务关闭) 原样抛出
+        if watcher.done() and not watcher.cancelled() and watcher.result():
+            raise HTTPException(status_code=499, detail="Client Closed Request")
+        raise
     except Exception as e:
         logger.error(f"执行失败: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        _cancel_graph_task(graph_task, "sync", "request_aborted")
+        watcher.cancel()
+        ticket.release()
+        metrics.add_gauge("chat_inflight", -1, endpoint="sync")
+        tracer.finish(root, status)
+        sampling_profiler.request_finished()
+        metrics.observe("chat_request_seconds", time.perf_counter() - received_at, endpoint="sync")
+
+
+@router.post("/chat/batch")
+async def chat_batch(http_request: Request,
+                     concurrency: int = Query(None, gt=0, description="批内并发数，不超过 BATCH_MAX_CONCURRENCY")):
+    """
+    批量对话接口 (离线任务)
+    请求体为 JSONL，每行一个 BatchChatItem；结果按完成顺序以 JSONL 流式返回，附带各节点耗时
+    批量请求以 batch 优先级调度，始终让位于交互式请求
+    """
+    _ensure_ready()
+    body = (await http_request.body()).decode("utf-8")
+    items = []
+    for line_no, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            items.append(BatchChatItem.model_validate_json(line))
+        except ValidationError as e:
+            raise HTTPException(status_code=422, detail=f"第 {line_no} 行格式错误: {e}")
+    seen_ids = set()
+    for item in items:
+        if item.id in seen_ids:
+            raise HTTPException(status_code=422, detail=f"条目ID重复: {item.id}")
+        seen_ids.add(item.id)
+
+    limit = min(concurrency or settings.BATCH_MAX_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    logger.info(f"收到批量请求: {len(items)} 条 (并发 {limit})")
+
+    # 整批按租户 (X-Tenant-ID) 参与公平调度，未提供时以批次为单位
+    tenant = http_request.headers.get("X-Tenant-ID")
+    return StreamingResponse(run_batch(items, limit, tenant), media_type="application/x-ndjson")
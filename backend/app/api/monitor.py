@@ -1,11 +1,28 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from typing import Literal, Optional
+from collections import Counter
+import gc
+import secrets
+from fastapi.responses import JSONResponse, PlainTextResponse
 from datetime import datetime
 import os
 
-import app.services.neo4j_service as neo4j_svc
-import app.services.qdrant_service as qdrant_svc
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.startup import startup_state
+from app.core.tracing import tracer
+from app.core.profiler import sampling_profiler, memory_profiler
+from app.core.graph import memory as checkpointer
+import app.services.hybrid_search as search_service
+from app.services.singleflight import singleflight_registry
 from app.services.embedding_factory import embedding_factory
+from app.services.hedging import latency_tracker
+from app.services.recording import provider_archive
+from app.services.limiter import governor_registry
+from app.services.circuit import breaker_registry
+from app.services.health import health_prober
+from app.services.singleflight import singleflight_summary
+from app.api.admission import admission_controller
 from app.api.schemas import SystemHealthResponse, ComponentStatus, ModelConfigInfo
 
 router = APIRouter()
@@ -14,27 +31,27 @@ router = APIRouter()
 async def get_system_health():
     """
     全系统健康检查 (Database + Services)
+    返回后台探测器缓存的结果 (不在请求中同步探测)，并附带各后端的熔断状态
     """
+    # 探测器尚未跑完第一轮时 (刚启动) 现场探测一次
+    if not health_prober.status:
+        await health_prober.probe_all()
+
+    names = {
+        "neo4j": "Neo4j Graph DB",
+        "qdrant": "Qdrant Vector DB",
+        "llm": "LLM Provider",
+        "embedding": "Embedding Provider",
+    }
     components = []
     has_error = False
-
-    # 1. 检查 Neo4j
-    neo4j_status = neo4j_svc.neo4j_manager.check_health()
-    components.append(ComponentStatus(
-        name="Neo4j Graph DB",
-        status=neo4j_status.get("status", "down"),
-        details=neo4j_status
-    ))
-    if neo4j_status.get("status") == "down": has_error = True
-
-    # 2. 检查 Qdrant
-    qdrant_status = qdrant_svc.qdrant_manager.check_health()
-    components.append(ComponentStatus(
-        name="Qdrant Vector DB",
-        status=qdrant_status.get("status", "down"),
-        details=qdrant_status
-    ))
-    if qdrant_status.get("status") == "down": has_error = True
+    for key, status in health_prober.snapshot().items():
+        components.append(ComponentStatus(
+            name=names.get(key, key),
+            status=status.get("status", "down"),
+            details=status
+        ))
+        if status.get("status") == "down": has_error = True
 
     return SystemHealthResponse(
         timestamp=datetime.now().isoformat(),
@@ -42,6 +59,24 @@ async def get_system_health():
         components=components
     )
 
+@router.get("/circuits")
+async def get_circuit_status():
+    """
+    获取各后端熔断器的状态 (closed / open / half_open)、连续失败次数与最近的状态切换记录
+    """
+    return {"circuits": [b.summary() for b in breaker_registry.values()]}
+
+@router.get("/ready")
+async def get_readiness():
+    """
+    就绪探针：初始化完成 (ready / degraded) 返回 200，启动中 (warming) 返回 503
+    附带各组件初始化耗时，便于排查冷启动慢在哪里
+    """
+    return JSONResponse(
+        status_code=200 if startup_state.ready else 503,
+        content=startup_state.summary(),
+    )
+
 @router.get("/models")
 async def get_model_configs():
     """
@@ -84,4 +119,174 @@ async def get_model_configs():
         parameters={}
     ))
 
-    return {"models": configs}
\ No newline at end of file
+    # 本地 Embedding (至少一种用途切到 local 时才展示)
+    local_uses = [use for use, backend in (("entity", settings.ENTITY_EMBD_BACKEND),
+                                           ("community", settings.COMMUNITY_EMBD_BACKEND)) if backend == "local"]
+    if local_uses:
+        configs.append(ModelConfigInfo(
+            model_type="Embedding (Local)",
+            model_name=settings.LOCAL_EMBD_MODEL_DIR.name,
+            provider="onnxruntime (CPU)",
+            dimensions=settings.LOCAL_EMBD_DIMENSIONS,
+            parameters={"uses": local_uses, "quantized": settings.LOCAL_EMBD_QUANTIZED}
+        ))
+
+    return {"models": configs}
+
+@router.get("/stats")
+async def get_runtime_stats():
+    """
+    获取进程内运行时指标 (计数器 / 瞬时值)
+    """
+    return metrics.snapshot()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """
+    Prometheus 抓取端点 (文本格式)
+    包含节点 / 后端耗时直方图、token 用量与估算成本、缓存命中率、在途请求数、SSE 首字节时间
+    多 worker 部署时每个进程各自暴露一份，由 Prometheus 按实例聚合
+    """
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/providers")
+async def get_provider_latency():
+    """
+    获取各提供商端点的延迟分位数、重试次数、对冲率与对冲胜率
+    (开启录制 / 回放时附带归档状态：已录制条数、回放命中 / 未命中次数)
+    """
+    return {
+        "endpoints": latency_tracker.summary(),
+        "recording": provider_archive.summary() if provider_archive else None,
+    }
+
+
+@router.get("/limiters")
+async def get_limiter_status():
+    """
+    获取各后端出站限流器的并发上限、在途请求数和排队深度
+    """
+    return {"limiters": [g.summary() for g in governor_registry.values()]}
+
+
+@router.get("/admission")
+async def get_admission_status():
+    """
+    获取入站准入控制状态 (在途请求、各优先级排队数、平均服务时间)
+    """
+    return admission_controller.summary()
+
+
+@router.get("/singleflight")
+async def get_singleflight_status():
+    """
+    获取请求合并 (single-flight) 情况：各分组的实际执行次数、被合并次数与合并率
+    """
+    return {"groups": singleflight_summary()}
+
+
+@router.get("/traces")
+async def list_traces(order: Literal["recent", "slowest"] = "recent",
+                      limit: int = Query(20, gt=0, le=500),
+                      thread_id: Optional[str] = None):
+    """
+    列出内存环形缓冲中已完成的请求 trace (最近 / 最慢，可按 thread_id 过滤)
+    """
+    traces = tracer.slowest(limit, thread_id) if order == "slowest" else tracer.recent(limit, thread_id)
+    return {"traces": traces}
+
+
+@router.get("/traces/{trace_id}")
+async def get_trace(trace_id: str):
+    """
+    获取单个 trace 的耗时瀑布图 (各节点 / 服务调用 span 的起止偏移与属性)
+    """
+    trace = tracer.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="trace 不存在或已被环形缓冲淘汰")
+    return trace
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """诊断接口鉴权：未配置 ADMIN_TOKEN 时一律禁用"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="诊断接口未启用 (未配置 ADMIN_TOKEN)")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="X-Admin-Token 无效")
+
+
+@router.post("/profile", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def run_sampling_profile(seconds: Optional[float] = Query(None, gt=0),
+                               requests: Optional[int] = Query(None, gt=0),
+                               interval_ms: float = Query(5.0, ge=1, le=100),
+                               include_idle: bool = False):
+    """
+    统计采样 CPU 分析：采样 seconds 秒，或直到接下来 requests 个对话请求完成
+    返回折叠栈文本 (可用 flamegraph.pl / speedscope 生成火焰图)
+    """
+    if seconds is None and requests is None:
+        raise HTTPException(status_code=422, detail="需要指定 seconds 或 requests")
+    try:
+        stacks = await sampling_profiler.profile(seconds, requests, interval_ms, include_idle)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(stacks)
+
+
+@router.post("/memory/start", dependencies=[Depends(require_admin)])
+async def start_memory_tracing(frames: int = Query(1, ge=1, le=25)):
+    """
+    开启 tracemalloc 并记录基线快照 (开启期间所有内存分配都会变慢，用完请 stop)
+    """
+    return memory_profiler.start(frames)
+
+
+@router.get("/memory/diff", dependencies=[Depends(require_admin)])
+async def get_memory_diff(limit: int = Query(30, gt=0, le=500)):
+    """
+    当前内存与基线快照的差异，按模块汇总
+    """
+    try:
+        return memory_profiler.diff(limit)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/memory/stop", dependencies=[Depends(require_admin)])
+async def stop_memory_tracing():
+    """
+    关闭 tracemalloc
+    """
+    return memory_profiler.stop()
+
+
+@router.get("/objects", dependencies=[Depends(require_admin)])
+async def get_object_counts(gc_types: int = Query(0, ge=0, le=100)):
+    """
+    进程内主要数据结构的对象数：checkpointer 会话、合并 / 微批队列、trace 缓冲、准入与限流队列
+    gc_types > 0 时额外返回 gc 跟踪对象中数量最多的类型 (会遍历全部对象，较慢)
+    """
+    storage = getattr(checkpointer, "storage", {})
+    result = {
+        "checkpointer": {
+            "threads": len(storage),
+            "checkpoints": sum(len(checkpoints) for namespaces in storage.values() for checkpoints in namespaces.values()),
+            "writes": len(getattr(checkpointer, "writes", {})),
+            "blobs": len(getattr(checkpointer, "blobs", {})),
+        },
+        "singleflight_inflight": {name: group.inflight for name, group in singleflight_registry.items()},
+        "batchers": [],
+        "trace_buffer": tracer.size,
+        "admission": admission_controller.summary(),
+        "limiters": {g.name: {"inflight": g.queue.inflight, "queued": g.queue.depth()} for g in governor_registry.values()},
+    }
+    service = search_service.hybrid_search_service
+    if service is not None:
+        result["batchers"] = [service.extraction_batcher.summary(), service.embedding_batcher.summary()]
+    if gc_types:
+        counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+        result["gc_types"] = dict(counts.most_common(gc_types))
+    return result
+
@@ -1,11 +1,14 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Literal
 
 # 接收用户的请求
 class ChatRequest(BaseModel):
     query: str = Field(..., description="用户的问题", example="马斯克的太空公司是什么")
     thread_id: str = Field(..., description="会话ID，用于记忆上下文", example="user_123")
     stream: bool = Field(False, description="是否开启流式输出")
+    priority: Optional[Literal["interactive", "batch"]] = Field(None, description="调度优先级，默认 interactive")
+    latency_budget_ms: Optional[int] = Field(None, gt=0, description="端到端延迟预算(毫秒)，超出时各阶段按策略降级", example=15000)
+    search_mode: Optional[Literal["local", "global", "auto"]] = Field(None, description="检索模式：local 实体检索 / global 社区摘要检索 / auto 自动选择，默认取服务端配置")
 
 # 响应给用户的结构 (非流式模式下使用)
 class ChatResponse(BaseModel):
@@ -13,6 +16,28 @@ class ChatResponse(BaseModel):
     sources: List[str] = []      # 引用了哪些实体
     graph_data: str = ""         # 图谱信息 (可选，用于前端可视化)
     validation_status: str = ""  # 校验状态
+    degradations: List[str] = [] # 因延迟预算不足而触发的降级
+    trace_id: Optional[str] = None # 请求追踪ID，可在 /monitor/traces/{trace_id} 查看耗时瀑布图
+
+# 批量接口的单条输入 (JSONL 中的一行)
+class BatchChatItem(BaseModel):
+    id: str = Field(..., description="条目ID，用于断点续跑和结果对齐")
+    query: str = Field(..., description="用户的问题")
+    thread_id: Optional[str] = Field(None, description="会话ID，留空则使用一次性会话")
+    latency_budget_ms: Optional[int] = Field(None, gt=0, description="单条延迟预算(毫秒)")
+    search_mode: Optional[Literal["local", "global", "auto"]] = Field(None, description="检索模式，默认取服务端配置")
+
+# 批量接口的单条输出 (JSONL 中的一行)
+class BatchChatResult(BaseModel):
+    id: str
+    answer: str = ""
+    sources: List[str] = []
+    validation_status: str = ""
+    degradations: List[str] = []
+    timings: Dict[str, float] = {}   # queued_ms / retrieve_ms / generate_ms / validate_ms / total_ms
+    shared_with: Optional[str] = None  # 与该条目的重复查询共享了同一次执行
+    trace_id: Optional[str] = None
+    error: Optional[str] = None
     
 class ComponentStatus(BaseModel):
     name: str
@@ -0,0 +1,153 @@
+"""
+为已有的实体集合补齐 BM25 稀疏向量 (稠密 + 稀疏混合检索)
+
+用法 (在 backend 目录下):
+    python -m app.cli.backfill_sparse                 # 当前 ENTITY_EMBD_BACKEND 对应的实体集合
+    python -m app.cli.backfill_sparse --collection X  # 指定集合
+
+Qdrant 不支持给已有集合追加新的稀疏向量名，因此集合没有稀疏向量配置时会重建：
+  1. 新建临时集合 <集合名>__sparse (沿用原稠密向量配置 + 稀疏向量配置)
+  2. 从原集合连同稠密向量一起复制所有点，同时写入稀疏向量
+  3. 删除原集合，按新配置重建同名集合并从临时集合复制回来，最后删除临时集合
+第 3 步中途失败时数据仍在临时集合中，重新运行即可从临时集合恢复。
+集合已有稀疏向量配置时只为每个点重写稀疏向量。
+稀疏向量的文本取 payload["page_content"]，缺省时取 metadata.name；可重复运行。完成后重启服务生效。
+
+注意: 嵌入式 Qdrant 的文件锁只允许一个进程，需在服务停止时运行
+"""
+import argparse
+import sys
+import time
+
+
+def _text_of(payload: dict) -> str:
+    metadata = payload.get("metadata") or {}
+    return payload.get("page_content") or metadata.get("name") or ""
+
+
+def _copy(client, source: str, target: str, batch_size: int) -> int:
+    """把 source 的点 (payload + 全部向量) 复制到 target，同时按原文写入稀疏向量，返回点数"""
+    from qdrant_client import models
+
+    from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder
+
+    copied, offset = 0, None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source, limit=batch_size, offset=offset,
+            with_payload=True, with_vectors=True,
+        )
+        batch = []
+        for p in points:
+            # 稠密向量未命名时 scroll 返回列表，统一成 {"": 向量} 后再补稀疏向量
+            vector = dict(p.vector) if isinstance(p.vector, dict) else {"": p.vector}
+            text = _text_of(p.payload or {})
+            if text:
+                vector[SPARSE_VECTOR_NAME] = bm25_encoder.encode_document(text)
+            batch.append(models.PointStruct(id=p.id, vector=vector, payload=p.payload))
+        if batch:
+            client.upsert(collection_name=target, points=batch)
+            copied += len(batch)
+        if offset is None:
+            return copied
+
+
+def _recreate(client, name: str, dense_config) -> None:
+    from app.services.sparse import sparse_vectors_config
+
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(
+        collection_name=name, vectors_config=dense_config, sparse_vectors_config=sparse_vectors_config(),
+    )
+
+
+def _staging_name(collection: str) -> str:
+    return f"{collection}__sparse"
+
+
+def _rebuild(client, collection: str, batch_size: int) -> int:
+    """原集合完整但没有稀疏向量配置：复制到临时集合后换回 (步骤见模块说明)，返回点数"""
+    staging = _staging_name(collection)
+    dense_config = client.get_collection(collection).config.params.vectors
+    _recreate(client, staging, dense_config)
+    copied = _copy(client, collection, staging, batch_size)
+    print(f"🧩 已复制 {copied} 个点到临时集合 {staging}", file=sys.stderr)
+    client.delete_collection(collection)
+    return _restore(client, collection, batch_size)
+
+
+def _restore(client, collection: str, batch_size: int) -> int:
+    """按新配置重建 collection 并从临时集合复制回来，成功后删除临时集合"""
+    staging = _staging_name(collection)
+    dense_config = client.get_collection(staging).config.params.vectors
+    _recreate(client, collection, dense_config)
+    copied = _copy(client, staging, collection, batch_size)
+    client.delete_collection(staging)
+    return copied
+
+
+def _refresh(client, collection: str, batch_size: int) -> int:
+    """集合已有稀疏向量配置：只重写每个点的稀疏向量，返回更新的点数"""
+    from qdrant_client import models
+
+    from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder
+
+    updated, offset = 0, None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection, limit=batch_size, offset=offset,
+            with_payload=True, with_vectors=False,
+        )
+        batch = [
+            models.PointVectors(id=p.id, vector={SPARSE_VECTOR_NAME: bm25_encoder.encode_document(text)})
+            for p in points if (text := _text_of(p.payload or {}))
+        ]
+        if batch:
+            client.update_vectors(collection_name=collection, points=batch)
+            updated += len(batch)
+        if offset is None:
+            return updated
+
+
+def run(args: argparse.Namespace) -> int:
+    # 延迟导入：--help 不需要连接任何后端
+    from app.services.hybrid_search import entity_collection_name
+    from app.services.qdrant_service import qdrant_manager
+    from app.services.sparse import SPARSE_VECTOR_NAME, has_sparse_vectors
+
+    collection = args.collection or entity_collection_name()
+    client = qdrant_manager.get_client()
+    start = time.perf_counter()
+    try:
+        exists = client.collection_exists(collection)
+        staged = client.collection_exists(_staging_name(collection))
+        if not exists and not staged:
+            print(f"❌ 集合不存在: {collection}", file=sys.stderr)
+            return 1
+        if exists and not has_sparse_vectors(client, collection):
+            # 原集合仍是旧配置 (含上次在复制到临时集合时中断的情况)，数据以原集合为准
+            print(f"🧩 {collection} 没有稀疏向量配置 ({SPARSE_VECTOR_NAME})，重建集合", file=sys.stderr)
+            count = _rebuild(client, collection, args.batch_size)
+        elif staged:
+            # 上次运行在删除原集合之后中断：数据以临时集合为准
+            print(f"♻️ 从临时集合 {_staging_name(collection)} 恢复 {collection}", file=sys.stderr)
+            count = _restore(client, collection, args.batch_size)
+        else:
+            count = _refresh(client, collection, args.batch_size)
+    finally:
+        qdrant_manager.close()
+
+    print(f"✅ {collection}: 处理 {count} 个点，用时 {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为实体集合补齐 BM25 稀疏向量")
+    parser.add_argument("--collection", default=None, help="集合名 (默认当前实体集合)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的点数")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
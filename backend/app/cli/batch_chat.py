@@ -0,0 +1,107 @@
+"""
+批量对话命令行工具 (对应 /api/v1/chat/batch)
+
+用法 (在 backend 目录下):
+    python -m app.cli.batch_chat queries.jsonl -o results.jsonl --concurrency 8
+
+输入 JSONL 每行: {"id": "q1", "query": "马斯克的太空公司是什么"}
+    - id 缺省时使用行号；thread_id / latency_budget_ms 可选
+输出 JSONL 每行为一个 BatchChatResult (含 answer 与各节点耗时)
+
+断点续跑：输出文件中已成功的 id 会被跳过，新结果追加写入
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Set
+
+import httpx
+
+
+def load_items(path: Path) -> List[Dict]:
+    """读取输入 JSONL，补齐缺省 id"""
+    items = []
+    with path.open(encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            item.setdefault("id", str(line_no))
+            item["id"] = str(item["id"])
+            items.append(item)
+    return items
+
+
+def load_done_ids(path: Path) -> Set[str]:
+    """读取已完成 (无 error) 的条目 id，用于断点续跑"""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # 上次中断时可能写了半行
+                continue
+            if not record.get("error"):
+                done.add(str(record.get("id")))
+    return done
+
+
+def run(args: argparse.Namespace) -> int:
+    items = load_items(Path(args.input))
+    output = Path(args.output)
+    done = load_done_ids(output)
+    todo = [item for item in items if item["id"] not in done]
+
+    print(f"📦 共 {len(items)} 条，已完成 {len(done)} 条，本次执行 {len(todo)} 条", file=sys.stderr)
+    if not todo:
+        return 0
+
+    url = args.url.rstrip("/") + "/api/v1/chat/batch"
+    finished, failed = 0, 0
+    start = time.perf_counter()
+
+    with httpx.Client(timeout=httpx.Timeout(None, connect=10.0)) as client, output.open("a", encoding="utf-8") as out:
+        # 分块提交：一个块失败 / 中断时最多损失一个块的进度
+        for offset in range(0, len(todo), args.chunk_size):
+            chunk = todo[offset:offset + args.chunk_size]
+            body = "\n".join(json.dumps(item, ensure_ascii=False) for item in chunk)
+            with client.stream(
+                "POST", url,
+                content=body.encode("utf-8"),
+                params={"concurrency": args.concurrency},
+                headers={"Content-Type": "application/x-ndjson"},
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line.strip():
+                        continue
+                    out.write(line + "\n")
+                    out.flush()
+                    finished += 1
+                    if json.loads(line).get("error"):
+                        failed += 1
+
+            elapsed = time.perf_counter() - start
+            print(f"   - 进度 {finished}/{len(todo)} | 失败 {failed} | {finished / elapsed:.2f} 条/秒", file=sys.stderr)
+
+    print(f"✅ 完成，用时 {time.perf_counter() - start:.1f}s，失败 {failed} 条 (重新运行即可续跑)", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量对话 (JSONL 输入 / JSONL 输出，可断点续跑)")
+    parser.add_argument("input", help="输入 JSONL 文件")
+    parser.add_argument("-o", "--output", required=True, help="输出 JSONL 文件 (追加写入)")
+    parser.add_argument("--url", default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--concurrency", type=int, default=8, help="批内并发数")
+    parser.add_argument("--chunk-size", type=int, default=500, help="每次请求提交的条目数")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+社区摘要离线构建工具 (供全局检索 search_mode=global / auto 使用)
+
+用法 (在 backend 目录下):
+    python -m app.cli.build_communities --max-levels 3 --min-size 3 --concurrency 8
+
+流程: 读取 Neo4j 实体图 -> 层次标签传播划分社区 -> fast 模型自底向上逐个摘要 -> 向量化写入 Qdrant
+集合 community-summaries (每次重建；COMMUNITY_EMBD_BACKEND=local 时为本地向量空间对应的集合)
+
+注意: 嵌入式 Qdrant 的文件锁只允许一个进程，构建时需先停止服务；构建完成后重启服务生效
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from app.core.config import settings
+
+
+async def run(args: argparse.Namespace) -> int:
+    # 延迟导入：--help 不需要连接任何后端
+    from app.services.communities import CommunityBuilder
+    from app.services.embedding_factory import embedding_factory
+    from app.services.hybrid_search import community_collection_name
+    from app.services.llm_factory import llm_factory
+    from app.services.neo4j_service import neo4j_manager
+    from app.services.qdrant_service import qdrant_manager
+
+    if neo4j_manager is None:
+        print("❌ Neo4j 不可用，无法读取实体图", file=sys.stderr)
+        return 1
+
+    builder = CommunityBuilder(
+        llm=llm_factory.get_llm(mode="fast"),
+        embeddings=embedding_factory.get_embedding(settings.COMMUNITY_EMBD_BACKEND),
+        graph=neo4j_manager,
+        qdrant_client=qdrant_manager.get_client(),
+        concurrency=args.concurrency,
+        collection_name=community_collection_name(),
+    )
+    start = time.perf_counter()
+    try:
+        stats = await builder.build(max_levels=args.max_levels, min_size=args.min_size, seed=args.seed)
+    finally:
+        neo4j_manager.close()
+        qdrant_manager.close()
+
+    print(
+        f"✅ 完成，用时 {time.perf_counter() - start:.1f}s: {stats['edges']} 条关系，"
+        f"{stats['communities']} 个社区，写入 {stats['summaries']} 条摘要",
+        file=sys.stderr,
+    )
+    return 0 if stats["summaries"] else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建社区摘要 (全局检索)")
+    parser.add_argument("--max-levels", type=int, default=settings.COMMUNITY_MAX_LEVELS, help="社区层数上限")
+    parser.add_argument("--min-size", type=int, default=settings.COMMUNITY_MIN_SIZE, help="参与摘要的最小社区规模 (实体数)")
+    parser.add_argument("--concurrency", type=int, default=8, help="摘要并发数")
+    parser.add_argument("--seed", type=int, default=42, help="标签传播随机种子 (固定后结果可复现)")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
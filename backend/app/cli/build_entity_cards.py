@@ -0,0 +1,75 @@
+"""
+实体卡片物化工具 (增量)
+
+用法 (在 backend 目录下):
+    python -m app.cli.build_entity_cards                  # 只重建邻域有变化的实体
+    python -m app.cli.build_entity_cards --force          # 全量重建
+    python -m app.cli.build_entity_cards --summarize      # 同时用 fast 模型生成一句话简介
+    python -m app.cli.build_entity_cards --watch 300      # 每 300 秒增量刷新一次
+
+卡片 (高排名关系 + 属性 + 可选简介) 写入实体向量的 payload["metadata"]["card"]，
+检索时随向量匹配一起返回，代替逐请求的 Neo4j 图扩展
+
+注意: 嵌入式 Qdrant 的文件锁只允许一个进程，需在服务停止时运行；使用 Qdrant 服务端时可与服务同时运行
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+
+async def run(args: argparse.Namespace) -> int:
+    # 延迟导入：--help 不需要连接任何后端
+    from app.services.entity_cards import EntityCardBuilder
+    from app.services.hybrid_search import entity_collection_name
+    from app.services.llm_factory import llm_factory
+    from app.services.neo4j_service import neo4j_manager
+    from app.services.qdrant_service import qdrant_manager
+
+    if neo4j_manager is None:
+        print("❌ Neo4j 不可用，无法读取实体邻域", file=sys.stderr)
+        return 1
+
+    builder = EntityCardBuilder(
+        graph=neo4j_manager,
+        qdrant_client=qdrant_manager.get_client(),
+        collection_name=entity_collection_name(),
+        llm=llm_factory.get_llm(mode="fast") if args.summarize else None,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+    )
+    try:
+        force = args.force
+        while True:
+            start = time.perf_counter()
+            stats = await builder.refresh(force=force)
+            print(
+                f"✅ 扫描 {stats['scanned']} 个实体，更新 {stats['updated']} 张卡片，"
+                f"用时 {time.perf_counter() - start:.1f}s",
+                file=sys.stderr,
+            )
+            if not args.watch:
+                return 0
+            # 只有第一轮全量，之后按邻域指纹增量刷新
+            force = False
+            await asyncio.sleep(args.watch)
+    finally:
+        neo4j_manager.close()
+        qdrant_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="物化实体卡片 (增量)")
+    parser.add_argument("--force", action="store_true", help="忽略邻域指纹，全量重建")
+    parser.add_argument("--summarize", action="store_true", help="用 fast 模型为变化的实体生成一句话简介")
+    parser.add_argument("--watch", type=float, default=0, help="每隔 N 秒增量刷新一次 (0 表示只运行一次)")
+    parser.add_argument("--batch-size", type=int, default=200, help="每批读取的实体数")
+    parser.add_argument("--concurrency", type=int, default=8, help="摘要并发数")
+    try:
+        sys.exit(asyncio.run(run(parser.parse_args())))
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+把集合重新向量化到另一个 Embedding 空间 (例如实体匹配切到本地 ONNX 模型)
+
+用法 (在 backend 目录下):
+    python -m app.cli.reindex_embeddings --target local                  # 实体集合: remote -> local
+    python -m app.cli.reindex_embeddings --target local --kind community # 社区摘要集合
+    python -m app.cli.reindex_embeddings --target remote --source local  # 反向
+
+每个向量空间使用独立的集合 (见 EmbeddingFactory.collection_name)，源集合保持不变；
+点 ID 与 payload 原样复制，只重新计算向量 (文本取 payload["page_content"]，缺省时取 metadata.name)。
+完成后把 ENTITY_EMBD_BACKEND / COMMUNITY_EMBD_BACKEND 设为目标后端并重启服务。
+
+注意: 嵌入式 Qdrant 的文件锁只允许一个进程，需在服务停止时运行
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+
+def _text_of(payload: dict) -> str:
+    metadata = payload.get("metadata") or {}
+    return payload.get("page_content") or metadata.get("name") or ""
+
+
+async def run(args: argparse.Namespace) -> int:
+    # 延迟导入：--help 不需要连接任何后端
+    from qdrant_client import models
+
+    from app.core.config import settings
+    from app.services.communities import COMMUNITY_COLLECTION
+    from app.services.embedding_factory import embedding_factory
+    from app.services.hybrid_search import ENTITY_COLLECTION
+    from app.services.qdrant_service import qdrant_manager
+    from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder, sparse_vectors_config
+
+    base = COMMUNITY_COLLECTION if args.kind == "community" else ENTITY_COLLECTION
+    source = embedding_factory.collection_name(base, args.source)
+    target = embedding_factory.collection_name(base, args.target)
+    if source == target:
+        print("❌ 源与目标是同一个向量空间", file=sys.stderr)
+        return 1
+
+    # 实体集合在新空间中同样附带 BM25 稀疏向量 (与向量空间无关，直接按原文重新计算)
+    with_sparse = args.kind == "entity" and settings.SPARSE_ENABLED
+    client = qdrant_manager.get_client()
+    try:
+        if not client.collection_exists(source):
+            print(f"❌ 源集合不存在: {source}", file=sys.stderr)
+            return 1
+        embeddings = embedding_factory.get_embedding(args.target)
+        if client.collection_exists(target):
+            client.delete_collection(target)
+        client.create_collection(
+            collection_name=target,
+            vectors_config=models.VectorParams(
+                size=embedding_factory.dimensions(args.target),
+                distance=models.Distance.COSINE,
+            ),
+            sparse_vectors_config=sparse_vectors_config() if with_sparse else None,
+        )
+
+        start, copied, offset = time.perf_counter(), 0, None
+        while True:
+            points, offset = client.scroll(
+                collection_name=source, limit=args.batch_size, offset=offset,
+                with_payload=True, with_vectors=False,
+            )
+            points = [p for p in points if _text_of(p.payload or {})]
+            if points:
+                vectors = await embeddings.aembed_documents([_text_of(p.payload) for p in points])
+                client.upsert(collection_name=target, points=[
+                    models.PointStruct(
+                        id=p.id,
+                        vector=(
+                            {"": vector, SPARSE_VECTOR_NAME: bm25_encoder.encode_document(_text_of(p.payload))}
+                            if with_sparse else vector
+                        ),
+                        payload=p.payload,
+                    )
+                    for p, vector in zip(points, vectors)
+                ])
+                copied += len(points)
+                print(f"   - 已写入 {copied} 条 | {copied / (time.perf_counter() - start):.1f} 条/秒", file=sys.stderr)
+            if offset is None:
+                break
+    finally:
+        qdrant_manager.close()
+
+    print(f"✅ {source} -> {target}: {copied} 条，用时 {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把集合重新向量化到另一个 Embedding 空间")
+    parser.add_argument("--target", choices=["remote", "local"], required=True, help="目标 Embedding 后端")
+    parser.add_argument("--source", choices=["remote", "local"], default="remote", help="源 Embedding 后端")
+    parser.add_argument("--kind", choices=["entity", "community"], default="entity", help="实体集合或社区摘要集合")
+    parser.add_argument("--batch-size", type=int, default=256, help="每批向量化的条数")
+    sys.exit(asyncio.run(run(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
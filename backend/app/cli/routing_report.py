@@ -0,0 +1,77 @@
+"""
+汇总模型路由的影子对比记录 (ROUTING_SHADOW_LOG)，判断简单问题交给 fast 模型是否有可见的质量回退
+
+用法 (在 backend 目录下):
+    python -m app.cli.routing_report                      # 默认记录文件
+    python -m app.cli.routing_report --worst 10           # 额外列出相似度最低的 10 条
+    python -m app.cli.routing_report --log path/to/file.jsonl --min-similarity 0.4
+
+相似度是 fast / smart 两个回答的字符 bigram Jaccard 相似度，只是廉价的筛查信号：
+低于 --min-similarity 的样本需要人工复核 (--worst 会打印两个回答)
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from statistics import mean
+
+
+def _quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(args: argparse.Namespace) -> int:
+    # 延迟导入：--help 不需要读取配置
+    from app.core.config import settings
+
+    path = Path(args.log) if args.log else settings.ROUTING_SHADOW_LOG
+    if not path.exists():
+        print(f"❌ 影子记录不存在: {path} (ROUTING_MODE=shadow / on 且有采样后才会生成)", file=sys.stderr)
+        return 1
+
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue  # 进程被强杀时最后一行可能不完整
+    if not entries:
+        print(f"❌ 影子记录为空: {path}", file=sys.stderr)
+        return 1
+
+    similarities = [e["similarity"] for e in entries]
+    low = [e for e in entries if e["similarity"] < args.min_similarity]
+    routed_ms = mean(e["routed_ms"] for e in entries)
+    smart_ms = mean(e["smart_ms"] for e in entries)
+    print(f"📊 {len(entries)} 条影子对比 ({path})")
+    print(f"   相似度   mean={mean(similarities):.3f}  p10={_quantile(similarities, 0.1):.3f}  "
+          f"p50={_quantile(similarities, 0.5):.3f}")
+    print(f"   低于 {args.min_similarity} 的样本: {len(low)} ({len(low) / len(entries):.1%})")
+    print(f"   平均耗时 routed={routed_ms:.0f}ms  smart={smart_ms:.0f}ms  ({1 - routed_ms / smart_ms:.1%} 更快)"
+          if smart_ms else f"   平均耗时 routed={routed_ms:.0f}ms")
+    served = {}
+    for e in entries:
+        served[e["served"]] = served.get(e["served"], 0) + 1
+    print("   作答模型: " + "  ".join(f"{mode}={count}" for mode, count in sorted(served.items())))
+
+    if args.worst:
+        print(f"\n🔎 相似度最低的 {args.worst} 条:")
+        for e in sorted(entries, key=lambda e: e["similarity"])[:args.worst]:
+            print(f"\n[{e['similarity']:.3f}] 得分 {e['score']} | {e['query']}")
+            print(f"  routed: {e['routed_answer'][:300]}")
+            print(f"  smart : {e['smart_answer'][:300]}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="汇总模型路由的影子对比记录")
+    parser.add_argument("--log", default=None, help="影子记录文件 (默认 ROUTING_SHADOW_LOG)")
+    parser.add_argument("--min-similarity", type=float, default=0.3, help="低于该相似度的样本计为可疑")
+    parser.add_argument("--worst", type=int, default=0, help="列出相似度最低的 N 条")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
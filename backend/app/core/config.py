@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Dict, List, Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # --- 1. 路径锚点 (绝对路径) ---
@@ -12,6 +13,20 @@ class Settings(BaseSettings):
     # --- 基础路径配置 ---
     BASE_DIR: Path = BACKEND_DIR
     LOG_DIR: Path = BACKEND_DIR / "logs"
+
+    # --- 日志 ---
+    # 控制台 / 文件的日志级别
+    LOG_LEVEL: str = "DEBUG"
+    LOG_FILE_LEVEL: str = "INFO"
+    # 输出结构化 JSON 行 (含 correlation_id)，便于日志系统采集
+    LOG_JSON: bool = False
+    # 异步写日志：请求路径上只做格式化和入队，由后台线程写 stderr / 文件 (含轮转与压缩)
+    LOG_ASYNC: bool = True
+    # DEBUG 日志限流：每个调用点每秒最多输出多少条 (0 表示不限)，以及随机采样比例
+    LOG_DEBUG_RATE_PER_SITE: float = 10
+    LOG_DEBUG_SAMPLE_RATE: float = 1.0
+    # 轮转后的日志在独立子进程中 gzip 压缩 (False 时由 loguru 在本进程 zip 压缩)
+    LOG_COMPRESS_OFF_PROCESS: bool = True
     
     # --- 模型提供商 ---
     LLM_BASE_URL: str = "https://api.openai.com/v1" 
@@ -41,6 +56,208 @@ class Settings(BaseSettings):
     QDRANT_URL: str = "./qdrant_data"
     QDRANT_API_KEY: str | None = None
 
+    # --- 延迟预算 (毫秒) ---
+    # 请求未指定 latency_budget_ms 时使用的默认预算，留空表示不限时
+    REQUEST_BUDGET_MS: int | None = None
+    # 检索阶段必须为生成阶段预留的时间，不足时直接使用缓存上下文
+    BUDGET_GENERATION_MIN_MS: int = 3000
+    # 剩余时间低于该值时跳过 Neo4j 图扩展
+    BUDGET_GRAPH_MIN_MS: int = 500
+    # 剩余时间低于该值时跳过 (或延后) 校验
+    BUDGET_VALIDATION_MIN_MS: int = 2000
+    # 预算不足时是否把校验放到响应之后异步执行 (False 则直接跳过)
+    VALIDATION_DEFER_ON_BUDGET: bool = True
+
+    # --- 提供商调用：重试与对冲 (hedging) ---
+    # 对幂等调用 (Embedding / Temp=0 的抽取与校验) 开启对冲请求
+    HEDGING_ENABLED: bool = False
+    # 对冲延迟取该端点最近延迟的分位数
+    HEDGE_QUANTILE: float = 0.95
+    # 样本不足时使用的对冲延迟，以及对冲延迟下限 (毫秒)
+    HEDGE_DEFAULT_DELAY_MS: int = 2000
+    HEDGE_MIN_DELAY_MS: int = 50
+    HEDGE_MIN_SAMPLES: int = 20
+    # 失败重试 (指数退避 + 全抖动)
+    PROVIDER_MAX_RETRIES: int = 2
+    RETRY_BASE_DELAY_MS: int = 200
+    RETRY_MAX_DELAY_MS: int = 5000
+
+    # --- 提供商录制 / 回放 (LLM / Embedding) ---
+    # off: 正常调用；record: 正常调用，同时把请求 / 响应 / 实测延迟追加到归档；
+    # replay: 只从归档返回结果，不访问网络，归档中没有的请求直接报错
+    PROVIDER_RECORD_MODE: Literal["off", "record", "replay"] = "off"
+    PROVIDER_ARCHIVE_PATH: Path = BACKEND_DIR / "recordings" / "providers.jsonl.gz"
+    # 回放延迟: none 立即返回；original 按该条录制时的延迟；distribution 从同一端点的录制延迟中抽样
+    PROVIDER_REPLAY_TIMING: Literal["none", "original", "distribution"] = "none"
+    # 回放延迟的缩放系数
+    PROVIDER_REPLAY_TIME_SCALE: float = 1.0
+
+    # --- 请求追踪 ---
+    TRACING_ENABLED: bool = True
+    # 内存中保留的最近 trace 条数 (环形缓冲)
+    TRACE_BUFFER_SIZE: int = 500
+    # 设置后把完成的 trace 以 OTLP/JSON 逐行追加到该文件 (可被 OpenTelemetry Collector 读取)
+    TRACE_EXPORT_PATH: Path | None = None
+
+    # --- 运维 / 诊断接口 ---
+    # 访问 /monitor 下诊断接口 (采样分析 / 内存快照 / 对象统计) 所需的 X-Admin-Token，留空则禁用这些接口
+    ADMIN_TOKEN: str | None = None
+    # 单次采样分析的最长时间 (秒)
+    PROFILER_MAX_SECONDS: float = 120
+
+    # --- 成本估算 ---
+    # 各模型每 1K token 的单价 (任意货币单位)，用于 llm_cost_total 指标
+    # 例: {"qwen-max": {"prompt": 0.02, "completion": 0.06}}；未配置的模型只统计 token 数
+    LLM_TOKEN_PRICES: Dict[str, Dict[str, float]] = {}
+
+    # --- 出站限流 (LLM / Embedding / Qdrant / Neo4j) ---
+    LIMITER_ENABLED: bool = True
+    # 延迟超过基线多少倍视为过载信号 (AIMD 减半)
+    LIMITER_LATENCY_TOLERANCE: float = 2.0
+    # 请求类别的公平排队权重
+    LIMITER_CLASS_WEIGHTS: Dict[str, int] = {"interactive": 4, "batch": 1}
+    # 各后端的并发上限与速率限制 (0 表示不限速)
+    LLM_MAX_CONCURRENCY: int = 32
+    LLM_MAX_RPS: float = 0
+    LLM_MAX_TPM: int = 0
+    EMBD_MAX_CONCURRENCY: int = 32
+    EMBD_MAX_RPS: float = 0
+    EMBD_MAX_TPM: int = 0
+    QDRANT_MAX_CONCURRENCY: int = 16
+    NEO4J_MAX_CONCURRENCY: int = 16
+
+    # --- 健康探测与熔断 ---
+    # 后台探测 Neo4j / Qdrant 的间隔与单次超时 (秒)，/monitor/health 直接返回缓存结果
+    HEALTH_PROBE_INTERVAL_S: float = 10
+    HEALTH_PROBE_TIMEOUT_S: float = 3
+    # 各后端的熔断器：连续失败次数阈值、open 持续时间 (秒)、half-open 时放行的试探调用数
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_TIMEOUT_S: float = 15
+    CIRCUIT_HALF_OPEN_MAX_CALLS: int = 1
+
+    # --- 入站准入控制 (/chat, /chat/stream) ---
+    ADMISSION_ENABLED: bool = True
+    # 同时处理的请求数，超出的进入有界队列
+    ADMISSION_MAX_CONCURRENCY: int = 16
+    ADMISSION_MAX_QUEUE: int = 64
+    # 预计 / 实际排队时间超过该值时直接 429
+    ADMISSION_MAX_QUEUE_WAIT_MS: int = 10000
+    # 单个租户 / thread_id 的并发 + 排队上限
+    ADMISSION_MAX_PER_KEY: int = 4
+    # 服务时间 EWMA 的初始值 (用于冷启动时估算 Retry-After)
+    ADMISSION_INITIAL_SERVICE_MS: int = 5000
+
+    # --- 跨请求微批处理 ---
+    BATCHING_ENABLED: bool = True
+    EMBD_BATCH_MAX_SIZE: int = 32
+    EMBD_BATCH_MAX_WAIT_MS: float = 5
+    EXTRACTION_BATCH_MAX_SIZE: int = 8
+    EXTRACTION_BATCH_MAX_WAIT_MS: float = 10
+
+    # --- 批量接口 (/chat/batch) ---
+    # 单个批次内同时执行的条目数上限
+    BATCH_MAX_CONCURRENCY: int = 8
+
+    # --- 启动与预热 ---
+    # 启动后是否预热连接池 (Embedding / Neo4j) 并预先执行 WARMUP_QUERIES
+    WARMUP_ENABLED: bool = False
+    WARMUP_QUERIES: List[str] = []
+    # 启动未完成时对话接口返回 503 附带的 Retry-After (秒)
+    STARTUP_RETRY_AFTER_S: int = 2
+
+    # --- 多进程部署 (python -m app.serve --workers N) ---
+    # worker 进程数；出站限流额度 (*_MAX_CONCURRENCY / RPS / TPM) 按进程数均分
+    WORKERS: int = 1
+    # 只读共享索引目录：由启动器 (唯一写者) 从嵌入式 Qdrant 导出，worker 以 mmap 只读加载
+    SHARED_INDEX_DIR: Path = BACKEND_DIR / "shared_index"
+    # 由启动器设置：worker 改用共享索引检索，不再打开嵌入式 Qdrant (其文件锁只允许一个进程)
+    SHARED_INDEX_READONLY: bool = False
+    # 每个 worker 的 Neo4j 连接池大小
+    NEO4J_POOL_SIZE: int = 50
+
+    # --- 全局检索 (社区摘要) ---
+    # 默认检索模式：local 实体检索 / global 社区摘要 map-reduce / auto 按问题关键词选择
+    SEARCH_MODE_DEFAULT: Literal["local", "global", "auto"] = "local"
+    # auto 模式下命中任一关键词即视为全局问题
+    GLOBAL_QUESTION_KEYWORDS: List[str] = ["主要", "总体", "整体", "主题", "趋势", "共同", "概括", "总结", "全局", "有哪些领域", "overall", "main themes"]
+    # 每次全局检索参与 map 的社区数、reduce 后上下文的最大字符数
+    GLOBAL_SEARCH_TOP_K: int = 8
+    GLOBAL_SEARCH_MAX_CONTEXT_CHARS: int = 4000
+    # 离线构建 (python -m app.cli.build_communities)：层数、参与摘要的最小社区规模、每个社区送入摘要的关系数上限
+    COMMUNITY_MAX_LEVELS: int = 3
+    COMMUNITY_MIN_SIZE: int = 3
+    COMMUNITY_SUMMARY_MAX_EDGES: int = 40
+
+    # --- 实体名词法索引 (实体匹配的第一层) ---
+    # 启动时从实体集合构建名称 / 别名索引，精确命中的实体不再做 Embedding + 向量检索
+    # (模糊命中可能是名称相近的另一个实体，仍做向量检索并与之合并；数字不同的名称不算模糊命中)
+    LEXICAL_INDEX_ENABLED: bool = True
+    # 模糊匹配允许的最大编辑距离 (5 个字符以内的名称只做精确匹配)
+    LEXICAL_MAX_EDITS: int = 2
+    # 模糊命中的最低得分 (1 - 编辑距离 / 名称长度)，低于它时只用向量检索结果
+    LEXICAL_FUZZY_MIN_SCORE: float = 0.75
+
+    # --- 稀疏向量 (BM25) 混合检索 ---
+    # 实体集合附带 BM25 稀疏向量，检索时稠密 + 稀疏两路在 Qdrant 服务端 RRF 融合
+    # 已有集合需先补齐: python -m app.cli.backfill_sparse
+    SPARSE_ENABLED: bool = True
+    # 每一路召回的候选数 (候选预算)
+    SPARSE_PREFETCH_LIMIT: int = 20
+    SPARSE_BM25_K1: float = 1.2
+    SPARSE_BM25_B: float = 0.75
+    # 文档平均 token 数 (实体名很短，按 tokenize 结果估计)
+    SPARSE_AVG_DOC_LEN: float = 8.0
+
+    # --- 推测式并行检索 ---
+    # LLM 实体提取进行中时，同时用原始问题做实体向量检索并预取命中实体的一跳邻居；
+    # 提取完成后复用已有结果，只补查缺失的匹配 / 邻居 (检索耗时约为 max(LLM, 数据库) 而不是两者之和)
+    SPECULATIVE_RETRIEVAL_ENABLED: bool = True
+    # 原始问题向量检索取的实体数、其中预取邻居的实体数
+    SPECULATIVE_TOP_K: int = 5
+    SPECULATIVE_PREFETCH: int = 3
+
+    # --- 实体卡片 (python -m app.cli.build_entity_cards) ---
+    # 检索时使用实体 payload 中物化的卡片代替逐请求的 Neo4j 图扩展
+    ENTITY_CARDS_ENABLED: bool = True
+    # 每张卡片保留的关系数 (按对端实体度数排序)
+    ENTITY_CARD_MAX_RELATIONS: int = 10
+
+    # --- 本地 Embedding (ONNX Runtime, CPU) ---
+    # 各用途的 Embedding 后端：remote 远程 API / local 本地 ONNX 模型；每个向量空间使用独立的集合
+    ENTITY_EMBD_BACKEND: Literal["remote", "local"] = "remote"
+    COMMUNITY_EMBD_BACKEND: Literal["remote", "local"] = "remote"
+    # 模型目录 (model.onnx / model_int8.onnx + tokenizer.json)，目录名即模型名
+    LOCAL_EMBD_MODEL_DIR: Path = BACKEND_DIR / "models" / "paraphrase-multilingual-MiniLM-L12-v2"
+    LOCAL_EMBD_DIMENSIONS: int = 384
+    # 加载 int8 量化权重 (python -m app.services.local_embeddings --quantize 生成)
+    LOCAL_EMBD_QUANTIZED: bool = True
+    LOCAL_EMBD_MAX_BATCH: int = 64
+    LOCAL_EMBD_MAX_LENGTH: int = 128
+    # 单次推理的算子线程数 (0 表示 CPU 核数 / (WORKERS x LOCAL_EMBD_WORKERS))、并发推理线程数
+    LOCAL_EMBD_INTRA_OP_THREADS: int = 0
+    LOCAL_EMBD_WORKERS: int = 1
+
+    # --- 按复杂度路由模型 (生成 / 校验节点) ---
+    # off: 始终使用 smart 模型 (默认)
+    # shadow: 仍由 smart 作答，采样的简单问题在后台用 fast 再答一次并记录对比 (上线前观察质量)
+    # on: 简单问题由 fast 作答 (校验用 strict)，采样的简单问题在后台用 smart 再答一次并记录对比
+    # 注意：影子对比会额外产生 LLM 调用 (按 batch 类别限流)，并把原始问题与两份回答写入 ROUTING_SHADOW_LOG
+    ROUTING_MODE: Literal["off", "shadow", "on"] = "off"
+    # 复杂度得分 (0~1) 低于阈值视为简单问题
+    ROUTING_SIMPLE_THRESHOLD: float = 0.35
+    # 特征权重：实体数、图谱关系数、问题类型、对话轮数
+    ROUTING_WEIGHTS: Dict[str, float] = {"entities": 0.25, "graph": 0.2, "question": 0.4, "history": 0.15}
+    # 问题类型：命中推理类关键词得 1，命中事实类关键词得 0，都没命中得 0.5
+    ROUTING_REASONING_KEYWORDS: List[str] = ["为什么", "如何", "怎么", "怎样", "比较", "对比", "区别", "分析", "影响", "原因", "评价", "优缺点", "预测", "解释", "why", "how", "compare", "explain"]
+    ROUTING_FACTOID_KEYWORDS: List[str] = ["是谁", "是什么", "哪个", "哪家", "哪里", "哪年", "什么时候", "何时", "多少", "几个", "是否", "吗", "who", "what", "when", "where"]
+    # 简单问题生成的输出 token 上限、校验节点的输出 token 上限 (ROUTING_MODE=on 时生效)
+    ROUTING_SIMPLE_MAX_TOKENS: int = 1024
+    ROUTING_VALIDATION_MAX_TOKENS: int = 512
+    # 影子对比的采样率与记录文件 (python -m app.cli.routing_report 汇总)
+    ROUTING_SHADOW_SAMPLE_RATE: float = 0.1
+    ROUTING_SHADOW_LOG: Path = BACKEND_DIR / "logs" / "routing_shadow.jsonl"
+
     # --- Pydantic 魔法配置 ---
     model_config = SettingsConfigDict(
         env_file=BACKEND_DIR / ".env",  # 定位 .env
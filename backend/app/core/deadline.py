@@ -0,0 +1,66 @@
+import asyncio
+import time
+from typing import Any, Awaitable, List, Optional
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+
+class Deadline:
+    """
+    单个请求的端到端延迟预算
+    由接口层创建，经 config["configurable"]["deadline"] 传给每个节点和服务调用；
+    各阶段在预算不足时执行降级，并把降级记录在 degradations 中返回给前端
+    """
+
+    def __init__(self, budget_ms: Optional[float] = None):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000 if budget_ms else None
+        self.degradations: List[str] = []
+
+    @classmethod
+    def for_request(cls, budget_ms: Optional[float] = None) -> "Deadline":
+        """接口层使用：请求未指定预算时取服务端默认值 REQUEST_BUDGET_MS"""
+        return cls(budget_ms or settings.REQUEST_BUDGET_MS)
+
+    @classmethod
+    def from_config(cls, config: Optional[dict]) -> "Deadline":
+        """从图配置中取出 deadline，没有则返回不限时的预算"""
+        deadline = ((config or {}).get("configurable") or {}).get("deadline")
+        return deadline if isinstance(deadline, Deadline) else cls()
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> float:
+        """剩余预算 (秒)，不限时返回 inf"""
+        if self.expires_at is None:
+            return float("inf")
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def has(self, seconds: float) -> bool:
+        """剩余预算是否还够 seconds 秒"""
+        return self.remaining() >= seconds
+
+    def timeout_for(self, reserve: float = 0.0) -> Optional[float]:
+        """
+        计算某个阶段可用的超时时间
+        reserve: 需要留给后续阶段的时间 (秒)
+        """
+        if self.expires_at is None:
+            return None
+        return max(self.remaining() - reserve, 0.0)
+
+    async def run(self, aw: Awaitable[Any], reserve: float = 0.0) -> Any:
+        """在预算内执行协程，超时抛出 asyncio.TimeoutError"""
+        return await asyncio.wait_for(aw, timeout=self.timeout_for(reserve))
+
+    def degrade(self, tag: str):
+        """记录一次降级"""
+        if tag not in self.degradations:
+            self.degradations.append(tag)
+            metrics.inc("degradations_total", tag=tag)
+
+
+__all__ = ["Deadline"]
@@ -1,3 +1,5 @@
+import time
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 
@@ -5,14 +7,33 @@ from app.core.state import AgentState
 from app.core.nodes.retrieval import retrieve_node
 from app.core.nodes.generation import generation_node
 from app.core.nodes.validation import validation_node
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+
+
+def _instrumented(name: str, node):
+    """包装节点：记录耗时直方图 graph_node_seconds{node=...} (含失败 / 取消) 与追踪 span"""
+    async def wrapper(state: AgentState, config: RunnableConfig):
+        start = time.perf_counter()
+        status = "error"
+        try:
+            with tracer.span(f"node.{name}"):
+                result = await node(state, config)
+            status = "ok"
+            return result
+        finally:
+            metrics.observe("graph_node_seconds", time.perf_counter() - start, node=name, status=status)
+    wrapper.__name__ = getattr(node, "__name__", name)
+    return wrapper
+
 
 # 1. 初始化
 workflow = StateGraph(AgentState)
 
 # 2. 添加节点
-workflow.add_node("retrieve", retrieve_node)
-workflow.add_node("generate", generation_node)
-workflow.add_node("validate", validation_node)
+workflow.add_node("retrieve", _instrumented("retrieve", retrieve_node))
+workflow.add_node("generate", _instrumented("generate", generation_node))
+workflow.add_node("validate", _instrumented("validate", validation_node))
 
 # 3. 设置边 (线性结构)
 workflow.set_entry_point("retrieve")
@@ -25,4 +46,4 @@ memory = MemorySaver()
 app = workflow.compile(checkpointer=memory)
 
 # 导出给 main.py 或测试脚本使用
-__all__ = ["app"]
\ No newline at end of file
+__all__ = ["app", "memory"]
\ No newline at end of file
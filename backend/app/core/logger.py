@@ -1,7 +1,19 @@
+import atexit
+import json
+import os
+import queue
+import random
+import subprocess
 import sys
+import threading
+import time
+from contextvars import ContextVar
 from pathlib import Path
+from typing import Dict, List
 from loguru import logger
 
+from app.core.config import settings
+
 # 1. 确定日志保存的路径: backend/logs/
 # current_file: backend/core/logger.py
 # .parent: backend/core
@@ -13,25 +25,305 @@ LOG_DIR = BASE_DIR / "logs"
 LOG_DIR.mkdir(parents=True, exist_ok=True)
 
 log_file_path = LOG_DIR / "app.log"
+# 多 worker 部署时每个 worker 写自己的文件 (app-<pid>.log)：各自轮转、各自计数，
+# 不会出现一个 worker 轮转 / 压缩删除了文件而其他 worker 仍往旧句柄写的情况
+worker_log_path = (
+    log_file_path.with_name(f"{log_file_path.stem}-{os.getpid()}{log_file_path.suffix}")
+    if settings.WORKERS > 1 else log_file_path
+)
+
+# 请求关联ID (与 trace_id 相同)，由接口层设置，沿 asyncio 任务自动传递
+correlation_id: ContextVar[str] = ContextVar("correlation_id", default="-")
+
+
+def _add_correlation_id(record):
+    """patcher: 每条日志都带上当前请求的关联ID"""
+    record["extra"].setdefault("correlation_id", correlation_id.get())
+
+
+class _DebugRateLimiter:
+    """
+    DEBUG 日志的限流 + 采样过滤器
+    每个调用点 (模块:行号) 每秒最多输出 rate 条；sample < 1 时再按比例随机采样
+    INFO 及以上级别不受影响
+    """
+
+    def __init__(self, rate: float, sample: float):
+        self.rate = rate
+        self.sample = sample
+        self._windows: Dict[tuple, List[float]] = {}
+
+    def __call__(self, record) -> bool:
+        if record["level"].no > 10:
+            return True
+        if self.sample < 1.0 and random.random() >= self.sample:
+            return False
+        if self.rate <= 0:
+            return True
+        key = (record["name"], record["line"])
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None or now - window[0] >= 1.0:
+            self._windows[key] = [now, 1]
+            return True
+        window[1] += 1
+        return window[1] <= self.rate
+
+
+def _json_format(record) -> str:
+    """结构化 JSON 行 (字段精简，便于日志系统检索)"""
+    payload = {
+        "ts": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "func": record["function"],
+        "line": record["line"],
+        "msg": record["message"],
+        "correlation_id": record["extra"].get("correlation_id", "-"),
+    }
+    if record["exception"] is not None:
+        payload["exception"] = repr(record["exception"].value)
+    record["extra"]["_json"] = json.dumps(payload, ensure_ascii=False, default=str)
+    return "{extra[_json]}\n"
+
+
+_COMPRESS_SCRIPT = (
+    "import gzip, os, shutil, sys\n"
+    "src = sys.argv[1]\n"
+    "with open(src, 'rb') as f_in, gzip.open(src + '.gz', 'wb') as f_out:\n"
+    "    shutil.copyfileobj(f_in, f_out)\n"
+    "os.remove(src)\n"
+)
+
+
+def _compress_off_process(path: str):
+    """轮转后的日志交给独立子进程压缩，不占用服务进程的 CPU 和 GIL"""
+    subprocess.Popen(
+        [sys.executable, "-c", _COMPRESS_SCRIPT, path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+
+
+def _pid_alive(pid: int) -> bool:
+    """进程是否仍在运行 (Windows 上 os.kill(pid, 0) 会发送 CTRL_C_EVENT，一律视为存活)"""
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # 进程存在但属于其他用户
+    return True
+
+
+def _rotated_path(base: Path, stamp: str) -> Path:
+    """轮转文件名 app.<stamp>.log，重名 (含已压缩的 .gz) 时追加序号"""
+    stem, suffix = base.stem, base.suffix
+    rotated = base.with_name(f"{stem}.{stamp}{suffix}")
+    seq = 1
+    while rotated.exists() or rotated.with_name(rotated.name + ".gz").exists():
+        rotated = base.with_name(f"{stem}.{stamp}.{seq}{suffix}")
+        seq += 1
+    return rotated
+
+
+def _sweep_logs(base: Path, current: Path, retention: float, compress=None):
+    """
+    日志目录清理 (启动时与每次轮转后执行)
+    - 已退出 worker 留下的 app-<pid>.log (重启 / 崩溃后不会再有进程轮转它)：按其最后修改时间改名为轮转文件并压缩
+    - 删除超过保留期的轮转文件
+    多个 worker 可能同时清理，文件已被别人处理 (FileNotFoundError) 时跳过
+    """
+    stem, suffix = base.stem, base.suffix
+    for orphan in base.parent.glob(f"{stem}-*{suffix}"):
+        pid = orphan.name[len(stem) + 1:-len(suffix) or None]
+        if orphan == current or not pid.isdigit() or _pid_alive(int(pid)):
+            continue
+        try:
+            if orphan.stat().st_size == 0:
+                orphan.unlink()
+                continue
+            stamp = time.strftime('%Y-%m-%d_%H-%M-%S', time.localtime(orphan.stat().st_mtime))
+            rotated = _rotated_path(base, f"{stamp}.{pid}")
+            os.replace(orphan, rotated)
+        except FileNotFoundError:
+            continue
+        if compress is not None:
+            compress(str(rotated))
+
+    cutoff = time.time() - retention
+    for old in base.parent.glob(f"{stem}.*"):
+        # 正在写入的文件 (主进程的 app.log / 本 worker 的文件) 不参与清理
+        if old in (current, base):
+            continue
+        try:
+            if old.stat().st_mtime < cutoff:
+                old.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass  # 其他 worker 刚好清理 / 压缩了同一个文件
+
+
+class _RotatingFile:
+    """
+    按大小轮转的日志文件 (只在后台写线程中使用)
+    轮转出的文件交给 compress 处理，并删除超过 retention_days 的旧文件
+    base: 轮转文件的命名基准 (app.log -> app.<时间>[.<pid>].log)，所有 worker 的轮转文件共用同一前缀，
+    由任一 worker 统一按保留期清理 (含已退出 worker 的 app-<pid>.log，见 _sweep_logs)；path 为本进程实际写入的文件
+    """
+
+    def __init__(self, path: Path, max_bytes: int, retention_days: float, compress=None, base: Path = None):
+        self.path = path
+        self.base = base or path
+        self.max_bytes = max_bytes
+        self.retention = retention_days * 86400
+        self.compress = compress
+        self._file = open(path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        _sweep_logs(self.base, self.path, self.retention, compress)
+
+    def write(self, text: str):
+        # max_bytes 与 tell() 都是字节数 (中文日志一个字符占 3 字节)
+        size = len(text.encode("utf-8"))
+        if self._size + size > self.max_bytes and self._size > 0:
+            self._rotate()
+        self._file.write(text)
+        self._size += size
+
+    def flush(self):
+        self._file.flush()
+
+    def _rotate(self):
+        self._file.close()
+        stamp = time.strftime('%Y-%m-%d_%H-%M-%S')
+        if self.path != self.base:
+            stamp += f".{os.getpid()}"
+        rotated = _rotated_path(self.base, stamp)
+        os.replace(self.path, rotated)
+        if self.compress is not None:
+            self.compress(str(rotated))
+        _sweep_logs(self.base, self.path, self.retention, self.compress)
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = 0
+
+
+class _AsyncSink:
+    """
+    非阻塞 loguru sink：调用线程只做 格式化 + 入队 (queue.SimpleQueue，C 实现)，
+    由后台线程批量写出，磁盘 / 管道阻塞不会拖慢请求
+    (loguru 自带的 enqueue 基于 multiprocessing 队列，需要 pickle 整条记录，实测开销是同步写的 2~3 倍)
+    """
+
+    def __init__(self, target, name: str):
+        self.target = target
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        threading.Thread(target=self._run, name=f"log-writer-{name}", daemon=True).start()
+        atexit.register(self.flush)
+
+    def __call__(self, message):
+        self._queue.put(str(message))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            # 把已经排队的记录一次写完再 flush
+            while True:
+                if isinstance(item, threading.Event):
+                    self.target.flush()
+                    item.set()
+                else:
+                    try:
+                        self.target.write(item)
+                    except Exception:
+                        # 写失败 (如磁盘满) 时丢弃该条，写线程不能退出
+                        pass
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self.target.flush()
+
+    def flush(self, timeout: float = 2.0):
+        """等待队列中已有的日志写完 (关闭服务时调用)"""
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+
+_TEXT_FORMAT = (
+    "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+    "<magenta>{extra[correlation_id]}</magenta> | "
+    "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
+)
 
 # 2. 移除默认的 handler（避免重复打印）
 logger.remove()
+logger.configure(patcher=_add_correlation_id)
+
+_debug_filter = _DebugRateLimiter(settings.LOG_DEBUG_RATE_PER_SITE, settings.LOG_DEBUG_SAMPLE_RATE)
 
 # 3. 添加控制台输出 (开发环境用)
-logger.add(
-    sys.stderr,
-    level="DEBUG", # 开发时设为 DEBUG，上线可改为 INFO
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
-)
+# LOG_ASYNC: 写入交给后台线程，请求路径上只剩格式化 + 入队
+_format = _json_format if settings.LOG_JSON else _TEXT_FORMAT
+_async_sinks: List[_AsyncSink] = []
+
+if settings.LOG_ASYNC:
+    _console = _AsyncSink(sys.stderr, "console")
+    _async_sinks.append(_console)
+    logger.add(
+        _console,
+        level=settings.LOG_LEVEL, # 开发时设为 DEBUG，上线可改为 INFO
+        format=_format,
+        colorize=not settings.LOG_JSON and sys.stderr.isatty(),
+        filter=_debug_filter,
+    )
+else:
+    logger.add(
+        sys.stderr,
+        level=settings.LOG_LEVEL,
+        format=_format,
+        colorize=False if settings.LOG_JSON else None,
+        filter=_debug_filter,
+    )
 
 # 4. 添加文件输出 (生产环境用)
-logger.add(
-    log_file_path,
-    rotation="10 MB",  # 每个文件超过 10MB 就自动分割，比如 app.log.1, app.log.2
-    retention="10 days", # 只保留最近 10 天的日志
-    compression="zip", # 旧日志自动压缩，节省空间
-    level="INFO",      # 文件里只存 INFO 及以上级别，减少垃圾信息
-    encoding="utf-8"
-)
+# 每个文件超过 10MB 就自动分割；只保留最近 10 天的日志；旧日志自动压缩 (默认在独立子进程中 gzip)
+# WORKERS > 1 时每个 worker 写 app-<pid>.log
+if settings.LOG_ASYNC:
+    _file = _AsyncSink(
+        _RotatingFile(
+            worker_log_path,
+            max_bytes=10 * 1024 * 1024,
+            retention_days=10,
+            compress=_compress_off_process if settings.LOG_COMPRESS_OFF_PROCESS else None,
+            base=log_file_path,
+        ),
+        "file",
+    )
+    _async_sinks.append(_file)
+    logger.add(_file, level=settings.LOG_FILE_LEVEL, format=_format, colorize=False, filter=_debug_filter)
+else:
+    logger.add(
+        worker_log_path,
+        rotation="10 MB",
+        retention="10 days",
+        compression=_compress_off_process if settings.LOG_COMPRESS_OFF_PROCESS else "zip",
+        level=settings.LOG_FILE_LEVEL, # 文件里只存 INFO 及以上级别，减少垃圾信息
+        format=_format,
+        filter=_debug_filter,
+        encoding="utf-8"
+    )
+    # loguru 的 retention 只管本进程文件的轮转产物，已退出 worker 的文件在启动时统一收尾
+    _sweep_logs(
+        log_file_path, worker_log_path, retention=10 * 86400,
+        compress=_compress_off_process if settings.LOG_COMPRESS_OFF_PROCESS else None,
+    )
+
+
+def flush_logs():
+    """等待异步日志写完 (服务关闭时调用)"""
+    for sink in _async_sinks:
+        sink.flush()
+
 
-__all__ = ["logger"]
\ No newline at end of file
+__all__ = ["logger", "correlation_id", "flush_logs"]
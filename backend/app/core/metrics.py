@@ -0,0 +1,195 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple, Any, List
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+# 默认直方图桶 (秒)，覆盖 1ms ~ 60s
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 命中率派生规则: 计数器名 -> (缓存名前缀, 缓存名所在标签, 结果标签, 命中取值)
+# 导出时按 命中 / 总数 生成 cache_hit_ratio{cache=...}
+# - cache_requests_total: 通用缓存计数 (如检索节点预算不足时复用上一轮上下文)
+# - entity_match_total: 不需要 Embedding + 向量检索的实体匹配 (词法索引 / 推测式检索复用；
+#   fuzzy_vector 为模糊命中后仍做了向量检索，不计入命中)
+# - speculative_graph_total: 图扩展直接用上推测阶段预取的邻居
+# - provider_replay_total: 录制回放命中
+HIT_RATIO_SOURCES = {
+    "cache_requests_total": ("", "cache", "result", ("hit",)),
+    "singleflight_calls_total": ("singleflight_", "group", "role", ("shared",)),
+    "entity_match_total": ("entity_match", "cache", "tier", ("exact", "fuzzy", "speculative")),
+    "speculative_graph_total": ("speculative_graph", "cache", "result", ("hit",)),
+    "provider_replay_total": ("replay_", "endpoint", "result", ("hit",)),
+}
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = tuple(labels) + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    进程内指标注册表 (线程安全)
+    支持计数器、瞬时值和直方图，热路径上的开销是一次加锁 + 一次字典操作
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[LabelKey, float] = {}
+        self._gauges: Dict[LabelKey, float] = {}
+        # 直方图: key -> [各桶计数..., 总和, 总数]
+        self._histograms: Dict[LabelKey, List[float]] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, Any]) -> LabelKey:
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        """计数器累加"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """设置瞬时值 (如: 当前并发数)"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        """瞬时值增减"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0.0) + delta
+
+    def observe(self, name: str, value: float, **labels):
+        """直方图记录一次观测值 (如: 耗时秒数)"""
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = [0.0] * (len(DEFAULT_BUCKETS) + 2)
+            for i, bound in enumerate(DEFAULT_BUCKETS):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            hist[-2] += value
+            hist[-1] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """计时上下文：with metrics.timer("x_seconds", k=v): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def get(self, name: str, **labels) -> float:
+        """读取单个计数器 / 瞬时值"""
+        key = self._key(name, labels)
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+            return self._gauges.get(key, 0.0)
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """导出当前所有指标 (供 monitor 接口使用)"""
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+            histograms = [(key, list(hist)) for key, hist in self._histograms.items()]
+
+        def _rows(items):
+            return [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(items)
+            ]
+
+        hist_rows = []
+        for (name, labels), hist in sorted(histograms):
+            count, total = hist[-1], hist[-2]
+            hist_rows.append({
+                "name": name,
+                "labels": dict(labels),
+                "count": count,
+                "sum": total,
+                "avg": total / count if count else 0.0,
+                "buckets": dict(zip([str(b) for b in DEFAULT_BUCKETS], hist[:-2])),
+            })
+
+        return {"counters": _rows(counters), "gauges": _rows(gauges), "histograms": hist_rows}
+
+    def render_prometheus(self) -> str:
+        """
+        导出 Prometheus 文本格式 (text/plain; version=0.0.4)
+        直方图内部存的是各桶独立计数，这里转换为累积的 _bucket{le=...}
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            histograms = sorted((key, list(hist)) for key, hist in self._histograms.items())
+
+        lines: List[str] = []
+        typed = set()
+
+        def _type(name: str, kind: str):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            _type(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), value in gauges:
+            _type(name, "gauge")
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        for (name, labels), hist in histograms:
+            _type(name, "histogram")
+            cumulative = 0.0
+            for bound, count in zip(DEFAULT_BUCKETS, hist[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', str(bound)),))} {_format_value(cumulative)}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {_format_value(hist[-1])}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist[-2])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {_format_value(hist[-1])}")
+
+        # 派生的缓存命中率
+        hits: Dict[str, List[float]] = {}
+        for (name, labels), value in counters:
+            rule = HIT_RATIO_SOURCES.get(name)
+            if rule is None:
+                continue
+            label_map = dict(labels)
+            prefix, cache_label, result_label, hit_values = rule
+            entry = hits.setdefault(prefix + label_map.get(cache_label, ""), [0.0, 0.0])
+            entry[1] += value
+            if label_map.get(result_label) in hit_values:
+                entry[0] += value
+        for cache, (hit, total) in sorted(hits.items()):
+            _type("cache_hit_ratio", "gauge")
+            lines.append(f"cache_hit_ratio{_format_labels((('cache', cache),))} {_format_value(hit / total if total else 0.0)}")
+
+        return "\n".join(lines) + "\n"
+
+
+# --- 单例导出 ---
+metrics = MetricsRegistry()
+
+__all__ = ["metrics", "MetricsRegistry"]
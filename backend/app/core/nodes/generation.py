@@ -1,33 +1,76 @@
+import asyncio
+import time
 from langchain_core.output_parsers import StrOutputParser
-from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
+from typing import Any, Dict, Optional, Tuple
 
 from app.core.state import AgentState
+from app.core.deadline import Deadline
 from app.services.llm_factory import llm_factory
+from app.services.routing import model_router
 from app.prompts.generation import rag_generation_prompt
+from app.core.tracing import tracer
 from app.core.logger import logger
 
-# 初始化生成链
-llm = llm_factory.get_llm(mode="smart")
-chain = rag_generation_prompt | llm | StrOutputParser()
+_chains: Dict[Tuple[str, Optional[int]], Any] = {}
 
-async def generation_node(state: AgentState) -> Dict[str, Any]:
+def get_chain(mode: str = "smart", max_tokens: Optional[int] = None):
+    """
+    懒加载生成链：首次使用 (或启动预热) 时才创建 LLM 客户端，导入本模块不产生任何开销
+    每种 (模型模式, 输出上限) 组合各缓存一条链 (见 ModelRouter)
+    """
+    key = (mode, max_tokens)
+    if key not in _chains:
+        llm = llm_factory.get_llm(mode=mode)
+        if max_tokens:
+            llm = llm.bind(max_tokens=max_tokens)
+        _chains[key] = rag_generation_prompt | llm | StrOutputParser()
+    return _chains[key]
+
+async def generation_node(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
     """
     🧠 生成节点
     注意：这里只生成内容，不更新 messages 历史，历史更新留给 Validation 节点。
+    模型模式与输出上限由 ModelRouter 按问题复杂度决定 (ROUTING_MODE=off 时始终 smart)
     """
     logger.info("🧠 [GENERATION] 正在生成回答...")
-    
+    deadline = Deadline.from_config(config)
+    route = model_router.route(state)
+    tracer.set_attributes(route_tier=route.tier, route_score=route.score, route_mode=route.generation_mode)
+    if route.tier == "simple":
+        logger.info(f"   - [ROUTING] 简单问题 (得分 {route.score})，使用 {route.generation_mode} 模型")
+
+    inputs = {
+        "context": state.get("rag_context", ""),
+        "messages": state.get("messages", []),
+        "question": state["query"]
+    }
+
     try:
-        response = await chain.ainvoke({
-            "context": state.get("rag_context", ""),
-            "messages": state.get("messages", []),
-            "question": state["query"]
-        })
-        
-        logger.info(f"初步生成回答: {response[:50]}...")
-        
-        return {"answer": response}
-        
+        # 生成阶段可以用完全部剩余预算 (校验可以跳过)
+        start = time.perf_counter()
+        response = await deadline.run(get_chain(route.generation_mode, route.generation_max_tokens).ainvoke(inputs))
+
+        logger.debug("初步生成回答: {}...", response[:50])
+
+    except asyncio.TimeoutError:
+        logger.error("⏱️ [GENERATION] 超出延迟预算")
+        deadline.degrade("generation_timeout")
+        return {"answer": "抱歉，生成回答超时，请稍后重试。", "route": route.model_dump()}
+
     except Exception as e:
         logger.error(f"❌ [GENERATION] 失败: {e}")
-        return {"answer": "抱歉，生成回答时出现错误。"}
\ No newline at end of file
+        return {"answer": "抱歉，生成回答时出现错误。", "route": route.model_dump()}
+
+    # 影子对比是附加的观测：启动失败只记日志，不影响已经生成的回答
+    if route.shadow:
+        try:
+            variant = model_router.shadow_variant(route)
+            model_router.spawn_shadow(
+                route, state["query"], response, time.perf_counter() - start,
+                lambda: get_chain(variant["mode"], variant["max_tokens"]).ainvoke(inputs)
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ [ROUTING] 影子对比启动失败: {e}")
+
+    return {"answer": response, "route": route.model_dump()}
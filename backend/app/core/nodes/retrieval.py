@@ -1,32 +1,66 @@
 from typing import Dict, Any
+from langchain_core.runnables import RunnableConfig
+
 from app.core.state import AgentState
-import app.services.hybrid_search as search_service 
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.metrics import metrics
+import app.services.hybrid_search as search_service
+from app.services.communities import is_global_question
 
 from app.core.logger import logger
 
-async def retrieve_node(state: AgentState) -> Dict[str, Any]:
+def _cached_context(state: AgentState) -> Dict[str, Any]:
+    """预算不足时复用上一轮 (checkpointer 中) 的检索结果"""
+    # 新会话没有上一轮的上下文时记为未命中 (cache_hit_ratio{cache="retrieval_context"})
+    metrics.inc("cache_requests_total", cache="retrieval_context",
+                result="hit" if state.get("rag_context") else "miss")
+    return {
+        "entities": state.get("entities", []),
+        "graph_context": state.get("graph_context", ""),
+        "rag_context": state.get("rag_context", "")
+    }
+
+async def retrieve_node(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
     """
     🔍 检索节点
     """
     query = state["query"]
+    deadline = Deadline.from_config(config)
     logger.info(f"🔍 [RETRIEVAL] 开始检索: {query}")
-    
+
+    # 降级策略：剩余预算连生成都不够了，直接使用缓存的上下文
+    if not deadline.has(settings.BUDGET_GENERATION_MIN_MS / 1000):
+        logger.warning("⏱️ [RETRIEVAL] 预算不足，使用缓存上下文")
+        deadline.degrade("retrieval_cached_context")
+        return _cached_context(state)
+
     try:
         # ✅ 运行时动态从模块中获取最新的 service 实例
         service = search_service.hybrid_search_service
-        
+
         if service is None:
             raise ValueError("HybridSearchService 尚未初始化！")
 
-        # 调用混合检索服务
-        result = await service.search(query)
-        
+        # 检索模式：请求指定 > 服务端默认；auto 按问题关键词判断是否为全局问题
+        mode = config.get("configurable", {}).get("search_mode") or settings.SEARCH_MODE_DEFAULT
+        if mode == "auto":
+            mode = "global" if is_global_question(query) else "local"
+
+        result = None
+        if mode == "global":
+            # 全局检索：社区摘要 map-reduce，不可用时返回 None 退回实体检索
+            result = await service.global_search(query, deadline=deadline)
+        if result is None:
+            # 调用混合检索服务
+            result = await service.search(query, deadline=deadline)
+
         entities = result.get("entities", [])
         graph_ctx = result.get("graph_context", "")
         text_ctx = result.get("context_text", "")
-        
-        logger.info(f"   - 找到实体: {entities}")
-        
+
+        logger.debug("   - 找到实体: {}", entities)
+
         return {
             "entities": entities,
             "graph_context": graph_ctx,
@@ -35,7 +69,7 @@ async def retrieve_node(state: AgentState) -> Dict[str, Any]:
     except Exception as e:
         logger.error(f"❌ [RETRIEVAL] 失败: {e}")
         return {
-            "entities": [], 
-            "graph_context": "", 
+            "entities": [],
+            "graph_context": "",
             "rag_context": "检索服务暂时不可用。"
-        }
\ No newline at end of file
+        }
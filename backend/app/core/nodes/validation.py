@@ -1,9 +1,13 @@
-from typing import Dict, Any, Literal
+import asyncio
+from typing import Dict, Any, Literal, Optional, Set, Tuple
 from pydantic import BaseModel, Field
 from langchain_core.messages import AIMessage
 from langchain_core.output_parsers import PydanticOutputParser # ✅ 引入解析器
+from langchain_core.runnables import RunnableConfig
 
 from app.core.state import AgentState
+from app.core.config import settings
+from app.core.deadline import Deadline
 from app.services.llm_factory import llm_factory
 from app.prompts.validation import validation_prompt
 from app.core.logger import logger
@@ -15,54 +19,115 @@ class ValidationResult(BaseModel):
     status: Literal["valid", "invalid"] = Field(..., description="状态字符串")
 
 # 2. 初始化组件
-llm = llm_factory.get_llm(mode="smart")
-
 parser = PydanticOutputParser(pydantic_object=ValidationResult)
+_chains: Dict[Tuple[str, Optional[int]], Any] = {}
+
+def get_chain(mode: str = "smart", max_tokens: Optional[int] = None):
+    """
+    懒加载校验链：首次使用 (或启动预热) 时才创建 LLM 客户端，导入本模块不产生任何开销
+    每种 (模型模式, 输出上限) 组合各缓存一条链 (见 ModelRouter)
+    """
+    key = (mode, max_tokens)
+    if key not in _chains:
+        # 校验是打分任务，使用 Temp=0 保证结果可复现 (也因此可以安全地对冲)
+        llm = llm_factory.get_llm(mode=mode, temperature=0.0)
+        if max_tokens:
+            llm = llm.bind(max_tokens=max_tokens)
+        # 3. 构建 Chain：Prompt -> LLM -> Parser
+        _chains[key] = validation_prompt | llm | parser
+    return _chains[key]
+
+# 延后执行的校验任务 (持有引用，避免被 GC 回收)
+_deferred_tasks: Set[asyncio.Task] = set()
+
+async def _deferred_validation(inputs: Dict[str, Any], chain):
+    """响应返回之后再跑校验，只记录结果，不影响已返回的回答"""
+    try:
+        score: ValidationResult = await chain.ainvoke(inputs)
+        logger.info(f"   - [延后校验] 结果: {score.status.upper()} | 理由: {score.reason}")
+    except Exception as e:
+        logger.warning(f"⚠️ [VALIDATION] 延后校验失败: {e}")
+
+def _skip_validation(deadline: Deadline, inputs: Dict[str, Any], answer: str, chain) -> Dict[str, Any]:
+    """降级策略：预算不足时跳过校验，或放到后台延后执行"""
+    if settings.VALIDATION_DEFER_ON_BUDGET:
+        task = asyncio.create_task(_deferred_validation(inputs, chain))
+        _deferred_tasks.add(task)
+        task.add_done_callback(_deferred_tasks.discard)
+        deadline.degrade("validation_deferred")
+        status = "deferred"
+    else:
+        deadline.degrade("validation_skipped")
+        status = "skipped"
 
-# 3. 构建 Chain：Prompt -> LLM -> Parser
-chain = validation_prompt | llm | parser
+    logger.warning(f"⏱️ [VALIDATION] 预算不足，校验已{'延后' if status == 'deferred' else '跳过'}")
+    return {
+        "validation_status": status,
+        "validation_reason": "Latency budget exhausted",
+        "answer": answer,
+        "messages": [AIMessage(content=answer)]
+    }
 
-async def validation_node(state: AgentState) -> Dict[str, Any]:
+async def validation_node(state: AgentState, config: RunnableConfig) -> Dict[str, Any]:
     """
     ⚖️ 校验节点 (通用兼容版)
     """
     logger.info("⚖️ [VALIDATION] 正在校验...")
-    
+    deadline = Deadline.from_config(config)
+
     query = state["query"]
     answer = state["answer"]
     context = state.get("rag_context", "")
-    
+
+    # ✅ 必须传入 format_instructions，LangChain 会自动生成一段
+    # "The output should be formatted as a JSON instance..." 的指令
+    inputs = {
+        "question": query,
+        "answer": answer,
+        "context": context,
+        "format_instructions": parser.get_format_instructions()
+    }
+
+    # 与生成节点使用同一个路由结果：简单问题用 strict 模型校验
+    route = state.get("route") or {}
+    chain = get_chain(route.get("validation_mode", "smart"), route.get("validation_max_tokens"))
+
+    if not deadline.has(settings.BUDGET_VALIDATION_MIN_MS / 1000):
+        return _skip_validation(deadline, inputs, answer, chain)
+
     try:
         # 执行校验
-        # ✅ 必须传入 format_instructions，LangChain 会自动生成一段
-        # "The output should be formatted as a JSON instance..." 的指令
-        score: ValidationResult = await chain.ainvoke({
-            "question": query,
-            "answer": answer,
-            "context": context,
-            "format_instructions": parser.get_format_instructions() 
-        })
-        
+        score: ValidationResult = await deadline.run(chain.ainvoke(inputs))
+
         logger.info(f"   - 结果: {score.status.upper()} | 理由: {score.reason}")
-        
+
         # 处理最终回答
         final_answer = answer
-        
+
         # 如果校验不通过，给回答打上补丁
         if not score.is_valid:
             final_answer = f"⚠️ [系统提示: 此回答可能存在偏差]\n{answer}\n\n(校验员备注: {score.reason})"
-        
+
         return {
             "validation_status": score.status,
             "validation_reason": score.reason,
             "answer": final_answer,
             "messages": [AIMessage(content=final_answer)] # 确认无误，写入记忆
         }
-        
+
+    except asyncio.TimeoutError:
+        logger.warning("⏱️ [VALIDATION] 校验超出延迟预算，默认放行")
+        deadline.degrade("validation_timeout")
+        return {
+            "validation_status": "skipped",
+            "validation_reason": "Latency budget exhausted",
+            "messages": [AIMessage(content=answer)]
+        }
+
     except Exception as e:
         logger.warning(f"⚠️ [VALIDATION] 校验解析失败: {e}，默认放行")
         return {
             "validation_status": "error",
             "validation_reason": "JSON Parse Error",
             "messages": [AIMessage(content=answer)]
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,174 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+# 事件循环空闲时的栈顶函数，默认从采样结果中剔除
+_IDLE_LEAVES = {"select", "poll", "epoll", "kqueue", "control", "wait", "_worker"}
+
+
+class SamplingProfiler:
+    """
+    统计采样 CPU 分析器 (进程内，零依赖)
+    后台线程每隔 interval 读取一次所有线程的当前栈 (sys._current_frames)，
+    输出 flamegraph.pl / speedscope 可直接读取的折叠栈格式: "a;b;c 次数"
+
+    同一时间只允许一个分析任务
+    """
+
+    def __init__(self):
+        self._busy = threading.Lock()
+        self._requests_left = 0
+        self._requests_done: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def busy(self) -> bool:
+        return self._busy.locked()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        module = frame.f_globals.get("__name__", os.path.basename(code.co_filename))
+        return f"{module}:{code.co_name}"
+
+    def _sample_loop(self, stop: threading.Event, interval: float, include_idle: bool, stacks: Counter):
+        own = threading.get_ident()
+        while not stop.wait(interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                if not include_idle and frame.f_code.co_name in _IDLE_LEAVES:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(self._frame_label(frame))
+                    frame = frame.f_back
+                stacks[";".join(reversed(labels))] += 1
+
+    def request_finished(self):
+        """接口层在每个对话请求结束时调用，用于 "分析接下来 N 个请求" 模式"""
+        if self._requests_done is None or self._requests_left <= 0:
+            return
+        self._requests_left -= 1
+        if self._requests_left == 0:
+            self._loop.call_soon_threadsafe(self._requests_done.set)
+
+    async def profile(self, seconds: Optional[float] = None, requests: Optional[int] = None,
+                      interval_ms: float = 5.0, include_idle: bool = False) -> str:
+        """
+        采样 seconds 秒，或直到接下来 requests 个请求完成 (以 PROFILER_MAX_SECONDS 为上限)
+        返回折叠栈文本
+        """
+        if not self._busy.acquire(blocking=False):
+            raise RuntimeError("已有分析任务在运行")
+
+        stop = threading.Event()
+        stacks: Counter = Counter()
+        sampler = threading.Thread(
+            target=self._sample_loop, args=(stop, interval_ms / 1000, include_idle, stacks),
+            name="sampling-profiler", daemon=True,
+        )
+        limit = min(seconds or settings.PROFILER_MAX_SECONDS, settings.PROFILER_MAX_SECONDS)
+        start = time.perf_counter()
+        try:
+            if requests:
+                self._loop = asyncio.get_running_loop()
+                self._requests_done = asyncio.Event()
+                self._requests_left = requests
+            sampler.start()
+            if requests:
+                try:
+                    await asyncio.wait_for(self._requests_done.wait(), timeout=limit)
+                except asyncio.TimeoutError:
+                    logger.warning(f"⏱️ 分析超时: {limit}s 内只完成了 {requests - self._requests_left}/{requests} 个请求")
+            else:
+                await asyncio.sleep(limit)
+        finally:
+            stop.set()
+            await asyncio.to_thread(sampler.join)
+            self._requests_done = None
+            self._requests_left = 0
+            self._busy.release()
+
+        logger.info(f"🔬 采样分析完成: {time.perf_counter() - start:.1f}s, {sum(stacks.values())} 个样本")
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+
+def _module_of(filename: str) -> str:
+    """把源文件路径还原成模块名 (按 sys.path 中最长的前缀)"""
+    best = ""
+    for path in sys.path:
+        if path and filename.startswith(path) and len(path) > len(best):
+            best = path
+    relative = filename[len(best):].lstrip(os.sep) if best else filename
+    module = relative[:-3] if relative.endswith(".py") else relative
+    module = module.replace(os.sep, ".")
+    return module[:-9] if module.endswith(".__init__") else module
+
+
+class MemoryProfiler:
+    """
+    tracemalloc 快照对比
+    start() 记录基线；diff() 与基线比较，按模块汇总新增内存
+    """
+
+    def __init__(self):
+        self._baseline: Optional[tracemalloc.Snapshot] = None
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self._baseline = tracemalloc.take_snapshot()
+        return {"tracing": True, "baseline_bytes": sum(s.size for s in self._baseline.statistics("filename"))}
+
+    def stop(self) -> Dict[str, Any]:
+        tracemalloc.stop()
+        self._baseline = None
+        return {"tracing": False}
+
+    def diff(self, limit: int = 30) -> Dict[str, Any]:
+        """与基线对比 (按模块汇总)，返回增长最多的 limit 个模块"""
+        if not tracemalloc.is_tracing() or self._baseline is None:
+            raise RuntimeError("tracemalloc 未启动，请先调用 start")
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+        by_module: Dict[str, List[int]] = {}
+        for stat in snapshot.compare_to(self._baseline, "filename"):
+            module = _module_of(stat.traceback[0].filename)
+            entry = by_module.setdefault(module, [0, 0, 0])
+            entry[0] += stat.size_diff
+            entry[1] += stat.size
+            entry[2] += stat.count_diff
+
+        rows = sorted(by_module.items(), key=lambda kv: kv[1][0], reverse=True)[:limit]
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "traced_current_bytes": current,
+            "traced_peak_bytes": peak,
+            "modules": [
+                {"module": m, "size_diff_bytes": d, "size_bytes": s, "count_diff": c}
+                for m, (d, s, c) in rows
+            ],
+        }
+
+
+# --- 单例导出 ---
+sampling_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
+
+__all__ = ["sampling_profiler", "memory_profiler"]
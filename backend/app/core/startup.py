@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.nodes import generation, validation
+import app.services.hybrid_search as search_service
+import app.services.neo4j_service as neo4j_svc
+from app.services.health import health_prober
+
+
+class StartupState:
+    """
+    启动阶段状态
+    - warming: 正在初始化 / 预热，不接收对话请求
+    - ready: 全部组件初始化成功
+    - degraded: 初始化已结束，但有组件失败 (对话接口仍可用，相关功能降级)
+    """
+
+    def __init__(self):
+        self.status = "warming"
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.components: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.status != "warming"
+
+    def summary(self) -> Dict[str, Any]:
+        end = self.finished_at or time.monotonic()
+        return {
+            "status": self.status,
+            "elapsed_ms": round((end - self.started_at) * 1000, 1),
+            "components": self.components,
+        }
+
+
+startup_state = StartupState()
+
+
+async def _timed(name: str, func: Callable[[], Any]):
+    """在线程中执行一个 (阻塞的) 初始化步骤，记录耗时与结果"""
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(func)
+        status, error = "ok", None
+    except Exception as e:
+        status, error = "failed", str(e)
+        logger.error(f"❌ 启动步骤 {name} 失败: {e}")
+    startup_state.components[name] = {
+        "status": status,
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        **({"error": error} if error else {}),
+    }
+
+
+def _init_search():
+    search_service.init_hybrid_search()
+    if search_service.hybrid_search_service is None:
+        raise RuntimeError("HybridSearchService 初始化失败")
+
+
+def _init_chains():
+    generation.get_chain()
+    validation.get_chain()
+    # 路由开启时简单问题走 fast / strict，影子模式下 fast 只在后台使用，同样预先创建
+    if settings.ROUTING_MODE != "off":
+        generation.get_chain("fast", settings.ROUTING_SIMPLE_MAX_TOKENS)
+    if settings.ROUTING_MODE == "on":
+        validation.get_chain("strict", settings.ROUTING_VALIDATION_MAX_TOKENS)
+        validation.get_chain("smart", settings.ROUTING_VALIDATION_MAX_TOKENS)
+
+
+def _verify_neo4j():
+    if neo4j_svc.neo4j_manager is None:
+        raise RuntimeError("Neo4jManager 未创建")
+    neo4j_svc.neo4j_manager.verify()
+
+
+async def warm_up():
+    """
+    可选预热：提前建立 HTTP / 数据库连接池，并用预设查询预先跑一遍检索
+    """
+    service = search_service.hybrid_search_service
+    tasks = []
+    if service is not None:
+        tasks.append(service.embeddings.aembed_query("warmup"))
+        for query in settings.WARMUP_QUERIES:
+            tasks.append(service.search(query))
+    if neo4j_svc.neo4j_manager is not None:
+        tasks.append(neo4j_svc.neo4j_manager.aexecute_query("RETURN 1 AS ok"))
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    failures = [r for r in results if isinstance(r, Exception)]
+    startup_state.components["warmup"] = {
+        "status": "ok" if not failures else "partial",
+        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+        "tasks": len(tasks),
+        "failures": len(failures),
+    }
+
+
+async def run_startup():
+    """
+    并发初始化相互独立的组件：Neo4j 连接、Qdrant + 检索服务、生成 / 校验链
+    """
+    logger.info("🔄 正在并发初始化核心服务...")
+    await asyncio.gather(
+        _timed("neo4j", _verify_neo4j),
+        _timed("hybrid_search", _init_search),
+        _timed("llm_chains", _init_chains),
+    )
+
+    if settings.WARMUP_ENABLED:
+        await warm_up()
+
+    failed = [name for name, c in startup_state.components.items() if c["status"] == "failed"]
+    startup_state.status = "degraded" if failed else "ready"
+    startup_state.finished_at = time.monotonic()
+    # 组件就绪后再开始后台探测 (避免与初始化同时打开嵌入式 Qdrant)
+    health_prober.start()
+    logger.success(f"🚀 启动完成: {startup_state.status} ({startup_state.summary()['elapsed_ms']}ms)")
+
+
+__all__ = ["startup_state", "run_startup"]
@@ -1,5 +1,5 @@
 import operator
-from typing import Annotated, List, TypedDict, Optional
+from typing import Annotated, Any, Dict, List, TypedDict, Optional
 from langchain_core.messages import BaseMessage
 from langgraph.graph.message import add_messages
 
@@ -20,7 +20,8 @@ class AgentState(TypedDict):
     
     # ---------------- 中间结果 ----------------
     answer: str              # 生成节点产生的原始回答
+    route: Dict[str, Any]    # 模型路由结果 (RouteDecision)，生成 / 校验节点共用
     
     # ---------------- 校验结果 ----------------
-    validation_status: str   # valid / invalid / error
+    validation_status: str   # valid / invalid / error / skipped / deferred
     validation_reason: str   # 评分理由
\ No newline at end of file
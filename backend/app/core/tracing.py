@@ -0,0 +1,231 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+class Span:
+    """一个计时区间 (节点 / 服务调用)，属性用于记录实体数、返回边数、token 数等"""
+
+    __slots__ = ("trace", "name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self, origin_ns: int) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "offset_ms": round((self.start_ns - origin_ns) / 1e6, 2),
+            "duration_ms": round(self.duration_ms, 2),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    """一次请求的全部 span，根 span 结束时整体进入环形缓冲"""
+
+    __slots__ = ("trace_id", "thread_id", "spans", "root")
+
+    def __init__(self, name: str, thread_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace_id = os.urandom(16).hex()
+        self.thread_id = thread_id
+        self.root = Span(self, name, None, attributes)
+        self.spans: List[Span] = [self.root]
+
+    @property
+    def duration_ms(self) -> float:
+        return self.root.duration_ms
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "thread_id": self.thread_id,
+            "name": self.root.name,
+            "status": self.root.status,
+            "duration_ms": round(self.duration_ms, 2),
+            "spans": len(self.spans),
+        }
+
+    def waterfall(self) -> Dict[str, Any]:
+        """按开始时间排序的 span 列表 (offset_ms 相对于请求开始)"""
+        origin = self.root.start_ns
+        spans = sorted(self.spans, key=lambda s: s.start_ns)
+        return {**self.summary(), "waterfall": [s.to_dict(origin) for s in spans]}
+
+
+# 当前任务所在的 span，沿 asyncio 任务自动传递
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class _OTLPFileExporter:
+    """
+    把完成的 trace 以 OTLP/JSON (ExportTraceServiceRequest) 逐行追加到本地文件
+    由后台线程写盘，请求路径上只做一次入队
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Trace]" = queue.SimpleQueue()
+        threading.Thread(target=self._run, name="otlp-file-exporter", daemon=True).start()
+
+    def export(self, trace: Trace):
+        self._queue.put(trace)
+
+    @staticmethod
+    def _attr(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {"key": key, "value": {"boolValue": value}}
+        if isinstance(value, int):
+            return {"key": key, "value": {"intValue": str(value)}}
+        if isinstance(value, float):
+            return {"key": key, "value": {"doubleValue": value}}
+        return {"key": key, "value": {"stringValue": str(value)}}
+
+    def _encode(self, trace: Trace) -> str:
+        spans = [{
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or s.start_ns),
+            "attributes": [self._attr(k, v) for k, v in s.attributes.items()],
+            "status": {"code": 1 if s.status == "ok" else 2},
+        } for s in trace.spans]
+        return json.dumps({"resourceSpans": [{
+            "resource": {"attributes": [self._attr("service.name", "agentic-graphrag")]},
+            "scopeSpans": [{"scope": {"name": "app.core.tracing"}, "spans": spans}],
+        }]}, ensure_ascii=False)
+
+    def _run(self):
+        while True:
+            trace = self._queue.get()
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(self._encode(trace) + "\n")
+            except Exception as e:
+                logger.warning(f"⚠️ trace 导出失败: {e}")
+
+
+class Tracer:
+    """
+    轻量级请求追踪
+    - start_trace(): 接口层创建根 span；activate() 在执行图的任务中设为当前 span
+    - span(): 节点 / 服务调用处创建子 span (不在任何 trace 中时是空操作)
+    - 完成的 trace 进入有界环形缓冲，可按最近 / 最慢 / thread_id 查询
+    """
+
+    def __init__(self, capacity: int, export_path=None):
+        self._buffer: Deque[Trace] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._exporter = _OTLPFileExporter(export_path) if export_path else None
+
+    def start_trace(self, name: str, thread_id: Optional[str] = None, **attributes) -> Optional[Span]:
+        """创建根 span (不设置为当前 span，调用方在执行任务中 activate)"""
+        if not settings.TRACING_ENABLED:
+            return None
+        if thread_id is not None:
+            attributes["thread_id"] = thread_id
+        return Trace(name, thread_id, attributes).root
+
+    @staticmethod
+    def activate(span: Optional[Span]):
+        """把 span 设为当前任务的当前 span (任务结束即失效，无需恢复)"""
+        if span is not None:
+            _current_span.set(span)
+
+    def finish(self, root: Optional[Span], status: str = "ok"):
+        """结束根 span，把整条 trace 放入环形缓冲 (可重复调用)"""
+        if root is None or root.end_ns is not None:
+            return
+        root.end_ns = time.time_ns()
+        root.status = status
+        with self._lock:
+            self._buffer.append(root.trace)
+        if self._exporter is not None:
+            self._exporter.export(root.trace)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """创建子 span：with tracer.span("qdrant.search", k=2) as span: ..."""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, parent.span_id, attributes)
+        parent.trace.spans.append(span)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.status = "cancelled" if isinstance(e, asyncio.CancelledError) else "error"
+            span.attributes.setdefault("error", type(e).__name__)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+
+    @staticmethod
+    def set_attributes(**attributes):
+        """给当前 span 追加属性 (不在 trace 中时忽略)"""
+        span = _current_span.get()
+        if span is not None:
+            span.attributes.update(attributes)
+
+    # --- 查询 ---
+    @property
+    def size(self) -> int:
+        return len(self._buffer)
+
+    def _snapshot(self) -> List[Trace]:
+        with self._lock:
+            return list(self._buffer)
+
+    def recent(self, limit: int = 20, thread_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        traces = [t for t in reversed(self._snapshot()) if thread_id is None or t.thread_id == thread_id]
+        return [t.summary() for t in traces[:limit]]
+
+    def slowest(self, limit: int = 20, thread_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        traces = [t for t in self._snapshot() if thread_id is None or t.thread_id == thread_id]
+        traces.sort(key=lambda t: t.duration_ms, reverse=True)
+        return [t.summary() for t in traces[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        for trace in self._snapshot():
+            if trace.trace_id == trace_id:
+                return trace.waterfall()
+        return None
+
+
+# --- 单例导出 ---
+tracer = Tracer(settings.TRACE_BUFFER_SIZE, settings.TRACE_EXPORT_PATH)
+
+__all__ = ["tracer", "Tracer", "Span"]
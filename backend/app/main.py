@@ -1,24 +1,33 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 
-from app.core.logger import logger
+from app.core.logger import logger, flush_logs
 from app.api.endpoints import router as chat_router
 from app.api.monitor import router as monitor_router
 
 # ✅ 引入初始化函数
-from app.services.hybrid_search import init_hybrid_search
+from app.core.startup import run_startup
+import app.services.neo4j_service as neo4j_svc
+from app.services.health import health_prober
 
 # 定义生命周期管理器
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # 🟢 启动时执行：初始化服务
-    logger.info("🔄 正在初始化核心服务...")
-    init_hybrid_search()
+    # 🟢 启动时执行：后台并发初始化服务，端口立即可用 (就绪前 /monitor/ready 返回 503)
+    startup_task = asyncio.create_task(run_startup())
     yield
     # 🔴 关闭时执行（可选）：清理资源
     logger.info("🛑 服务正在关闭...")
+    if not startup_task.done():
+        startup_task.cancel()
+    await health_prober.stop()
+    if neo4j_svc.neo4j_manager:
+        await neo4j_svc.neo4j_manager.aclose()
+    # 等待异步日志队列写完
+    await asyncio.to_thread(flush_logs)
 
 # 初始化 FastAPI (挂载 lifespan)
 app = FastAPI(
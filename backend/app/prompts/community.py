@@ -0,0 +1,39 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+# 社区摘要 Prompt (离线任务：python -m app.cli.build_communities)
+community_summary_prompt = ChatPromptTemplate.from_messages([
+    ("system", """你是一个知识图谱分析助手。下面给出知识图谱中的一个 "社区"（联系紧密的一组实体），请为它写一段摘要。
+
+    【摘要要求】
+    1. 标题：用一句话概括这个社区的主题（不超过 20 字）。
+    2. 摘要：说明社区中的核心实体、它们之间的主要关系，以及整体反映出的主题或趋势（不超过 300 字）。
+    3. 只依据给出的信息，不要编造。
+
+    【格式要求】
+    请严格遵守以下 JSON 输出格式：
+    {format_instructions}
+    """),
+    ("user", """
+    {content}
+    """)
+])
+
+# 全局检索的 map 阶段 Prompt：从单个社区摘要中提取与问题相关的要点并打分
+global_map_prompt = ChatPromptTemplate.from_messages([
+    ("system", """你是一个信息分析助手。请根据给出的社区摘要，提取与用户问题相关的要点，并为这些要点对回答问题的帮助程度打分。
+
+    【要求】
+    1. 要点：最多 5 条，每条一句话，只依据摘要内容。
+    2. 评分：0~100 的整数，摘要与问题无关时给 0 并返回空要点列表。
+
+    【格式要求】
+    请严格遵守以下 JSON 输出格式：
+    {format_instructions}
+    """),
+    ("user", """
+    用户问题：{question}
+
+    社区标题：{title}
+    社区摘要：{summary}
+    """)
+])
@@ -0,0 +1,17 @@
+from langchain_core.prompts import ChatPromptTemplate
+
+# 实体卡片摘要 Prompt (离线任务：python -m app.cli.build_entity_cards --summarize)
+entity_card_prompt = ChatPromptTemplate.from_messages([
+    ("system", """你是一个知识图谱分析助手。请根据实体的属性和关系，用一两句话（不超过 80 字）介绍这个实体。
+
+    【要求】
+    1. 只依据给出的信息，不要编造。
+    2. 直接输出介绍文字，不要输出标题、列表或其他格式。
+    """),
+    ("user", """
+    实体：{name}
+    属性：{attributes}
+    关系：
+    {relations}
+    """)
+])
@@ -17,4 +17,24 @@ entity_extraction_prompt = ChatPromptTemplate.from_messages([
     查询语句：{query}
     参考文本：{text}
     """)
-])
\ No newline at end of file
+])
+
+# 批量实体抽取 Prompt (微批处理：一次调用处理多条相互独立的查询)
+batch_entity_extraction_prompt = ChatPromptTemplate.from_messages([
+    ("system", """你是一个专业的信息提取助手。下面给出多条相互独立的查询，请分别从每条查询中提取专有名词（实体），并返回 JSON 格式。
+
+    【提取要求】
+    1. 提取目标：人名、公司名、产品名、地名、特定技术名词等。
+    2. 保持原词：不要翻译或修改实体名称。
+    3. 每条查询单独提取，用 index 标明对应的查询编号；如果没有明显实体，该条返回空列表。
+    4. 每条查询都必须有一个结果，不要遗漏。
+
+    【格式要求】
+    请严格遵守以下 JSON 输出格式：
+    {format_instructions}
+    """),
+    ("user", """
+    查询列表：
+    {queries}
+    """)
+])
@@ -0,0 +1,64 @@
+"""
+多进程 (prefork) 启动器
+
+用法 (在 backend 目录下):
+    python -m app.serve --workers 4
+    python -m app.serve --export-only      # 只刷新共享索引快照
+
+- QDRANT_URL 为 Qdrant 服务地址时：各 worker 直接连接服务，无需快照
+- QDRANT_URL 为本地路径 (嵌入式，带文件锁) 时：本进程作为唯一写者打开嵌入式库，
+  导出只读快照到 SHARED_INDEX_DIR 后释放文件锁；worker 以 mmap 共享同一份快照
+  (向量、payload、实体名都按需读取，不随 worker 数复制；只有实体名词法索引由每个 worker 各自构建)
+  写入 (数据导入) 仍只经由嵌入式库，导入后重启服务或执行 --export-only 即可生效
+- 出站限流额度按 worker 数均分，Neo4j 连接池按 NEO4J_POOL_SIZE 为每个 worker 单独创建
+"""
+import argparse
+import os
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.logger import logger
+
+
+def export_shared_index() -> int:
+    """从嵌入式 Qdrant 导出实体集合快照，并释放文件锁"""
+    from app.services.qdrant_service import qdrant_manager
+    from app.services.shared_index import SharedVectorIndex
+    from app.services.hybrid_search import entity_collection_name
+
+    collection_name = entity_collection_name()
+    client = qdrant_manager.get_client()
+    try:
+        if not client.collection_exists(collection_name):
+            logger.warning(f"⚠️ 集合 {collection_name} 不存在，导出空快照")
+        return SharedVectorIndex.export(client, collection_name, settings.SHARED_INDEX_DIR)
+    finally:
+        qdrant_manager.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多 worker 启动 Agentic GraphRAG API")
+    parser.add_argument("--workers", type=int, default=max(settings.WORKERS, os.cpu_count() or 1))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--export-only", action="store_true", help="只导出共享索引快照后退出")
+    args = parser.parse_args()
+
+    embedded = not settings.QDRANT_URL.startswith(("http://", "https://"))
+    if args.export_only:
+        export_shared_index()
+        return
+
+    # worker 通过环境变量继承部署参数 (Settings 在各 worker 中重新读取)
+    os.environ["WORKERS"] = str(args.workers)
+    if embedded and args.workers > 1:
+        export_shared_index()
+        os.environ["SHARED_INDEX_READONLY"] = "true"
+
+    logger.info(f"🚀 启动 {args.workers} 个 worker (Qdrant: {'共享快照' if embedded and args.workers > 1 else settings.QDRANT_URL})")
+    uvicorn.run("app.main:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# app/services/batching.py
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+
+class MicroBatcher:
+    """
+    跨请求的微批处理器
+    在 max_wait 时间窗口内到达的调用 (最多 max_batch 个) 合并成一次批量调用，结果按顺序分发回各调用者
+
+    handler 接收输入列表，返回等长的结果列表；某一项结果为 Exception 时只让对应的调用者失败
+    """
+
+    def __init__(self,
+                 name: str,
+                 handler: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch: int,
+                 max_wait_ms: float):
+        self.name = name
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._running: Set[asyncio.Task] = set()
+
+    async def submit(self, item: Any) -> Any:
+        """提交单个输入，等待所在批次返回对应结果"""
+        if not settings.BATCHING_ENABLED or self.max_batch <= 1:
+            return (await self.handler([item]))[0]
+
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((item, fut))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # 已取消的调用者不再占用批次名额
+        live = [(item, fut) for item, fut in self._pending if not fut.done()]
+        batch, self._pending = live[:self.max_batch], live[self.max_batch:]
+
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future]]):
+        start = time.perf_counter()
+        metrics.inc("batcher_batches_total", batcher=self.name)
+        metrics.inc("batcher_items_total", len(batch), batcher=self.name)
+        try:
+            results = await self.handler([item for item, _ in batch])
+            if len(results) != len(batch):
+                raise ValueError(f"批处理结果数量不匹配: {len(results)} != {len(batch)}")
+        except Exception as e:
+            logger.warning(f"⚠️ 批处理 {self.name} 失败 (size={len(batch)}): {e}")
+            results = [e] * len(batch)
+        metrics.observe("batcher_call_seconds", time.perf_counter() - start, batcher=self.name)
+
+        for (_, fut), result in zip(batch, results):
+            if fut.done():
+                continue
+            if isinstance(result, Exception):
+                fut.set_exception(result)
+            else:
+                fut.set_result(result)
+
+    def summary(self) -> Dict[str, Any]:
+        return {"batcher": self.name, "pending": len(self._pending), "running": len(self._running)}
+
+
+__all__ = ["MicroBatcher"]
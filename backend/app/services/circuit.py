@@ -0,0 +1,134 @@
+# app/services/circuit.py
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+# Prometheus 中的状态编码
+_STATE_CODES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于 open 状态，调用被直接拒绝 (不排队、不重试)"""
+
+    def __init__(self, backend: str, retry_in: float):
+        super().__init__(f"{backend} 熔断中，{retry_in:.1f}s 后重试")
+        self.backend = backend
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    单个后端的熔断器 (closed / open / half_open)
+    - closed: 连续失败达到 failure_threshold 次 -> open
+    - open: 直接拒绝调用；reset_timeout 秒后 (或后台探测成功) -> half_open
+    - half_open: 最多放行 half_open_max_calls 个试探调用，成功 -> closed，失败 -> open
+
+    只在事件循环线程中使用，不需要加锁
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float, half_open_max_calls: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trials = 0
+        self.transitions: Deque[Dict[str, Any]] = deque(maxlen=50)
+        breaker_registry[name] = self
+        metrics.set_gauge("circuit_state", 0, backend=name)
+
+    def _transition(self, state: str, reason: str):
+        previous, self.state = self.state, state
+        self.transitions.append({"at": time.time(), "from": previous, "to": state, "reason": reason})
+        metrics.set_gauge("circuit_state", _STATE_CODES[state], backend=self.name)
+        metrics.inc("circuit_transitions_total", backend=self.name, to=state)
+        if state == "open":
+            logger.warning(f"🔌 熔断 {self.name}: {previous} -> open ({reason})")
+        else:
+            logger.info(f"🔌 熔断 {self.name}: {previous} -> {state} ({reason})")
+
+    def _open(self, reason: str):
+        self.opened_at = time.monotonic()
+        self._trials = 0
+        if self.state != "open":
+            self._transition("open", reason)
+
+    def retry_in(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    @property
+    def is_open(self) -> bool:
+        """是否应直接走降级路径 (只读，不消耗 half_open 的试探名额)"""
+        return settings.CIRCUIT_BREAKER_ENABLED and self.state == "open" and self.retry_in() > 0
+
+    def allow(self) -> bool:
+        """调用前检查；half_open 时会占用一个试探名额"""
+        if not settings.CIRCUIT_BREAKER_ENABLED or self.state == "closed":
+            return True
+        if self.state == "open":
+            if self.retry_in() > 0:
+                return False
+            self._transition("half_open", "reset_timeout")
+            self._trials = 0
+        if self._trials >= self.half_open_max_calls:
+            return False
+        self._trials += 1
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        if self.state == "half_open":
+            self._transition("closed", "trial_succeeded")
+
+    def record_failure(self, reason: str):
+        if self.state == "half_open":
+            self._open(f"trial_failed: {reason}")
+            return
+        self.failures += 1
+        if self.state == "closed" and self.failures >= self.failure_threshold:
+            self._open(f"{self.failures} consecutive failures: {reason}")
+
+    def abandon(self):
+        """试探调用被取消 (既非成功也非失败)：归还试探名额"""
+        if self.state == "half_open" and self._trials > 0:
+            self._trials -= 1
+
+    def probe_result(self, healthy: bool, reason: str = ""):
+        """
+        后台健康探测结果
+        探测失败直接 open (探测比单次业务调用更能说明后端不可用)；open 时探测成功提前进入 half_open
+        """
+        if not settings.CIRCUIT_BREAKER_ENABLED:
+            return
+        if not healthy:
+            self._open(f"probe: {reason}" if reason else "probe")
+        elif self.state == "open":
+            self._transition("half_open", "probe_succeeded")
+            self._trials = 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "retry_in_s": round(self.retry_in(), 1) if self.state == "open" else None,
+            "transitions": list(self.transitions)[-10:],
+        }
+
+
+def circuit_open(name: str) -> bool:
+    """name 对应的后端是否处于熔断中 (未注册的后端视为正常)"""
+    breaker: Optional[CircuitBreaker] = breaker_registry.get(name)
+    return breaker is not None and breaker.is_open
+
+
+# 所有已创建的熔断器 (backend 名 -> breaker)，供 monitor 查看
+breaker_registry: Dict[str, CircuitBreaker] = {}
+
+__all__ = ["CircuitBreaker", "CircuitOpenError", "breaker_registry", "circuit_open"]
@@ -0,0 +1,250 @@
+# app/services/communities.py
+import asyncio
+import random
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, Field
+from langchain_core.output_parsers import PydanticOutputParser
+from qdrant_client import models
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.prompts.community import community_summary_prompt
+
+# 社区摘要向量集合名
+COMMUNITY_COLLECTION = "community-summaries"
+
+# 读取全部实体关系 (离线任务，一次性读出)
+EDGES_CYPHER = """
+MATCH (s:Entity)-[r]->(t:Entity)
+RETURN s.name AS source, type(r) AS rel, t.name AS target
+"""
+
+
+class CommunitySummary(BaseModel):
+    title: str = Field(..., description="社区主题 (一句话)")
+    summary: str = Field(..., description="社区摘要")
+
+
+def label_propagation(adjacency: Dict[str, Dict[str, float]], seed: int = 42, max_iter: int = 30) -> Dict[str, str]:
+    """
+    加权标签传播 (确定性：固定种子的遍历顺序，平票时取字典序最小的标签)
+    返回 节点 -> 社区标签
+    """
+    labels = {node: node for node in adjacency}
+    order = sorted(adjacency)
+    rng = random.Random(seed)
+    for _ in range(max_iter):
+        rng.shuffle(order)
+        changed = False
+        for node in order:
+            weights: Dict[str, float] = defaultdict(float)
+            for neighbor, weight in adjacency[node].items():
+                weights[labels[neighbor]] += weight
+            if not weights:
+                continue
+            best = max(weights.values())
+            candidates = sorted(label for label, weight in weights.items() if weight == best)
+            new_label = labels[node] if labels[node] in candidates else candidates[0]
+            if new_label != labels[node]:
+                labels[node] = new_label
+                changed = True
+        if not changed:
+            break
+    return labels
+
+
+def detect_communities(edges: Iterable[Tuple[str, str, str]], max_levels: int = 3,
+                       seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    层次社区划分：第 0 层在实体图上做标签传播，之后每层把上一层的社区缩成一个节点
+    (社区间边数作为权重) 再做一次，直到不再合并或达到 max_levels
+    返回社区列表: {"id", "level", "members" (全部实体名), "children" (下层社区ID), "parent"}
+    """
+    adjacency: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for source, _, target in edges:
+        if source == target:
+            continue
+        adjacency[source][target] += 1.0
+        adjacency[target][source] += 1.0
+
+    members_of: Dict[str, List[str]] = {node: [node] for node in adjacency}
+    communities: List[Dict[str, Any]] = []
+    # 本层节点 ID -> 实际记录的社区 (没有合并的社区沿用下层记录)
+    record_of: Dict[str, Dict[str, Any]] = {}
+
+    for level in range(max_levels):
+        labels = label_propagation(adjacency, seed=seed + level)
+        groups: Dict[str, List[str]] = defaultdict(list)
+        for node, label in labels.items():
+            groups[label].append(node)
+        if level > 0 and len(groups) == len(adjacency):
+            break
+
+        node_to_community: Dict[str, str] = {}
+        next_members: Dict[str, List[str]] = {}
+        next_records: Dict[str, Dict[str, Any]] = {}
+        ordered = sorted(groups.values(), key=lambda nodes: (-len(nodes), min(nodes)))
+        for index, nodes in enumerate(ordered):
+            community_id = f"L{level}-{index}"
+            members = sorted({m for node in nodes for m in members_of[node]})
+            next_members[community_id] = members
+            for node in nodes:
+                node_to_community[node] = community_id
+            if level > 0 and len(nodes) == 1:
+                # 高层只记录真正发生了合并的社区
+                next_records[community_id] = record_of[nodes[0]]
+                continue
+            children = [record_of[node] for node in nodes] if level > 0 else []
+            community = {
+                "id": community_id,
+                "level": level,
+                "members": members,
+                "children": sorted(child["id"] for child in children),
+                "parent": None,
+            }
+            for child in children:
+                child["parent"] = community_id
+            communities.append(community)
+            next_records[community_id] = community
+
+        next_adjacency: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for node, neighbors in adjacency.items():
+            a = node_to_community[node]
+            for neighbor, weight in neighbors.items():
+                b = node_to_community[neighbor]
+                if a != b:
+                    next_adjacency[a][b] += weight
+        # 孤立社区也要保留为节点
+        for community_id in next_members:
+            next_adjacency.setdefault(community_id, defaultdict(float))
+
+        adjacency, members_of, record_of = next_adjacency, next_members, next_records
+        if len(groups) <= 1:
+            break
+
+    return communities
+
+
+class CommunityBuilder:
+    """
+    离线构建社区摘要：读取实体图 -> 层次社区划分 -> fast 模型逐个摘要 (自底向上) -> 向量化写入 Qdrant
+    由 python -m app.cli.build_communities 调用
+    """
+
+    def __init__(self, llm, embeddings, graph, qdrant_client, concurrency: int = 8,
+                 collection_name: str = COMMUNITY_COLLECTION):
+        self.parser = PydanticOutputParser(pydantic_object=CommunitySummary)
+        self.chain = community_summary_prompt | llm | self.parser
+        self.embeddings = embeddings
+        self.graph = graph
+        self.client = qdrant_client
+        self.collection_name = collection_name
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def load_edges(self) -> List[Tuple[str, str, str]]:
+        records = self.graph.execute_query(EDGES_CYPHER)
+        return [(r["source"], r["rel"], r["target"]) for r in records if r.get("source") and r.get("target")]
+
+    @staticmethod
+    def _leaf_content(community: Dict[str, Any], edges: Sequence[Tuple[str, str, str]]) -> str:
+        members = set(community["members"])
+        relations = [f"{s} -[{r}]-> {t}" for s, r, t in edges if s in members and t in members]
+        relations = relations[:settings.COMMUNITY_SUMMARY_MAX_EDGES]
+        return f"实体：{', '.join(community['members'][:50])}\n关系：\n" + "\n".join(relations)
+
+    @staticmethod
+    def _parent_content(community: Dict[str, Any], summaries: Dict[str, CommunitySummary],
+                        by_id: Dict[str, Dict[str, Any]]) -> str:
+        parts = []
+        for child_id in community["children"]:
+            child = summaries.get(child_id)
+            if child is not None:
+                parts.append(f"- {child.title}：{child.summary}")
+            elif child_id in by_id:
+                parts.append(f"- (小社区) {', '.join(by_id[child_id]['members'][:10])}")
+        return "子社区摘要：\n" + "\n".join(parts)
+
+    async def _summarize(self, content: str) -> Optional[CommunitySummary]:
+        async with self.semaphore:
+            try:
+                return await self.chain.ainvoke({
+                    "content": content,
+                    "format_instructions": self.parser.get_format_instructions(),
+                })
+            except Exception as e:
+                logger.warning(f"社区摘要失败: {e}")
+                return None
+
+    async def build(self, max_levels: int, min_size: int, seed: int = 42) -> Dict[str, int]:
+        edges = await asyncio.to_thread(self.load_edges)
+        logger.info(f"🕸️ 读取到 {len(edges)} 条实体关系")
+        communities = detect_communities(edges, max_levels=max_levels, seed=seed)
+        by_id = {c["id"]: c for c in communities}
+        summaries: Dict[str, CommunitySummary] = {}
+
+        # 自底向上逐层摘要：上层摘要以下层摘要为输入
+        levels = sorted({c["level"] for c in communities})
+        for level in levels:
+            todo = [c for c in communities if c["level"] == level and len(c["members"]) >= min_size]
+            contents = [
+                self._leaf_content(c, edges) if level == 0 else self._parent_content(c, summaries, by_id)
+                for c in todo
+            ]
+            results = await asyncio.gather(*(self._summarize(content) for content in contents))
+            for community, summary in zip(todo, results):
+                if summary is not None:
+                    summaries[community["id"]] = summary
+            logger.info(f"📝 第 {level} 层: {len(todo)} 个社区，成功摘要 {sum(r is not None for r in results)} 个")
+
+        stored = await self._store(communities, summaries)
+        return {"edges": len(edges), "communities": len(communities), "summaries": stored}
+
+    async def _store(self, communities: List[Dict[str, Any]], summaries: Dict[str, CommunitySummary]) -> int:
+        """重建社区集合 (先删后建)，向量为 标题 + 摘要 的 Embedding"""
+        rows = [(c, summaries[c["id"]]) for c in communities if c["id"] in summaries]
+        if not rows:
+            logger.warning("⚠️ 没有可写入的社区摘要")
+            return 0
+        vectors = await self.embeddings.aembed_documents([f"{s.title}\n{s.summary}" for _, s in rows])
+
+        if self.client.collection_exists(self.collection_name):
+            self.client.delete_collection(self.collection_name)
+        self.client.create_collection(
+            collection_name=self.collection_name,
+            vectors_config=models.VectorParams(size=len(vectors[0]), distance=models.Distance.COSINE),
+        )
+        points = [
+            models.PointStruct(
+                id=str(uuid.uuid5(uuid.NAMESPACE_URL, f"community:{c['id']}")),
+                vector=vector,
+                payload={
+                    "page_content": s.summary,
+                    "metadata": {
+                        "community_id": c["id"],
+                        "level": c["level"],
+                        "title": s.title,
+                        "summary": s.summary,
+                        "size": len(c["members"]),
+                        "members": c["members"][:30],
+                        "parent": c["parent"],
+                    },
+                },
+            )
+            for (c, s), vector in zip(rows, vectors)
+        ]
+        for start in range(0, len(points), 256):
+            self.client.upsert(collection_name=self.collection_name, points=points[start:start + 256])
+        logger.success(f"✅ 已写入 {len(points)} 条社区摘要 -> {self.collection_name}")
+        return len(points)
+
+
+def is_global_question(query: str) -> bool:
+    """auto 模式下判断是否是面向全局的问题 (关键词启发式)"""
+    lowered = query.lower()
+    return any(keyword.lower() in lowered for keyword in settings.GLOBAL_QUESTION_KEYWORDS)
+
+
+__all__ = ["COMMUNITY_COLLECTION", "CommunityBuilder", "detect_communities", "label_propagation", "is_global_question"]
@@ -1,21 +1,62 @@
 # app/services/embedding_factory.py
+import re
+from typing import Optional
+
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.embeddings import Embeddings
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.hedging import HedgedEmbeddings, RETRYABLE_ERRORS, CLIENT_ERRORS
+from app.services.limiter import ProviderGovernor
+from app.services.recording import provider_archive, ReplayMissError
+
+embedding_governor = ProviderGovernor(
+    "embedding",
+    max_concurrency=settings.EMBD_MAX_CONCURRENCY,
+    max_rps=settings.EMBD_MAX_RPS,
+    max_tpm=settings.EMBD_MAX_TPM,
+    overload_errors=RETRYABLE_ERRORS,
+    client_errors=CLIENT_ERRORS + (ReplayMissError,),
+)
+
+
+# 本地模型加载较重 (模型文件 + 推理线程池)，进程内只加载一次
+_local_embeddings: Optional[Embeddings] = None
 
 
 class EmbeddingFactory:
     """
     嵌入模型工厂类
     用于创建和管理各种嵌入模型实例
+    - remote: 远程 OpenAI 兼容 API (EMBD_*)，带重试 / 对冲 / 出站限流
+    - local: 本地 CPU ONNX 模型 (LOCAL_EMBD_*)
+    两者向量空间不同，同一份数据在每个空间各有一个集合 (见 collection_name)
     """
-    
+
+    @staticmethod
+    def dimensions(backend: str = "remote") -> int:
+        """backend 对应向量空间的维度"""
+        return settings.LOCAL_EMBD_DIMENSIONS if backend == "local" else settings.EMBD_DIMENSIONS
+
+    @staticmethod
+    def collection_name(base: str, backend: str = "remote") -> str:
+        """
+        向量空间对应的集合名：remote 沿用原集合名，local 追加模型名后缀
+        例: test-collection -> test-collection--paraphrase-multilingual-minilm-l12-v2
+        """
+        if backend != "local":
+            return base
+        slug = re.sub(r"[^a-z0-9]+", "-", settings.LOCAL_EMBD_MODEL_DIR.name.lower()).strip("-")
+        return f"{base}--{slug}"
+
     @staticmethod
-    def get_embedding() -> Embeddings:
+    def get_embedding(backend: str = "remote") -> Embeddings:
         """
         获取嵌入模型实例
         
+        Args:
+            backend: "remote" (默认) 或 "local"，按用途取 ENTITY_EMBD_BACKEND / COMMUNITY_EMBD_BACKEND
+
         Returns:
             Embeddings 实例 (用于向量化文本)
             
@@ -23,7 +64,9 @@ class EmbeddingFactory:
             >>> embeddings = EmbeddingFactory.get_embedding()
             >>> vectors = embeddings.embed_documents(["文本1", "文本2"])
         """
-        
+        if backend == "local":
+            return EmbeddingFactory._get_local_embedding()
+
         # 1. API Key 检查
         if not settings.EMBD_API_KEY:
             logger.error("❌ 未找到 EMBD_API_KEY，请检查环境变量或 .env 配置")
@@ -31,11 +74,27 @@ class EmbeddingFactory:
 
         try:
             # 2. 创建嵌入模型实例
-            embeddings = OpenAIEmbeddings(
+            base_embeddings = OpenAIEmbeddings(
                 base_url=settings.EMBD_BASE_URL,
                 api_key=settings.EMBD_API_KEY,
                 model=settings.EMBD_MODEL_NAME,
                 dimensions=settings.EMBD_DIMENSIONS,
+                max_retries=0,
+            )
+
+            # 录制 / 回放 (按单条文本)，同样包在重试与限流之内
+            if provider_archive is not None:
+                base_embeddings = provider_archive.wrap_embeddings(
+                    base_embeddings,
+                    endpoint=f"embedding:{settings.EMBD_MODEL_NAME}:{settings.EMBD_DIMENSIONS}",
+                )
+
+            # 3. 包装：重试 + 延迟统计 + 对冲 (Embedding 天然幂等) + 出站限流
+            embeddings = HedgedEmbeddings(
+                base_embeddings,
+                endpoint=f"embedding:{settings.EMBD_MODEL_NAME}",
+                hedge=settings.HEDGING_ENABLED,
+                governor=embedding_governor,
             )
 
             logger.success(
@@ -47,6 +106,28 @@ class EmbeddingFactory:
             logger.error(f"❌ Embedding 初始化失败: {str(e)}")
             raise
 
+    @staticmethod
+    def _get_local_embedding() -> Embeddings:
+        global _local_embeddings
+        if _local_embeddings is None:
+            from app.services.local_embeddings import OnnxEmbeddings
+
+            embeddings = OnnxEmbeddings(
+                settings.LOCAL_EMBD_MODEL_DIR,
+                quantized=settings.LOCAL_EMBD_QUANTIZED,
+                max_batch=settings.LOCAL_EMBD_MAX_BATCH,
+                max_length=settings.LOCAL_EMBD_MAX_LENGTH,
+                workers=settings.LOCAL_EMBD_WORKERS,
+            )
+            # 录制 / 回放同样适用
+            if provider_archive is not None:
+                embeddings = provider_archive.wrap_embeddings(
+                    embeddings,
+                    endpoint=f"embedding-local:{settings.LOCAL_EMBD_MODEL_DIR.name}",
+                )
+            _local_embeddings = embeddings
+        return _local_embeddings
+
 
 embedding_factory = EmbeddingFactory()
 
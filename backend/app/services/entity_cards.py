@@ -0,0 +1,180 @@
+# app/services/entity_cards.py
+import asyncio
+import hashlib
+import json
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.output_parsers import StrOutputParser
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.prompts.entity_card import entity_card_prompt
+
+# 批量读取实体邻域：每条关系附带对端实体的度数，用于给关系排序
+NEIGHBORHOOD_CYPHER = """
+UNWIND $names AS name
+MATCH (s:Entity {name: name})
+OPTIONAL MATCH (s)-[r]-(t:Entity)
+RETURN s.name AS name, properties(s) AS props, type(r) AS rel,
+       startNode(r) = s AS outgoing, t.name AS target, size([(t)--() | 1]) AS degree
+"""
+
+
+def build_card(name: str, props: Dict[str, Any], relations: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    由实体属性与邻接关系构造卡片 (不含摘要)
+    关系按对端实体的度数降序排列 (连接到枢纽实体的关系信息量更大)，截断到 ENTITY_CARD_MAX_RELATIONS 条；
+    fingerprint 覆盖完整邻域，邻域不变时增量构建会跳过该实体
+    """
+    attributes = {
+        key: value for key, value in sorted((props or {}).items())
+        if key != "name" and isinstance(value, (str, int, float, bool))
+    }
+    ranked = sorted(relations, key=lambda r: (-(r.get("degree") or 0), r["rel"], r["target"]))
+    lines = [
+        f"{name} -[{r['rel']}]-> {r['target']}" if r["outgoing"] else f"{r['target']} -[{r['rel']}]-> {name}"
+        for r in ranked
+    ]
+    fingerprint = hashlib.sha1(
+        json.dumps([attributes, sorted(lines)], ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+    return {
+        "relations": lines[:settings.ENTITY_CARD_MAX_RELATIONS],
+        "attributes": attributes,
+        "degree": len(lines),
+        "fingerprint": fingerprint,
+    }
+
+
+def render_cards(cards: List[Dict[str, Any]], limit: int) -> str:
+    """把多个实体卡片渲染成与图扩展 (_neo4j_get_graph) 相同格式的关系文本"""
+    lines: List[str] = []
+    for card in cards:
+        for line in card.get("relations", []):
+            if line not in lines:
+                lines.append(line)
+    return "\n".join(lines[:limit]) if lines else "无直接关联信息"
+
+
+class EntityCardBuilder:
+    """
+    实体卡片物化：把每个实体的高排名关系、属性 (以及可选的一句话摘要) 写进实体向量的 payload
+    (payload["metadata"]["card"])，检索时随向量匹配一并返回，不再逐请求做 Neo4j 遍历
+
+    增量：邻域指纹未变化的实体跳过；--watch 模式下定期重跑，邻域变化后自动刷新
+    由 python -m app.cli.build_entity_cards 调用
+    """
+
+    def __init__(self, graph, qdrant_client, collection_name: str, llm=None,
+                 batch_size: int = 200, concurrency: int = 8):
+        self.graph = graph
+        self.client = qdrant_client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.summary_chain = (entity_card_prompt | llm | StrOutputParser()) if llm is not None else None
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    def _scroll_entities(self):
+        """遍历实体集合，产出 (point_id, metadata)"""
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                limit=self.batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False,
+            )
+            for p in points:
+                yield p.id, (p.payload or {}).get("metadata") or {}
+            if offset is None:
+                break
+
+    def _load_neighborhoods(self, names: List[str]) -> Dict[str, Dict[str, Any]]:
+        records = self.graph.execute_query(NEIGHBORHOOD_CYPHER, {"names": names})
+        hoods: Dict[str, Dict[str, Any]] = defaultdict(lambda: {"props": {}, "relations": []})
+        for record in records:
+            hood = hoods[record["name"]]
+            hood["props"] = record.get("props") or {}
+            if record.get("rel") and record.get("target"):
+                hood["relations"].append({
+                    "rel": record["rel"],
+                    "target": record["target"],
+                    "outgoing": bool(record.get("outgoing")),
+                    "degree": record.get("degree") or 0,
+                })
+        return hoods
+
+    async def _summarize(self, name: str, card: Dict[str, Any]) -> Optional[str]:
+        async with self.semaphore:
+            try:
+                summary = await self.summary_chain.ainvoke({
+                    "name": name,
+                    "attributes": json.dumps(card["attributes"], ensure_ascii=False) if card["attributes"] else "无",
+                    "relations": "\n".join(card["relations"]) or "无",
+                })
+                return summary.strip()
+            except Exception as e:
+                logger.warning(f"实体卡片摘要失败 ({name}): {e}")
+                return None
+
+    async def _refresh_batch(self, batch: List[tuple], force: bool) -> int:
+        names = [meta["name"] for _, meta in batch]
+        hoods = await asyncio.to_thread(self._load_neighborhoods, names)
+
+        changed = []
+        for point_id, meta in batch:
+            hood = hoods.get(meta["name"])
+            if hood is None:
+                # 图中已不存在该实体：保留向量，去掉过期卡片
+                if "card" in meta:
+                    changed.append((point_id, {k: v for k, v in meta.items() if k != "card"}, None))
+                continue
+            card = build_card(meta["name"], hood["props"], hood["relations"])
+            old = meta.get("card") or {}
+            if not force and old.get("fingerprint") == card["fingerprint"]:
+                continue
+            changed.append((point_id, meta, card))
+
+        if self.summary_chain is not None:
+            carded = [(meta, card) for _, meta, card in changed if card is not None]
+            summaries = await asyncio.gather(*(self._summarize(meta["name"], card) for meta, card in carded))
+            for (_, card), summary in zip(carded, summaries):
+                if summary:
+                    card["summary"] = summary
+
+        for point_id, meta, card in changed:
+            metadata = dict(meta)
+            if card is not None:
+                metadata["card"] = {**card, "updated_at": round(time.time())}
+            # set_payload 按顶层键合并，metadata 整体替换
+            await asyncio.to_thread(
+                self.client.set_payload,
+                collection_name=self.collection_name,
+                payload={"metadata": metadata},
+                points=[point_id],
+            )
+        return len(changed)
+
+    async def refresh(self, force: bool = False) -> Dict[str, int]:
+        """扫描全部实体，重建邻域有变化 (或 force) 的卡片，返回统计"""
+        scanned, updated = 0, 0
+        batch: List[tuple] = []
+        for point_id, meta in self._scroll_entities():
+            if not isinstance(meta.get("name"), str):
+                continue
+            batch.append((point_id, meta))
+            if len(batch) >= self.batch_size:
+                updated += await self._refresh_batch(batch, force)
+                scanned += len(batch)
+                batch = []
+        if batch:
+            updated += await self._refresh_batch(batch, force)
+            scanned += len(batch)
+        logger.info(f"🪪 实体卡片: 扫描 {scanned} 个实体，更新 {updated} 张卡片")
+        return {"scanned": scanned, "updated": updated}
+
+
+__all__ = ["EntityCardBuilder", "build_card", "render_cards"]
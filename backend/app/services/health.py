@@ -0,0 +1,107 @@
+# app/services/health.py
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional, Set
+
+import app.services.neo4j_service as neo4j_svc
+import app.services.qdrant_service as qdrant_svc
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.services.circuit import breaker_registry
+
+# 熔断器状态 -> 健康状态 (用于没有主动探测的提供商)
+_BREAKER_HEALTH = {"closed": "healthy", "half_open": "degraded", "open": "down"}
+
+
+class HealthProber:
+    """
+    后台健康探测
+    - 每 interval 秒在线程中探测 Neo4j / Qdrant (它们的 check_health 是阻塞调用)，结果缓存，
+      /monitor/health 直接读缓存，不再在事件循环上同步探测
+    - 探测结果同步给对应后端的熔断器：失败立即 open，open 时探测成功提前进入 half_open
+    - LLM / Embedding 不做主动探测 (会产生费用)，健康状态取自熔断器 (由真实调用结果驱动)
+    """
+
+    def __init__(self, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.status: Dict[str, Dict[str, Any]] = {}
+        self._task: Optional[asyncio.Task] = None
+        # 上一次探测线程还没返回的后端 (超时后线程仍在阻塞)，跳过以免线程堆积
+        self._inflight: Set[str] = set()
+
+    @staticmethod
+    def _probes() -> Dict[str, Callable[[], Dict[str, Any]]]:
+        probes = {"qdrant": qdrant_svc.qdrant_manager.check_health}
+        if neo4j_svc.neo4j_manager is not None:
+            probes["neo4j"] = neo4j_svc.neo4j_manager.check_health
+        return probes
+
+    async def _probe(self, name: str, check: Callable[[], Dict[str, Any]]):
+        if name in self._inflight:
+            return
+        self._inflight.add(name)
+        start = time.perf_counter()
+        thread = asyncio.ensure_future(asyncio.to_thread(check))
+        thread.add_done_callback(lambda _: self._inflight.discard(name))
+        try:
+            result = await asyncio.wait_for(asyncio.shield(thread), self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "down", "error": f"探测超时 ({self.timeout}s)"}
+        except Exception as e:
+            result = {"status": "down", "error": str(e)}
+
+        healthy = result.get("status") != "down"
+        breaker = breaker_registry.get(name)
+        if breaker is not None:
+            breaker.probe_result(healthy, result.get("error", ""))
+        metrics.set_gauge("backend_up", 1 if healthy else 0, backend=name)
+        self.status[name] = {
+            **result,
+            "checked_at": time.time(),
+            "probe_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+    async def probe_all(self):
+        await asyncio.gather(*(self._probe(name, check) for name, check in self._probes().items()))
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                logger.warning(f"⚠️ 健康探测出错: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """在当前事件循环中启动后台探测 (启动流程结束后调用，重复调用无效)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"🩺 后台健康探测已启动 (每 {self.interval:g}s)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """缓存的探测结果 + 提供商熔断状态"""
+        components = {name: dict(status) for name, status in self.status.items()}
+        for name, breaker in breaker_registry.items():
+            entry = components.setdefault(name, {"status": _BREAKER_HEALTH[breaker.state]})
+            entry["circuit"] = breaker.state
+            if breaker.state != "closed" and entry.get("status") == "healthy":
+                # 探测正常但真实调用仍在失败 (或正在试探恢复)
+                entry["status"] = "degraded"
+        return components
+
+
+# --- 单例导出 ---
+health_prober = HealthProber(settings.HEALTH_PROBE_INTERVAL_S, settings.HEALTH_PROBE_TIMEOUT_S)
+
+__all__ = ["health_prober", "HealthProber"]
@@ -0,0 +1,325 @@
+# app/services/hedging.py
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+import openai
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+from app.services.limiter import approx_tokens
+from app.services.singleflight import SingleFlight
+
+# 相同输入的并发幂等调用合并为一次
+llm_flight = SingleFlight("llm")
+embedding_flight = SingleFlight("embedding")
+
+# 可以安全重试的提供商异常 (网络错误 / 超时 / 429 / 5xx)
+RETRYABLE_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+# 请求本身有问题 (参数 / 模型名错误)，重试没有意义，也不说明提供商不可用
+CLIENT_ERRORS = (
+    openai.BadRequestError,
+    openai.NotFoundError,
+    openai.UnprocessableEntityError,
+)
+
+
+class LatencyTracker:
+    """
+    按端点记录最近的调用延迟 (滑动窗口)
+    用于计算自适应的对冲延迟 (默认 p95)
+    """
+
+    def __init__(self, window: int = 256):
+        self._window = window
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, endpoint: str, seconds: float):
+        with self._lock:
+            if endpoint not in self._samples:
+                self._samples[endpoint] = deque(maxlen=self._window)
+            self._samples[endpoint].append(seconds)
+
+    def quantile(self, endpoint: str, q: float) -> Optional[float]:
+        """返回该端点延迟的分位数，样本不足时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(endpoint, ()))
+        if len(samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        return samples[min(int(q * len(samples)), len(samples) - 1)]
+
+    def hedge_delay(self, endpoint: str) -> float:
+        """对冲延迟 (秒)：主请求超过该时间未返回时发出副本请求"""
+        delay = self.quantile(endpoint, settings.HEDGE_QUANTILE)
+        if delay is None:
+            delay = settings.HEDGE_DEFAULT_DELAY_MS / 1000
+        return max(delay, settings.HEDGE_MIN_DELAY_MS / 1000)
+
+    def summary(self) -> List[Dict[str, Any]]:
+        """各端点的延迟分位数 + 对冲统计 (供 monitor 接口使用)"""
+        with self._lock:
+            endpoints = list(self._samples.keys())
+
+        rows = []
+        for endpoint in endpoints:
+            with self._lock:
+                samples = sorted(self._samples[endpoint])
+            calls = metrics.get("provider_calls_total", endpoint=endpoint)
+            hedges = metrics.get("provider_hedges_total", endpoint=endpoint)
+            wins = metrics.get("provider_hedge_wins_total", endpoint=endpoint)
+            rows.append({
+                "endpoint": endpoint,
+                "samples": len(samples),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                "p95_ms": round(samples[min(int(0.95 * len(samples)), len(samples) - 1)] * 1000, 1),
+                "p99_ms": round(samples[min(int(0.99 * len(samples)), len(samples) - 1)] * 1000, 1),
+                "calls": calls,
+                "retries": metrics.get("provider_retries_total", endpoint=endpoint),
+                "hedge_rate": round(hedges / calls, 4) if calls else 0.0,
+                "hedge_win_rate": round(wins / hedges, 4) if hedges else 0.0,
+            })
+        return rows
+
+
+latency_tracker = LatencyTracker()
+
+
+def _backoff(attempt: int) -> float:
+    """指数退避 + 全抖动 (秒)"""
+    cap = min(settings.RETRY_MAX_DELAY_MS, settings.RETRY_BASE_DELAY_MS * (2 ** attempt))
+    return random.uniform(0, cap / 1000)
+
+
+def _governed(factory: Callable[[], Awaitable[Any]], governor, tokens: int) -> Callable[[], Awaitable[Any]]:
+    """让每一次实际发出的请求 (包括对冲副本和重试) 都经过出站限流"""
+    if governor is None:
+        return factory
+    return lambda: governor.run(factory, tokens)
+
+
+async def _hedged_attempt(endpoint: str, factory: Callable[[], Awaitable[Any]], hedge: bool) -> Any:
+    """
+    执行一次 (可能带对冲的) 调用
+    主请求在对冲延迟内未返回时再发一份副本，取先成功返回的结果，另一份被取消
+    """
+    start = time.perf_counter()
+    primary = asyncio.ensure_future(factory())
+    pending = {primary}
+    hedge_task = None
+    hedge_start = start
+    last_error: Optional[BaseException] = None
+
+    try:
+        if hedge:
+            done, pending = await asyncio.wait(pending, timeout=latency_tracker.hedge_delay(endpoint))
+            if not done:
+                hedge_start = time.perf_counter()
+                hedge_task = asyncio.ensure_future(factory())
+                pending.add(hedge_task)
+                metrics.inc("provider_hedges_total", endpoint=endpoint)
+            else:
+                pending = done
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    last_error = task.exception()
+                    continue
+
+                now = time.perf_counter()
+                if task is hedge_task:
+                    metrics.inc("provider_hedge_wins_total", endpoint=endpoint)
+                    # 主请求被取消前已经耗时这么久，作为下界计入，避免分位数被低估
+                    latency_tracker.record(endpoint, now - start)
+                    latency_tracker.record(endpoint, now - hedge_start)
+                else:
+                    latency_tracker.record(endpoint, now - start)
+                return task.result()
+
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def resilient_call(endpoint: str,
+                         factory: Callable[[], Awaitable[Any]],
+                         hedge: bool = False,
+                         governor=None,
+                         tokens: int = 0) -> Any:
+    """
+    带重试 (指数退避 + 抖动) 和可选对冲的异步提供商调用
+
+    Args:
+        endpoint: 端点标识，用于延迟统计，如 "llm:gpt-4o"
+        factory: 每次调用都返回一个新的协程
+        hedge: 是否允许对冲，只应对幂等调用开启
+        governor: 出站限流器 (ProviderGovernor)，tokens 为本次调用预估的 token 数
+    """
+    factory = _governed(factory, governor, tokens)
+    attempts = settings.PROVIDER_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        metrics.inc("provider_calls_total", endpoint=endpoint)
+        try:
+            return await _hedged_attempt(endpoint, factory, hedge)
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                metrics.inc("provider_errors_total", endpoint=endpoint)
+                raise
+            delay = _backoff(attempt)
+            metrics.inc("provider_retries_total", endpoint=endpoint)
+            logger.warning(f"🔁 {endpoint} 调用失败 ({type(e).__name__})，{delay:.2f}s 后重试 ({attempt + 1}/{attempts - 1})")
+            await asyncio.sleep(delay)
+        except Exception:
+            metrics.inc("provider_errors_total", endpoint=endpoint)
+            raise
+
+
+def resilient_call_sync(endpoint: str, func: Callable[[], Any]) -> Any:
+    """同步版本：只做重试和延迟统计，不做对冲"""
+    attempts = settings.PROVIDER_MAX_RETRIES + 1
+    for attempt in range(attempts):
+        metrics.inc("provider_calls_total", endpoint=endpoint)
+        start = time.perf_counter()
+        try:
+            result = func()
+            latency_tracker.record(endpoint, time.perf_counter() - start)
+            return result
+        except RETRYABLE_ERRORS as e:
+            if attempt == attempts - 1:
+                metrics.inc("provider_errors_total", endpoint=endpoint)
+                raise
+            delay = _backoff(attempt)
+            metrics.inc("provider_retries_total", endpoint=endpoint)
+            logger.warning(f"🔁 {endpoint} 调用失败 ({type(e).__name__})，{delay:.2f}s 后重试 ({attempt + 1}/{attempts - 1})")
+            time.sleep(delay)
+        except Exception:
+            metrics.inc("provider_errors_total", endpoint=endpoint)
+            raise
+
+
+class HedgedChatModel(BaseChatModel):
+    """
+    ChatModel 包装器：为底层模型加上重试、延迟统计和 (可选的) 对冲
+    """
+    inner: BaseChatModel
+    endpoint: str
+    hedge: bool = False
+    governor: Optional[Any] = None
+    # Temp=0 的调用结果可复用：相同输入的并发调用合并为一次
+    deterministic: bool = False
+    # 指标标签：LLM 模式 (smart / fast / strict) 与计价用的模型名
+    mode: str = ""
+    model_name: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return f"hedged-{self.inner._llm_type}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        return resilient_call_sync(
+            self.endpoint,
+            lambda: self.inner._generate(messages, stop=stop, **kwargs)
+        )
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        if self.deterministic:
+            key = (
+                self.endpoint,
+                tuple((m.type, str(m.content)) for m in messages),
+                tuple(stop or ()),
+                repr(sorted(kwargs.items())),
+            )
+            return await llm_flight.do(key, lambda: self._resilient_generate(messages, stop, **kwargs))
+        return await self._resilient_generate(messages, stop, **kwargs)
+
+    async def _resilient_generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                                  **kwargs: Any) -> ChatResult:
+        estimated = approx_tokens("".join(str(m.content) for m in messages))
+
+        async def _call() -> ChatResult:
+            result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+            # 按实际用量修正 token 限额
+            usage = (result.llm_output or {}).get("token_usage") or {}
+            if self.governor is not None and usage.get("total_tokens"):
+                self.governor.charge_tokens(usage["total_tokens"] - estimated)
+            self._record_usage(usage)
+            return result
+
+        with metrics.timer("llm_call_seconds", mode=self.mode), tracer.span("llm", mode=self.mode):
+            return await resilient_call(
+                self.endpoint,
+                _call,
+                hedge=self.hedge,
+                governor=self.governor,
+                tokens=estimated
+            )
+
+    def _record_usage(self, usage: Dict[str, Any]):
+        """记录各模式的 token 用量与估算成本 (单价见 LLM_TOKEN_PRICES)"""
+        tracer.set_attributes(
+            prompt_tokens=usage.get("prompt_tokens") or 0,
+            completion_tokens=usage.get("completion_tokens") or 0,
+        )
+        prices = settings.LLM_TOKEN_PRICES.get(self.model_name, {})
+        cost = 0.0
+        for kind in ("prompt", "completion"):
+            count = usage.get(f"{kind}_tokens") or 0
+            if count:
+                metrics.inc("llm_tokens_total", count, mode=self.mode, kind=kind)
+                cost += count / 1000 * prices.get(kind, 0.0)
+        if cost:
+            metrics.inc("llm_cost_total", cost, mode=self.mode)
+
+
+class HedgedEmbeddings(Embeddings):
+    """
+    Embeddings 包装器：Embedding 调用天然幂等，开启对冲时异步调用全部可对冲
+    """
+
+    def __init__(self, inner: Embeddings, endpoint: str, hedge: bool = False, governor=None):
+        self.inner = inner
+        self.endpoint = endpoint
+        self.hedge = hedge
+        self.governor = governor
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return resilient_call_sync(self.endpoint, lambda: self.inner.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return resilient_call_sync(self.endpoint, lambda: self.inner.embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await embedding_flight.do(
+            (self.endpoint, "documents", tuple(texts)),
+            lambda: resilient_call(self.endpoint, lambda: self.inner.aembed_documents(texts), hedge=self.hedge,
+                                   governor=self.governor, tokens=sum(approx_tokens(t) for t in texts))
+        )
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await embedding_flight.do(
+            (self.endpoint, "query", text),
+            lambda: resilient_call(self.endpoint, lambda: self.inner.aembed_query(text), hedge=self.hedge,
+                                   governor=self.governor, tokens=approx_tokens(text))
+        )
+
+
+__all__ = ["latency_tracker", "resilient_call", "HedgedChatModel", "HedgedEmbeddings"]
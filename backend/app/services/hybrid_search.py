@@ -1,5 +1,5 @@
 import asyncio
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from pydantic import BaseModel, Field
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import models
@@ -8,9 +8,40 @@ from langchain_core.output_parsers import PydanticOutputParser # ✅ 引入解
 from app.services.embedding_factory import embedding_factory
 from app.services.llm_factory import llm_factory
 from app.services.neo4j_service import neo4j_manager
-from app.services.qdrant_service import qdrant_manager
-from app.prompts.extraction import entity_extraction_prompt # ✅ 引入你刚新建的 Prompt
+from app.services.qdrant_service import qdrant_manager, qdrant_governor
+from app.services.shared_index import SharedVectorIndex
+from app.services.singleflight import SingleFlight, normalize_key
+from app.services.batching import MicroBatcher
+from app.services.circuit import circuit_open
+from app.prompts.extraction import entity_extraction_prompt, batch_entity_extraction_prompt # ✅ 引入你刚新建的 Prompt
+from app.prompts.community import global_map_prompt
+from app.services.communities import COMMUNITY_COLLECTION
+from app.services.entity_cards import render_cards
+from app.services.lexical_index import LexicalIndex, normalize_name
+from app.services.sparse import bm25_encoder, has_sparse_vectors, hybrid_query, sparse_vectors_config
+from app.core.config import settings
+from app.core.deadline import Deadline
+from app.core.tracing import tracer
 from app.core.logger import logger
+from app.core.metrics import metrics
+
+# 实体向量集合名
+ENTITY_COLLECTION = "test-collection"
+
+def entity_collection_name() -> str:
+    """当前实体匹配所用向量空间 (ENTITY_EMBD_BACKEND) 的实体集合名"""
+    return embedding_factory.collection_name(ENTITY_COLLECTION, settings.ENTITY_EMBD_BACKEND)
+
+def community_collection_name() -> str:
+    """当前社区检索所用向量空间 (COMMUNITY_EMBD_BACKEND) 的社区摘要集合名"""
+    return embedding_factory.collection_name(COMMUNITY_COLLECTION, settings.COMMUNITY_EMBD_BACKEND)
+
+def embedding_down(backend: str) -> bool:
+    """远程 Embedding 熔断中 (本地模型没有熔断器)"""
+    return backend == "remote" and circuit_open("embedding")
+
+# 检索各阶段的 single-flight：相同 (归一化后) 输入的并发请求只执行一次
+retrieval_flight = SingleFlight("retrieval")
 
 # --- 数据结构定义 ---
 class ExtractionFormat(BaseModel):
@@ -49,60 +80,249 @@ class ExtractionFormat(BaseModel):
         
         return []
 
+class BatchExtractionItem(BaseModel):
+    index: int = Field(..., description="查询编号")
+    entities: Any = Field(..., description="该查询的实体列表")
+
+class BatchExtractionFormat(BaseModel):
+    results: List[BatchExtractionItem] = Field(..., description="每条查询的抽取结果")
+
+class CommunityMapResult(BaseModel):
+    points: List[str] = Field(default_factory=list, description="与问题相关的要点")
+    score: int = Field(0, description="对回答问题的帮助程度 0~100")
+
+class Speculation:
+    """
+    推测式检索：LLM 实体提取进行中时，用原始问题做一次实体向量检索，并为命中的实体预取一跳邻居
+    提取完成后 search() 只复用已经完成的部分，缺失的匹配 / 邻居照常补查；未用到的部分在请求结束时取消
+    """
+
+    def __init__(self, service: "HybridSearchService", query: str):
+        self.service = service
+        self.prefetched: List[str] = []
+        self.neighborhoods: Optional[asyncio.Future] = None
+        self.matches = asyncio.ensure_future(self._run(query))
+
+    async def _run(self, query: str) -> Dict[str, Dict]:
+        with tracer.span("retrieval.speculate") as span:
+            hits = await self.service._match_one(query, settings.SPECULATIVE_TOP_K)
+            # 带物化卡片的实体不需要查 Neo4j
+            names = [
+                meta["name"] for meta, _ in hits[:settings.SPECULATIVE_PREFETCH]
+                if meta.get("name") and not (settings.ENTITY_CARDS_ENABLED and meta.get("card"))
+            ]
+            if names and self.service.neo4j_driver and not circuit_open("neo4j"):
+                self.prefetched = names
+                self.neighborhoods = asyncio.ensure_future(self.service._neo4j_neighborhoods(names))
+            if span: span.set(hits=len(hits), prefetched=len(self.prefetched))
+        return {normalize_name(meta["name"]): meta for meta, _ in hits if meta.get("name")}
+
+    def known(self) -> Dict[str, Dict]:
+        """已完成的向量命中 (归一化名称 -> metadata)；尚未完成或失败时返回空，不等待"""
+        if not self.matches.done() or self.matches.cancelled() or self.matches.exception():
+            return {}
+        return self.matches.result()
+
+    async def neighborhoods_for(self, names: List[str]) -> Dict[str, List[str]]:
+        """预取覆盖到的实体的邻居 (查询已在进行中，等它比重新发起更快)；预取失败时返回空"""
+        covered = [n for n in names if n in self.prefetched]
+        if not covered or self.neighborhoods is None:
+            return {}
+        try:
+            # shield: 等待方超时 / 被取消时不连带取消预取 (由 cancel() 统一收尾)
+            hoods = await asyncio.shield(self.neighborhoods)
+        except asyncio.CancelledError:
+            # 预取本身被取消时按未命中处理；等待方自己被取消则继续向上传播
+            if self.neighborhoods.cancelled():
+                return {}
+            raise
+        except Exception as e:
+            logger.warning(f"邻居预取失败: {e}")
+            return {}
+        return {n: hoods.get(n, []) for n in covered}
+
+    def cancel(self):
+        for future in (self.matches, self.neighborhoods):
+            if future is None:
+                continue
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                future.exception()  # 取走异常，避免 "exception was never retrieved"
+
+
 class HybridSearchService:
     def __init__(self):
-        self.embeddings = embedding_factory.get_embedding()
+        # 实体匹配与社区检索可以使用不同的 Embedding 后端 (如实体名走本地模型)
+        self.embeddings = embedding_factory.get_embedding(settings.ENTITY_EMBD_BACKEND)
+        self.community_embeddings = (
+            self.embeddings if settings.COMMUNITY_EMBD_BACKEND == settings.ENTITY_EMBD_BACKEND
+            else embedding_factory.get_embedding(settings.COMMUNITY_EMBD_BACKEND)
+        )
         self.qdrant_vectorstore = None
+        self.shared_index: Optional[SharedVectorIndex] = None
         self.neo4j_driver = neo4j_manager
         
-        # 1. 初始化 Qdrant
+        # 1. 初始化 Qdrant (+ 实体名词法索引)
         self._init_qdrant()
+        self.lexical_index = self._init_lexical_index()
         
         # 2. 初始化提取器 components
         # 我们把 Parser 存为成员变量，以便后续获取 instructions
         self.extraction_parser = PydanticOutputParser(pydantic_object=ExtractionFormat)
-        self.extraction_chain = self._init_extraction()
+        self.batch_extraction_parser = PydanticOutputParser(pydantic_object=BatchExtractionFormat)
+        self.extraction_chain, self.batch_extraction_chain = self._init_extraction()
+        self.map_parser = PydanticOutputParser(pydantic_object=CommunityMapResult)
+        self.map_chain = global_map_prompt | llm_factory.get_llm(mode="fast") | self.map_parser
+
+        # 3. 跨请求微批处理：短时间内到达的抽取 / Embedding 调用合并为一次
+        self.extraction_batcher = MicroBatcher(
+            "extraction", self._extract_batch,
+            max_batch=settings.EXTRACTION_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EXTRACTION_BATCH_MAX_WAIT_MS
+        )
+        self.embedding_batcher = MicroBatcher(
+            "embedding", self._embed_batch,
+            max_batch=settings.EMBD_BATCH_MAX_SIZE,
+            max_wait_ms=settings.EMBD_BATCH_MAX_WAIT_MS
+        )
         
         logger.success("✅ HybridSearch初始化完成")
 
     def _init_qdrant(self):
         """Qdrant实体库初始化（带自动建表功能）"""
+        collection_name = entity_collection_name()
+        if settings.SHARED_INDEX_READONLY and qdrant_manager.is_embedded:
+            # 多 worker 模式：只读映射启动器导出的快照，不打开嵌入式库
+            self.shared_index = SharedVectorIndex(settings.SHARED_INDEX_DIR).load()
+            self.qdrant_client = None
+            self.collection_name = collection_name
+            self.has_communities = False
+            self.sparse_ready = False
+            return
+
         client = qdrant_manager.get_client()
-        collection_name = "test-collection"
+        self.qdrant_client = client
+        self.collection_name = collection_name
+        # 社区摘要由离线任务构建 (python -m app.cli.build_communities)，构建后需重启服务生效
+        self.has_communities = client.collection_exists(community_collection_name())
+        dimensions = embedding_factory.dimensions(settings.ENTITY_EMBD_BACKEND)
         
-        if not client.collection_exists(collection_name):
+        if client.collection_exists(collection_name):
+            # 向量维度取自集合元数据，不再为了探测维度发起 Embedding 调用
+            vector_size = self._collection_vector_size(client, collection_name)
+            if vector_size and vector_size != dimensions:
+                logger.warning(f"⚠️ 集合 {collection_name} 维度为 {vector_size}，与 Embedding 维度 {dimensions} 不一致")
+            self.sparse_ready = settings.SPARSE_ENABLED and has_sparse_vectors(client, collection_name)
+            if settings.SPARSE_ENABLED and not self.sparse_ready:
+                logger.warning(f"⚠️ 集合 {collection_name} 没有稀疏向量，只用稠密检索 (python -m app.cli.backfill_sparse 补齐)")
+        else:
             try:
-                dummy_vec = self.embeddings.embed_query("test")
-                vector_size = len(dummy_vec)
+                vector_size = dimensions
                 client.create_collection(
                     collection_name=collection_name,
                     vectors_config=models.VectorParams(
                         size=vector_size,
                         distance=models.Distance.COSINE
-                    )
+                    ),
+                    # 稠密向量保持无名默认向量 (兼容 QdrantVectorStore)，稀疏向量按名称附加
+                    sparse_vectors_config=sparse_vectors_config() if settings.SPARSE_ENABLED else None
                 )
+                self.sparse_ready = settings.SPARSE_ENABLED
                 logger.success(f"✅ 已创建新集合: {collection_name}")
             except Exception as e:
                 logger.error(f"❌ Qdrant 建表失败: {e}")
+                self.sparse_ready = False
 
+        # 关闭构造时的集合校验：它会为了比对维度发起一次 Embedding 调用
+        # 只用于检索；经它写入的点不带 BM25 稀疏向量，实体写入请用 qdrant_manager.upsert_vectors / add_texts
         self.qdrant_vectorstore = QdrantVectorStore(
             client=client,
             collection_name=collection_name,
-            embedding=self.embeddings
+            embedding=self.embeddings,
+            validate_collection_config=False
         )
 
+    def _init_lexical_index(self) -> Optional[LexicalIndex]:
+        """构建实体名 / 别名词法索引 (实体匹配的第一层)，关闭或失败时返回 None"""
+        if not settings.LEXICAL_INDEX_ENABLED:
+            return None
+        try:
+            if self.shared_index is not None:
+                return LexicalIndex.from_payloads(self.shared_index.iter_payloads(), settings.LEXICAL_MAX_EDITS)
+            return LexicalIndex.from_qdrant(self.qdrant_client, self.collection_name, settings.LEXICAL_MAX_EDITS)
+        except Exception as e:
+            logger.warning(f"⚠️ 词法索引构建失败，实体匹配只走向量检索: {e}")
+            return None
+
+    @staticmethod
+    def _collection_vector_size(client, collection_name: str) -> Optional[int]:
+        """从集合元数据读取 (默认向量的) 维度"""
+        try:
+            vectors = client.get_collection(collection_name).config.params.vectors
+            if isinstance(vectors, dict):
+                vectors = next(iter(vectors.values()), None)
+            return getattr(vectors, "size", None)
+        except Exception as e:
+            logger.warning(f"读取集合维度失败: {e}")
+            return None
+
     def _init_extraction(self):
-        """初始化提取链：Prompt | LLM | Parser"""
+        """初始化提取链：Prompt | LLM | Parser (单条 + 批量)"""
         llm = llm_factory.get_llm(mode="fast")
         # 构造 LCEL Chain
         # 注意：这里我们使用了之前保存的 self.extraction_parser
         chain = entity_extraction_prompt | llm | self.extraction_parser
-        return chain
+        batch_chain = batch_entity_extraction_prompt | llm | self.batch_extraction_parser
+        return chain, batch_chain
+
+    async def search(self, query: str, top_k: int = 5, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        混合检索：LLM抽实体 -> Qdrant匹配 -> Neo4j扩展
+
+        deadline: 请求的延迟预算。每一步都只使用 "剩余预算 - 生成阶段预留" 的时间，
+        超时后按步骤降级 (记录在 deadline.degradations 中)，不会抛出超时异常
+        开启推测式检索时，实体提取期间并行做原始问题的向量检索与邻居预取 (见 Speculation)
+        """
+        deadline = deadline or Deadline()
+        speculation = Speculation(self, query) if self._start_speculation() else None
+        try:
+            return await self._search(query, top_k, deadline, speculation)
+        finally:
+            if speculation:
+                speculation.cancel()
+
+    def _start_speculation(self) -> bool:
+        """推测只在提取会真正调用 LLM、且向量检索可用时才有意义"""
+        return (
+            settings.SPECULATIVE_RETRIEVAL_ENABLED
+            and bool(self.qdrant_vectorstore or self.shared_index)
+            and not circuit_open("llm")
+            and not (embedding_down(settings.ENTITY_EMBD_BACKEND) or circuit_open("qdrant"))
+        )
+
+    async def _search(self, query: str, top_k: int, deadline: Deadline,
+                      speculation: Optional[Speculation]) -> Dict[str, Any]:
+        reserve = settings.BUDGET_GENERATION_MIN_MS / 1000
+
+        # Step 1: LLM抽实体 (熔断中直接降级，不再每个请求都等一次连接错误)
+        entities = []
+        if circuit_open("llm"):
+            logger.warning("🔌 LLM 熔断中，跳过实体提取")
+            deadline.degrade("extraction_circuit_open")
+        else:
+            try:
+                with tracer.span("retrieval.extract") as span:
+                    entities = await deadline.run(retrieval_flight.do(
+                        ("extract", normalize_key(query)),
+                        lambda: self._extract_entities(query)
+                    ), reserve)
+                    if span: span.set(entities=len(entities))
+            except asyncio.TimeoutError:
+                logger.warning("⏱️ 实体提取超出预算，跳过检索")
+                deadline.degrade("extraction_timeout")
+                entities = []
 
-    async def search(self, query: str, top_k: int = 5) -> Dict[str, Any]:
-        # Step 1: LLM抽实体
-        entities = await self._extract_entities(query)
-        
         if not entities:
             logger.info("未提取到实体，fallback 到纯向量检索")
             return {
@@ -111,18 +331,68 @@ class HybridSearchService:
                 "matched_entities": [],
                 "graph_context": "无实体"
             }
-        
-        # Step 2: Qdrant找相似实体
-        matched_entities = await self._qdrant_match_entities(entities, top_k)
-        
-        # Step 3: Neo4j查图信息
-        graph_context = await self._neo4j_get_graph(matched_entities)
-        
+
+        # Step 2: Qdrant找相似实体 (Embedding 或 Qdrant 熔断时只用词法索引)
+        matched_entities = []
+        vector_ok = not (embedding_down(settings.ENTITY_EMBD_BACKEND) or circuit_open("qdrant"))
+        if not vector_ok:
+            logger.warning("🔌 Embedding / Qdrant 熔断中，实体匹配只用词法索引")
+            deadline.degrade("vector_match_circuit_open")
+        if vector_ok or self.lexical_index is not None:
+            # 推测式检索的结果属于本请求：只有与待匹配实体同名的命中会被复用，这部分要进 single-flight key，
+            # 否则推测结果不同的并发请求会共享同一次匹配 (拿到别人的复用结果或漏掉自己的)
+            wanted = {normalize_name(e) for e in entities[:3]}
+            reused = {k: v for k, v in (speculation.known() if speculation else {}).items() if k in wanted}
+            try:
+                with tracer.span("retrieval.vector_match", entities=len(entities)) as span:
+                    matched_entities = await deadline.run(retrieval_flight.do(
+                        ("match", tuple(normalize_key(e) for e in entities), top_k, vector_ok, tuple(sorted(reused))),
+                        lambda: self._qdrant_match_entities(entities, top_k, vector_ok, reused)
+                    ), reserve)
+                    if span: span.set(matched=len(matched_entities))
+            except asyncio.TimeoutError:
+                logger.warning("⏱️ 向量匹配超出预算，跳过实体匹配")
+                deadline.degrade("vector_match_timeout")
+                matched_entities = []
+
+        # Step 3: Neo4j查图信息 (预算不足或 Neo4j 熔断时跳过图扩展)
+        # 前 3 个实体都有物化卡片时直接用卡片，不再遍历 Neo4j
+        graph_context = ""
+        seeds = matched_entities[:3]
+        if seeds and all("card" in e for e in seeds):
+            with tracer.span("retrieval.entity_cards", seeds=len(seeds)):
+                graph_context = render_cards([e["card"] for e in seeds], limit=15)
+        elif matched_entities and not deadline.has(reserve + settings.BUDGET_GRAPH_MIN_MS / 1000):
+            logger.warning("⏱️ 剩余预算不足，跳过图扩展")
+            deadline.degrade("graph_expansion_skipped")
+        elif matched_entities and circuit_open("neo4j"):
+            logger.warning("🔌 Neo4j 熔断中，跳过图扩展")
+            deadline.degrade("graph_circuit_open")
+        else:
+            try:
+                with tracer.span("retrieval.graph_expand", seeds=len(matched_entities[:3])):
+                    # 预取的邻居在共享任务之外等待：推测属于本请求，不能让合并进来的其他请求依赖它
+                    names = [e["name"] for e in matched_entities[:3]]
+                    prefetched = await deadline.run(speculation.neighborhoods_for(names), reserve) if speculation else {}
+                    if speculation:
+                        metrics.inc("speculative_graph_total", len(prefetched), result="hit")
+                        metrics.inc("speculative_graph_total", len(names) - len(prefetched), result="miss")
+                    graph_context = await deadline.run(retrieval_flight.do(
+                        ("graph", tuple(names), tuple(sorted(prefetched))),
+                        lambda: self._neo4j_get_graph(matched_entities, prefetched)
+                    ), reserve)
+            except asyncio.TimeoutError:
+                logger.warning("⏱️ 图扩展超出预算，跳过图信息")
+                deadline.degrade("graph_expansion_timeout")
+
         # 组装上下文
         context_parts = []
         if matched_entities:
             names = [e['name'] for e in matched_entities[:3]]
             context_parts.append(f"涉及实体：{', '.join(names)}")
+            summaries = [f"{e['name']}：{e['card']['summary']}" for e in seeds if e.get("card", {}).get("summary")]
+            if summaries:
+                context_parts.append("实体简介：\n" + "\n".join(summaries))
         if graph_context:
             context_parts.append(f"知识图谱关系：\n{graph_context}")
             
@@ -133,47 +403,217 @@ class HybridSearchService:
             "graph_context": graph_context
         }
 
+    async def global_search(self, query: str, deadline: Optional[Deadline] = None) -> Optional[Dict[str, Any]]:
+        """
+        全局检索：在离线构建的社区摘要上做 map-reduce，回答面向整个语料的问题
+        - 召回：问题向量在社区摘要集合中取 GLOBAL_SEARCH_TOP_K 个社区
+        - map：fast 模型并发地从每个社区摘要中提取相关要点并打分
+        - reduce：按分数排序，截断到 GLOBAL_SEARCH_MAX_CONTEXT_CHARS 作为生成上下文
+        map 超出预算时直接使用召回的原始摘要；没有社区集合或相关服务熔断时返回 None，由调用方退回 search()
+        """
+        deadline = deadline or Deadline()
+        reserve = settings.BUDGET_GENERATION_MIN_MS / 1000
+        if not self.has_communities:
+            logger.info("未构建社区摘要，全局检索退回实体检索")
+            return None
+        if embedding_down(settings.COMMUNITY_EMBD_BACKEND) or circuit_open("qdrant"):
+            logger.warning("🔌 Embedding / Qdrant 熔断中，跳过全局检索")
+            deadline.degrade("global_search_circuit_open")
+            return None
+
+        try:
+            with tracer.span("retrieval.community_match") as span:
+                communities = await deadline.run(retrieval_flight.do(
+                    ("community", normalize_key(query)),
+                    lambda: self._match_communities(query)
+                ), reserve)
+                if span: span.set(communities=len(communities))
+        except asyncio.TimeoutError:
+            logger.warning("⏱️ 社区召回超出预算，退回实体检索")
+            deadline.degrade("global_search_timeout")
+            return None
+        if not communities:
+            return None
+
+        findings: List[Tuple[int, str, str]] = []
+        if circuit_open("llm"):
+            deadline.degrade("global_map_circuit_open")
+        else:
+            try:
+                with tracer.span("retrieval.global_map", communities=len(communities)):
+                    mapped = await deadline.run(asyncio.gather(
+                        *(self._map_community(query, c) for c in communities), return_exceptions=True
+                    ), reserve)
+                for community, result in zip(communities, mapped):
+                    if isinstance(result, Exception) or result.score <= 0 or not result.points:
+                        continue
+                    findings.append((result.score, community.get("title", ""), "\n".join(f"- {p}" for p in result.points)))
+            except asyncio.TimeoutError:
+                logger.warning("⏱️ 社区 map 超出预算，直接使用社区摘要")
+                deadline.degrade("global_map_timeout")
+
+        if not findings:
+            # map 不可用 (超时 / 熔断 / 全部判为无关) 时按召回顺序使用原始摘要
+            findings = [(0, c.get("title", ""), c.get("summary", "")) for c in communities]
+
+        parts, used = [], 0
+        for _, title, text in sorted(findings, key=lambda f: f[0], reverse=True):
+            block = f"【{title}】\n{text}"
+            if parts and used + len(block) > settings.GLOBAL_SEARCH_MAX_CONTEXT_CHARS:
+                break
+            parts.append(block)
+            used += len(block)
+
+        titles = [c.get("title", "") for c in communities]
+        return {
+            "context_text": "社区摘要要点：\n" + "\n\n".join(parts),
+            "entities": titles,
+            "matched_entities": [],
+            "graph_context": ""
+        }
+
+    async def _match_communities(self, query: str) -> List[Dict[str, Any]]:
+        if self.community_embeddings is self.embeddings:
+            vector = await self.embedding_batcher.submit(query)
+        else:
+            vector = await self.community_embeddings.aembed_query(query)
+        async with qdrant_governor.slot():
+            response = await asyncio.to_thread(
+                self.qdrant_client.query_points,
+                collection_name=community_collection_name(),
+                query=vector,
+                limit=settings.GLOBAL_SEARCH_TOP_K,
+                with_payload=True
+            )
+        return [(p.payload or {}).get("metadata") or {} for p in response.points]
+
+    async def _map_community(self, query: str, community: Dict[str, Any]) -> CommunityMapResult:
+        return await self.map_chain.ainvoke({
+            "question": query,
+            "title": community.get("title", ""),
+            "summary": community.get("summary", ""),
+            "format_instructions": self.map_parser.get_format_instructions()
+        })
+
     async def _extract_entities(self, query: str) -> List[str]:
-        """LLM实体提取"""
+        """LLM实体提取 (经微批处理器与其他请求合并)"""
         try:
-            # 🔴 核心修复：使用 .ainvoke() 而不是直接调用 ()
-            result: ExtractionFormat = await self.extraction_chain.ainvoke({
-                "query": query,
-                "text": query, # 这里假设 text 就是 query 本身
-                "format_instructions": self.extraction_parser.get_format_instructions()
-            })
-            
-            entities = result.flat_entities
-            logger.info(f"提取实体: {entities}")
+            entities = await self.extraction_batcher.submit(query)
+            logger.debug("提取实体: {}", entities)
             return entities
         except Exception as e:
             logger.warning(f"实体提取失败: {e}")
             return []
 
-    async def _qdrant_match_entities(self, entities: List[str], top_k: int) -> List[Dict]:
-        if not self.qdrant_vectorstore or not entities:
+    async def _extract_single(self, query: str) -> List[str]:
+        """单条查询的实体提取"""
+        # 🔴 核心修复：使用 .ainvoke() 而不是直接调用 ()
+        result: ExtractionFormat = await self.extraction_chain.ainvoke({
+            "query": query,
+            "text": query, # 这里假设 text 就是 query 本身
+            "format_instructions": self.extraction_parser.get_format_instructions()
+        })
+        return result.flat_entities
+
+    async def _extract_batch(self, queries: List[str]) -> List[Any]:
+        """
+        批量实体提取 (MicroBatcher 的 handler)
+        单条直接走原提取链；多条合并为一次多查询 Prompt，模型漏掉的查询再逐条补提取
+        """
+        if len(queries) == 1:
+            return [await self._extract_single(queries[0])]
+
+        by_index: Dict[int, Any] = {}
+        try:
+            result: BatchExtractionFormat = await self.batch_extraction_chain.ainvoke({
+                "queries": "\n".join(f"[{i}] {q}" for i, q in enumerate(queries)),
+                "format_instructions": self.batch_extraction_parser.get_format_instructions()
+            })
+            for item in result.results:
+                if 0 <= item.index < len(queries):
+                    by_index[item.index] = ExtractionFormat(entities=item.entities).flat_entities
+        except Exception as e:
+            logger.warning(f"批量实体提取失败，退回逐条提取: {e}")
+
+        missing = [i for i in range(len(queries)) if i not in by_index]
+        if missing:
+            fallback = await asyncio.gather(*(self._extract_single(queries[i]) for i in missing), return_exceptions=True)
+            by_index.update(zip(missing, fallback))
+
+        return [by_index[i] for i in range(len(queries))]
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """批量 Embedding (MicroBatcher 的 handler)：去重后一次 embed_documents"""
+        unique = list(dict.fromkeys(texts))
+        vectors = await self.embeddings.aembed_documents(unique)
+        lookup = dict(zip(unique, vectors))
+        return [lookup[t] for t in texts]
+
+    async def _qdrant_match_entities(self, entities: List[str], top_k: int, vector_ok: bool = True,
+                                     known: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+        """
+        known: 推测式检索已经取回的实体 (归一化名称 -> metadata)，与之同名的实体直接复用，按精确命中计分
+        """
+        if not (self.qdrant_vectorstore or self.shared_index) or not entities:
             return []
 
-        tasks = []
-        for entity in entities[:3]:
-            # 并发查询
-            tasks.append(self.qdrant_vectorstore.asimilarity_search_with_score(entity, k=2))
-        
-        results_groups = await asyncio.gather(*tasks, return_exceptions=True)
-        
+        # 第一层：词法索引 (精确 / 模糊)。精确命中直接采用；模糊命中可能是名称相近的另一个实体
+        # (Model X / Model Y)，向量可用时仍走 Embedding + 向量检索并与之合并；未命中的实体只走向量检索
+        results_groups: List[Any] = [None] * len(entities[:3])
+        tasks, task_slots, speculative_slots = [], [], set()
+        for i, entity in enumerate(entities[:3]):
+            hits, tier = self.lexical_index.lookup(entity, k=2) if self.lexical_index else ([], "miss")
+            hits = [h for h in hits if h["score"] >= settings.LEXICAL_FUZZY_MIN_SCORE]
+            speculated = known.get(normalize_name(entity)) if known else None
+            if hits:
+                results_groups[i] = hits
+                if tier == "fuzzy" and vector_ok:
+                    metrics.inc("entity_match_total", tier="fuzzy_vector")
+                    tasks.append(self._match_one(entity, k=2))
+                    task_slots.append(i)
+                else:
+                    metrics.inc("entity_match_total", tier=tier)
+            elif speculated is not None:
+                metrics.inc("entity_match_total", tier="speculative")
+                speculative_slots.add(i)
+                results_groups[i] = [(speculated, 1.0)]
+            elif vector_ok:
+                metrics.inc("entity_match_total", tier="vector")
+                # 并发查询
+                tasks.append(self._match_one(entity, k=2))
+                task_slots.append(i)
+            else:
+                results_groups[i] = []
+
+        lexical_hits = [
+            h for i, group in enumerate(results_groups) if group and i not in speculative_slots for h in group
+        ]
+        if lexical_hits:
+            tracer.set_attributes(lexical_hits=len(lexical_hits))
+            tasks.append(self._lexical_payloads(lexical_hits, vector_ok))
+        outcomes = await asyncio.gather(*tasks, return_exceptions=True)
+        if lexical_hits:
+            payloads = outcomes[-1] if not isinstance(outcomes[-1], Exception) else {}
+            for i, group in enumerate(results_groups):
+                if group and i not in speculative_slots:
+                    results_groups[i] = [(payloads.get(h["_entity"], h), h["score"]) for h in group]
+        # 向量结果与该实体的模糊命中合并 (同名实体在下面按最高分去重)；向量检索失败时只保留模糊命中
+        for i, group in zip(task_slots, outcomes):
+            results_groups[i] = (results_groups[i] or []) + ([] if isinstance(group, Exception) else group)
+
         all_results = []
         for i, group in enumerate(results_groups):
-            if isinstance(group, Exception):
-                continue
-            
             origin_query = entities[i]
-            for doc, score in group:
-                payload = doc.metadata
-                all_results.append({
+            for payload, score in group:
+                result = {
                     "name": payload.get("name", origin_query),
                     "score": float(score),
                     "type": payload.get("type", "unknown")
-                })
+                }
+                # 物化的实体卡片随向量匹配一起返回 (python -m app.cli.build_entity_cards)
+                if settings.ENTITY_CARDS_ENABLED and payload.get("card"):
+                    result["card"] = payload["card"]
+                all_results.append(result)
 
         unique_results = {}
         for r in all_results:
@@ -183,36 +623,103 @@ class HybridSearchService:
         
         return sorted(unique_results.values(), key=lambda x: x["score"], reverse=True)[:top_k]
 
-    async def _neo4j_get_graph(self, matched_entities: List[Dict]) -> str:
+    async def _lexical_payloads(self, hits: List[Dict], fetch: bool) -> Dict[int, Dict]:
+        """
+        词法命中的实体补全 payload (主要为了带上物化的实体卡片)
+        共享索引直接按名称查；Qdrant 按点 ID 一次取回 (熔断中或未开启卡片时不取，只用名称 / 类型)
+        """
+        if not settings.ENTITY_CARDS_ENABLED:
+            return {}
+        if self.shared_index is not None:
+            return {h["_entity"]: self.shared_index.lookup(h["name"]) or h for h in hits}
+        if not fetch:
+            return {}
+        ids = {self.lexical_index.point_id(h["_entity"]): h["_entity"] for h in hits}
+        ids.pop(None, None)
+        if not ids:
+            return {}
+        async with qdrant_governor.slot():
+            points = await asyncio.to_thread(
+                self.qdrant_client.retrieve, self.collection_name, list(ids), with_payload=True, with_vectors=False
+            )
+        return {ids[str(p.id)]: (p.payload or {}).get("metadata") or {} for p in points if str(p.id) in ids}
+
+    async def _match_one(self, entity: str, k: int) -> List[Tuple[Dict, float]]:
+        """
+        单个实体的向量匹配
+        Embedding 经微批处理器合并 (可重试 / 对冲 / 取消)，向量检索放到线程中执行
+        """
+        vector = await self.embedding_batcher.submit(entity)
+        async with qdrant_governor.slot():
+            return await asyncio.to_thread(self._vector_search, vector, k, entity)
+
+    def _vector_search(self, vector: List[float], k: int, text: Optional[str] = None) -> List[Tuple[Dict, float]]:
+        """
+        按向量检索实体集合，返回 (metadata, score) 列表
+        集合带稀疏向量且给出了原文时，稠密 + BM25 在服务端 RRF 融合 (按融合名次取候选，得分仍是余弦相似度)
+        """
+        if self.shared_index is not None:
+            return self.shared_index.search(vector, k)
+        if self.sparse_ready and text:
+            return hybrid_query(self.qdrant_client, self.collection_name, vector, bm25_encoder.encode_query(text), k)
+        response = self.qdrant_client.query_points(
+            collection_name=self.collection_name,
+            query=vector,
+            limit=k,
+            with_payload=True
+        )
+        # QdrantVectorStore 把 metadata 存在 payload["metadata"] 下
+        return [((p.payload or {}).get("metadata") or {}, p.score) for p in response.points]
+
+    async def _neo4j_get_graph(self, matched_entities: List[Dict],
+                               prefetched: Optional[Dict[str, List[str]]] = None) -> str:
+        """
+        prefetched: 推测阶段已经取回的邻居 (普通数据，不含请求级的 future，可以放进共享的 single-flight 任务)
+        只为缺失的实体发起查询
+        """
         if not self.neo4j_driver or not matched_entities:
             return ""
             
         entity_names = [e["name"] for e in matched_entities[:3]]
         
-        cypher = """
-        MATCH (s:Entity)-[r]-(t:Entity)
-        WHERE s.name IN $names
-        RETURN s.name as source, type(r) as rel, t.name as target
-        LIMIT 15
-        """
-        
         try:
-            records = self.neo4j_driver.execute_query(cypher, {"names": entity_names})
-            data = getattr(records, 'records', records)
-            if not data: return "无直接关联信息"
-
-            relations = []
-            for record in data:
-                src = record.get('source') if isinstance(record, dict) else record['source']
-                rel = record.get('rel') if isinstance(record, dict) else record['rel']
-                tgt = record.get('target') if isinstance(record, dict) else record['target']
-                relations.append(f"{src} -[{rel}]-> {tgt}")
-            
+            hoods = dict(prefetched or {})
+            missing = [n for n in entity_names if n not in hoods]
+            if missing:
+                hoods.update(await self._neo4j_neighborhoods(missing))
+
+            relations = [line for name in entity_names for line in hoods.get(name, [])][:15]
+            tracer.set_attributes(edges=len(relations), prefetched=len(entity_names) - len(missing))
+            if not relations: return "无直接关联信息"
             return "\n".join(relations)
         except Exception as e:
             logger.warning(f"Neo4j查询失败: {e}")
             return ""
 
+    async def _neo4j_neighborhoods(self, names: List[str], per_name: int = 15) -> Dict[str, List[str]]:
+        """按实体分别取一跳邻居 (每个实体最多 per_name 条)，返回 实体名 -> ["src -[rel]-> tgt", ...]"""
+        cypher = """
+        UNWIND $names AS name
+        CALL {
+            WITH name
+            MATCH (s:Entity {name: name})-[r]-(t:Entity)
+            RETURN type(r) as rel, t.name as target
+            LIMIT $per_name
+        }
+        RETURN name as source, rel, target
+        """
+        # 使用异步查询：请求被取消时会话会一起中断
+        records = await self.neo4j_driver.aexecute_query(cypher, {"names": names, "per_name": per_name})
+        data = getattr(records, 'records', records)
+
+        hoods: Dict[str, List[str]] = {name: [] for name in names}
+        for record in data or []:
+            src = record.get('source') if isinstance(record, dict) else record['source']
+            rel = record.get('rel') if isinstance(record, dict) else record['rel']
+            tgt = record.get('target') if isinstance(record, dict) else record['target']
+            hoods.setdefault(src, []).append(f"{src} -[{rel}]-> {tgt}")
+        return hoods
+
 hybrid_search_service = None
 
 def init_hybrid_search():
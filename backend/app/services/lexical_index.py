@@ -0,0 +1,200 @@
+# app/services/lexical_index.py
+import re
+import sys
+import time
+import unicodedata
+import uuid
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.logger import logger
+
+# 单个 n-gram 的倒排表超过这个长度视为 "停用 gram" (如常见字)，模糊匹配时不参与候选计数
+MAX_POSTING_SCAN = 50_000
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_name(text: str) -> str:
+    """
+    实体名归一化：NFKC (全角 -> 半角) + casefold，去掉标点与空白
+    例: "Ｓｐａｃｅ Ｘ" / "spacex" / "Space-X" -> "spacex"，"埃隆·马斯克" -> "埃隆马斯克"
+    """
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in ("P", "Z", "C"))
+
+
+def _grams(key: str) -> List[str]:
+    """带边界标记的字符 bigram (中文实体名通常只有 2~4 个字，trigram 太稀疏)"""
+    padded = f"\x02{key}\x03"
+    return list(dict.fromkeys(padded[i:i + 2] for i in range(len(padded) - 1)))
+
+
+def _allowed_edits(length: int, max_edits: int) -> int:
+    """允许的编辑距离随长度增加：5 个字符以内必须精确 (短名称改一个字符往往是另一个实体)，之后每 4 个字符放宽 1 次"""
+    return min(max_edits, max(0, (length - 2) // 4))
+
+
+def bounded_levenshtein(a: str, b: str, limit: int) -> int:
+    """编辑距离，超过 limit 时提前返回 limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        best = i
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            best = min(best, current[j])
+        if best > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class LexicalIndex:
+    """
+    实体名 / 别名的进程内词法索引 (实体匹配的第一层，精确命中时不再做 Embedding + ANN)
+    - 精确层：归一化后的名称 -> key 编号 (哈希表)
+    - 模糊层：字符 bigram 倒排 (array('I') 存 key 编号) 取候选，按长度过滤后用有界编辑距离校验；
+      数字不同的候选直接排除 (A800 / A100、KX-4829 / KX-4821 是不同的实体，不是拼写错误)
+
+    内存：名称与类型字符串 intern，实体 / key 信息全部放在 array 中，
+    点 ID (UUID) 以 16 字节存放在 bytearray，用于命中后按需取回 payload (实体卡片)
+    """
+
+    def __init__(self, max_edits: int = 2):
+        self.max_edits = max_edits
+        # 实体表
+        self.names: List[str] = []
+        self.types: List[str] = []
+        self._point_ids = bytearray()
+        # key 表 (一个实体可以有多个 key：名称 + 别名)
+        self.keys: List[str] = []
+        self.key_entity = array("I")
+        self.exact: Dict[str, int] = {}
+        self.postings: Dict[str, array] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def add(self, name: str, entity_type: str = "unknown", aliases: Iterable[str] = (), point_id: Any = None):
+        entity = len(self.names)
+        self.names.append(sys.intern(name))
+        self.types.append(sys.intern(entity_type or "unknown"))
+        try:
+            self._point_ids += uuid.UUID(str(point_id)).bytes
+        except (ValueError, TypeError):
+            self._point_ids += bytes(16)
+
+        for raw in (name, *aliases):
+            key = normalize_name(raw) if isinstance(raw, str) else ""
+            if not key or key in self.exact:
+                continue
+            key_id = len(self.keys)
+            self.keys.append(key)
+            self.key_entity.append(entity)
+            self.exact[key] = key_id
+            for gram in _grams(key):
+                posting = self.postings.get(gram)
+                if posting is None:
+                    posting = self.postings[gram] = array("I")
+                posting.append(key_id)
+
+    def point_id(self, entity: int) -> Optional[str]:
+        raw = bytes(self._point_ids[entity * 16:(entity + 1) * 16])
+        return str(uuid.UUID(bytes=raw)) if any(raw) else None
+
+    def _result(self, key_id: int, score: float) -> Dict[str, Any]:
+        entity = self.key_entity[key_id]
+        return {"name": self.names[entity], "score": score, "type": self.types[entity], "_entity": entity}
+
+    def lookup(self, text: str, k: int = 2) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        返回 (匹配结果, 命中层级 "exact" / "fuzzy" / "miss")
+        精确命中只返回该实体；模糊命中按 1 - 编辑距离 / 长度 排序取前 k 个
+        """
+        key = normalize_name(text)
+        if not key:
+            return [], "miss"
+        key_id = self.exact.get(key)
+        if key_id is not None:
+            return [self._result(key_id, 1.0)], "exact"
+
+        limit = _allowed_edits(len(key), self.max_edits)
+        if limit == 0:
+            return [], "miss"
+        digits = _DIGITS.findall(key)
+        grams = _grams(key)
+        # 每次编辑最多破坏 2 个 bigram
+        need = max(1, len(grams) - 2 * limit)
+        counts: Dict[int, int] = {}
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is None or len(posting) > MAX_POSTING_SCAN:
+                continue
+            for candidate in posting:
+                counts[candidate] = counts.get(candidate, 0) + 1
+
+        matches = []
+        for candidate, shared in counts.items():
+            if shared < need:
+                continue
+            other = self.keys[candidate]
+            if _DIGITS.findall(other) != digits:
+                continue
+            distance = bounded_levenshtein(key, other, limit)
+            if distance <= limit:
+                matches.append((1 - distance / max(len(key), len(other)), candidate))
+        if not matches:
+            return [], "miss"
+
+        results, seen = [], set()
+        for score, candidate in sorted(matches, key=lambda m: (-m[0], self.keys[m[1]])):
+            entity = self.key_entity[candidate]
+            if entity in seen:
+                continue
+            seen.add(entity)
+            results.append(self._result(candidate, round(score, 4)))
+            if len(results) >= k:
+                break
+        return results, "fuzzy"
+
+    @classmethod
+    def from_qdrant(cls, client, collection_name: str, max_edits: int = 2, batch_size: int = 2000) -> "LexicalIndex":
+        """从实体集合构建 (payload["metadata"] 中的 name / type / aliases)"""
+        index = cls(max_edits)
+        start = time.perf_counter()
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name, limit=batch_size, offset=offset,
+                with_payload=True, with_vectors=False,
+            )
+            for p in points:
+                meta = (p.payload or {}).get("metadata") or {}
+                if isinstance(meta.get("name"), str):
+                    index.add(meta["name"], meta.get("type", "unknown"), meta.get("aliases") or (), p.id)
+            if offset is None:
+                break
+        index._log(start)
+        return index
+
+    @classmethod
+    def from_payloads(cls, payloads: Iterable[Dict[str, Any]], max_edits: int = 2) -> "LexicalIndex":
+        """从共享只读索引的 metadata 列表构建"""
+        index = cls(max_edits)
+        start = time.perf_counter()
+        for meta in payloads:
+            if isinstance(meta.get("name"), str):
+                index.add(meta["name"], meta.get("type", "unknown"), meta.get("aliases") or ())
+        index._log(start)
+        return index
+
+    def _log(self, start: float):
+        logger.info(
+            f"🔤 词法索引已构建: {len(self.names)} 个实体, {len(self.keys)} 个名称/别名, "
+            f"{len(self.postings)} 个 n-gram ({(time.perf_counter() - start) * 1000:.0f}ms)"
+        )
+
+
+__all__ = ["LexicalIndex", "normalize_name", "bounded_levenshtein"]
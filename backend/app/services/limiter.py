@@ -0,0 +1,319 @@
+# app/services/limiter.py
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, Type
+
+from app.core.config import settings
+from app.core.metrics import metrics
+from app.core.tracing import tracer
+from app.services.circuit import CircuitBreaker, CircuitOpenError
+
+# 当前请求的调度类别 ("interactive" / "batch")，由接口层设置，沿 asyncio 任务自动传递
+request_class: ContextVar[str] = ContextVar("request_class", default="interactive")
+
+
+def approx_tokens(text: str) -> int:
+    """粗略估算 token 数 (中英文混合按 2 字符 / token 估计)"""
+    return max(1, len(text) // 2)
+
+
+class TokenBucket:
+    """
+    令牌桶限速器
+    rate: 每秒补充的令牌数；capacity: 桶容量 (允许的突发量)
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, n: float = 1.0):
+        """取出 n 个令牌，不足时等待"""
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        n = min(n, self.capacity)
+        while True:
+            self._refill()
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def consume(self, n: float):
+        """事后扣减 (如: 按实际 token 用量修正)，允许透支"""
+        self._refill()
+        self.tokens -= n
+
+
+class AIMDLimit:
+    """
+    AIMD 自适应并发上限
+    - 成功且延迟正常：每个 "往返" 加 1 (limit += 1 / limit)
+    - 过载信号 (429 / 超时 / 延迟明显高于基线)：减半，冷却期内只减一次
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int, tolerance: float):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self._baseline: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def on_success(self, latency: float):
+        if self._baseline is None:
+            self._baseline = latency
+        if latency > self.tolerance * self._baseline:
+            self.on_overload()
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        # 基线是慢速 EWMA，只跟踪长期趋势
+        self._baseline = 0.95 * self._baseline + 0.05 * latency
+
+    def on_overload(self):
+        now = time.monotonic()
+        cooldown = self._baseline or 1.0
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * 0.5)
+
+
+class FairQueue:
+    """
+    按请求类别公平排队的并发闸门 (加权轮询)
+    并发上限由 AIMDLimit 动态决定；高权重类别 (interactive) 连续获得更多放行机会
+    """
+
+    def __init__(self, name: str, limit: AIMDLimit, weights: Dict[str, int]):
+        self.name = name
+        self.limit = limit
+        self.weights = weights
+        self.inflight = 0
+        self._queues: Dict[str, Deque[asyncio.Future]] = {}
+        self._order: List[str] = []
+        self._cursor = 0
+        self._credit = 0
+
+    @property
+    def classes(self) -> List[str]:
+        return list(self._order)
+
+    def depth(self, cls: Optional[str] = None) -> int:
+        if cls is not None:
+            return len(self._queues.get(cls, ()))
+        return sum(len(q) for q in self._queues.values())
+
+    def _report_depth(self, cls: str):
+        metrics.set_gauge("limiter_queue_depth", len(self._queues[cls]), backend=self.name, request_class=cls)
+
+    async def acquire(self, cls: str):
+        if self.inflight < int(self.limit.limit) and self.depth() == 0:
+            self.inflight += 1
+            return
+
+        if cls not in self._queues:
+            self._queues[cls] = deque()
+            self._order.append(cls)
+        fut = asyncio.get_running_loop().create_future()
+        self._queues[cls].append(fut)
+        self._report_depth(cls)
+
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 已被放行但调用方同时被取消：把名额还回去
+                self.release()
+            else:
+                try:
+                    self._queues[cls].remove(fut)
+                except ValueError:
+                    pass
+                self._report_depth(cls)
+            raise
+
+    def release(self):
+        self.inflight -= 1
+        self.wake()
+
+    def wake(self):
+        """在并发上限内按加权轮询放行排队者"""
+        while self.inflight < int(self.limit.limit) and self.depth():
+            cls = self._next_class()
+            fut = self._queues[cls].popleft()
+            self._report_depth(cls)
+            if fut.done():
+                continue
+            self.inflight += 1
+            fut.set_result(None)
+
+    def _next_class(self) -> str:
+        current = self._order[self._cursor % len(self._order)]
+        if self._credit > 0 and self._queues[current]:
+            self._credit -= 1
+            return current
+        for _ in range(len(self._order)):
+            self._cursor = (self._cursor + 1) % len(self._order)
+            cls = self._order[self._cursor]
+            if self._queues[cls]:
+                self._credit = self.weights.get(cls, 1) - 1
+                return cls
+        return current
+
+
+class ProviderGovernor:
+    """
+    单个后端的出站调用治理器
+    组合：熔断器 + 公平排队 + AIMD 并发上限 + 请求数令牌桶 (req/s) + token 令牌桶 (tokens/min)
+
+    client_errors: 调用方自身的错误 (如 400)，不计入熔断器的失败次数
+    """
+
+    def __init__(self,
+                 name: str,
+                 max_concurrency: int,
+                 max_rps: float = 0,
+                 max_tpm: float = 0,
+                 overload_errors: Tuple[Type[BaseException], ...] = (),
+                 client_errors: Tuple[Type[BaseException], ...] = ()):
+        self.name = name
+        self.client_errors = tuple(client_errors)
+        self.breaker = CircuitBreaker(
+            name,
+            failure_threshold=settings.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.CIRCUIT_RESET_TIMEOUT_S,
+            half_open_max_calls=settings.CIRCUIT_HALF_OPEN_MAX_CALLS,
+        )
+        # 配置的是整个部署 (所有 worker 进程) 的额度，按进程数均分
+        workers = max(1, settings.WORKERS)
+        max_concurrency = max(1, math.ceil(max_concurrency / workers))
+        max_rps, max_tpm = max_rps / workers, max_tpm / workers
+        self.aimd = AIMDLimit(
+            initial=max(1, max_concurrency // 2),
+            min_limit=1,
+            max_limit=max_concurrency,
+            tolerance=settings.LIMITER_LATENCY_TOLERANCE,
+        )
+        self.queue = FairQueue(name, self.aimd, settings.LIMITER_CLASS_WEIGHTS)
+        self.rps_bucket = TokenBucket(max_rps, max(1.0, max_rps)) if max_rps > 0 else None
+        self.tpm_bucket = TokenBucket(max_tpm / 60, max_tpm) if max_tpm > 0 else None
+        self.overload_errors = (asyncio.TimeoutError, TimeoutError) + tuple(overload_errors)
+        governor_registry[name] = self
+
+    def _record_outcome(self, error: Optional[BaseException]):
+        """把一次调用的结果计入熔断器 (取消既不算成功也不算失败)"""
+        if error is None:
+            self.breaker.record_success()
+        elif isinstance(error, asyncio.CancelledError):
+            self.breaker.abandon()
+        elif isinstance(error, Exception) and not isinstance(error, self.client_errors):
+            self.breaker.record_failure(type(error).__name__)
+
+    @asynccontextmanager
+    async def slot(self, tokens: int = 0):
+        """
+        获取一个出站调用名额
+        用法: async with governor.slot(tokens=...): await call()
+        熔断中直接抛出 CircuitOpenError，不进入排队
+        """
+        if not self.breaker.allow():
+            metrics.inc("circuit_rejected_total", backend=self.name)
+            raise CircuitOpenError(self.name, self.breaker.retry_in())
+
+        if not settings.LIMITER_ENABLED:
+            call_start = time.perf_counter()
+            try:
+                with tracer.span(f"backend.{self.name}"):
+                    yield
+            except BaseException as e:
+                self._record_outcome(e)
+                raise
+            else:
+                self._record_outcome(None)
+            finally:
+                metrics.observe("backend_call_seconds", time.perf_counter() - call_start, backend=self.name)
+            return
+
+        cls = request_class.get()
+        wait_start = time.perf_counter()
+        try:
+            await self.queue.acquire(cls)
+        except BaseException:
+            self.breaker.abandon()
+            raise
+        try:
+            if self.rps_bucket:
+                await self.rps_bucket.acquire(1)
+            if self.tpm_bucket and tokens:
+                await self.tpm_bucket.acquire(tokens)
+        except BaseException:
+            self.queue.release()
+            self.breaker.abandon()
+            raise
+
+        metrics.observe("limiter_wait_seconds", time.perf_counter() - wait_start, backend=self.name, request_class=cls)
+        metrics.set_gauge("limiter_inflight", self.queue.inflight, backend=self.name)
+
+        call_start = time.perf_counter()
+        try:
+            with tracer.span(f"backend.{self.name}", queued_ms=round((call_start - wait_start) * 1000, 2)):
+                yield
+        except self.overload_errors as e:
+            self.aimd.on_overload()
+            metrics.inc("limiter_overload_total", backend=self.name)
+            self._record_outcome(e)
+            raise
+        except BaseException as e:
+            # 部分客户端把 429 包装成通用异常
+            if isinstance(e, Exception) and "429" in str(e):
+                self.aimd.on_overload()
+                metrics.inc("limiter_overload_total", backend=self.name)
+            self._record_outcome(e)
+            raise
+        else:
+            self.aimd.on_success(time.perf_counter() - call_start)
+            self._record_outcome(None)
+        finally:
+            metrics.observe("backend_call_seconds", time.perf_counter() - call_start, backend=self.name)
+            self.queue.release()
+            metrics.set_gauge("limiter_inflight", self.queue.inflight, backend=self.name)
+            metrics.set_gauge("limiter_concurrency_limit", int(self.aimd.limit), backend=self.name)
+
+    async def run(self, factory: Callable[[], Awaitable[Any]], tokens: int = 0) -> Any:
+        """在名额内执行一次调用"""
+        async with self.slot(tokens):
+            return await factory()
+
+    def charge_tokens(self, tokens: int):
+        """按实际 token 用量修正 (正数补扣，负数返还)"""
+        if self.tpm_bucket and tokens:
+            self.tpm_bucket.consume(tokens)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "concurrency_limit": int(self.aimd.limit),
+            "max_concurrency": self.aimd.max_limit,
+            "inflight": self.queue.inflight,
+            "queue_depth": {cls: self.queue.depth(cls) for cls in self.queue.classes},
+            "rps_tokens": round(self.rps_bucket.tokens, 2) if self.rps_bucket else None,
+            "tpm_tokens": round(self.tpm_bucket.tokens, 1) if self.tpm_bucket else None,
+            "circuit": self.breaker.state,
+        }
+
+
+# 所有已创建的治理器 (backend 名 -> governor)，供 monitor 查看
+governor_registry: Dict[str, ProviderGovernor] = {}
+
+__all__ = ["ProviderGovernor", "governor_registry", "request_class", "approx_tokens"]
@@ -1,9 +1,22 @@
 # app/services/llm_factory.py
-from typing import Literal
+from typing import Literal, Optional
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseChatModel
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.hedging import HedgedChatModel, RETRYABLE_ERRORS, CLIENT_ERRORS
+from app.services.limiter import ProviderGovernor
+from app.services.recording import provider_archive, ReplayMissError
+
+# 所有模式共用同一个提供商端点，因此共用一个出站限流器
+llm_governor = ProviderGovernor(
+    "llm",
+    max_concurrency=settings.LLM_MAX_CONCURRENCY,
+    max_rps=settings.LLM_MAX_RPS,
+    max_tpm=settings.LLM_MAX_TPM,
+    overload_errors=RETRYABLE_ERRORS,
+    client_errors=CLIENT_ERRORS + (ReplayMissError,),
+)
 
 class LLMFactory:
     """
@@ -14,7 +27,8 @@ class LLMFactory:
     
     @staticmethod
     def get_llm(
-        mode: Literal["smart", "fast", "strict"] = "smart"
+        mode: Literal["smart", "fast", "strict"] = "smart",
+        temperature: Optional[float] = None
     ) -> BaseChatModel:
         """
         获取 LLM 实例的核心方法
@@ -24,6 +38,7 @@ class LLMFactory:
                 - "smart": 高智能模式 (qwen-max), 适合生成回答、推理、create_agent
                 - "fast":  极速模式 (qwen-plus), 适合实体抽取、简单分类
                 - "strict": 严谨模式 (qwen-plus, Temp=0), 适合 Validator 校验、JSON 格式化
+            temperature: 覆盖该模式的默认温度。Temp=0 的调用视为幂等，可开启对冲
         
         Returns:
             BaseChatModel 实例 (可直接用于 create_agent 的 model 参数)
@@ -68,13 +83,33 @@ class LLMFactory:
                 raise ValueError(error_msg)
 
             # 3. 创建 LLM 实例
-            config = config_map[mode]
-            llm = ChatOpenAI(
+            config = dict(config_map[mode])
+            if temperature is not None:
+                config["temperature"] = temperature
+
+            # 重试由 HedgedChatModel 统一处理 (带抖动)，关闭 SDK 自带的重试避免叠加
+            base_llm = ChatOpenAI(
                 base_url=settings.LLM_BASE_URL,
                 api_key=settings.LLM_API_KEY,
                 model=config["model"],
                 temperature=config["temperature"],
-                max_tokens=config["max_tokens"]
+                max_tokens=config["max_tokens"],
+                max_retries=0
+            )
+
+            # 录制 / 回放包在最内层：回放时重试、对冲、限流与指标照常工作
+            if provider_archive is not None:
+                base_llm = provider_archive.wrap_chat(base_llm, endpoint=f"llm:{config['model']}")
+
+            # 4. 包装：重试 + 延迟统计 + (幂等调用的) 对冲与合并 + 出站限流
+            llm = HedgedChatModel(
+                inner=base_llm,
+                endpoint=f"llm:{config['model']}",
+                hedge=settings.HEDGING_ENABLED and config["temperature"] == 0,
+                governor=llm_governor,
+                deterministic=config["temperature"] == 0,
+                mode=mode,
+                model_name=config["model"]
             )
 
             logger.success(
@@ -1,38 +1,77 @@
 from typing import List, Dict, Any, Optional
-from neo4j import GraphDatabase, Driver
+from neo4j import GraphDatabase, Driver, AsyncGraphDatabase, AsyncDriver
+from neo4j.exceptions import ClientError, TransientError, ServiceUnavailable, SessionExpired
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.limiter import ProviderGovernor
+
+neo4j_governor = ProviderGovernor(
+    "neo4j",
+    max_concurrency=settings.NEO4J_MAX_CONCURRENCY,
+    overload_errors=(TransientError, ServiceUnavailable, SessionExpired),
+    # Cypher 语法 / 约束错误不计入熔断
+    client_errors=(ClientError,),
+)
 
 class Neo4jManager:
     _driver: Driver = None
+    _async_driver: AsyncDriver = None
 
     def __init__(self):
-        """初始化连接"""
+        """
+        只保存配置，不在导入时建立连接
+        连接在首次查询时懒加载，或由启动阶段调用 verify() 并发完成
+        """
         self.uri = settings.NEO4J_URI
         self.user = settings.NEO4J_USERNAME
         self.password = settings.NEO4J_PASSWORD
-        self._connect()
 
     def _connect(self):
         """内部连接方法"""
         try:
             self._driver = GraphDatabase.driver(
                 self.uri, 
-                auth=(self.user, self.password)
+                auth=(self.user, self.password),
+                max_connection_pool_size=settings.NEO4J_POOL_SIZE
             )
             # 验证连接
             self._driver.verify_connectivity()
             logger.success(f"✅ Neo4j 连接成功: {self.uri}")
         except Exception as e:
             logger.error(f"❌ Neo4j 连接失败: {e}")
+            self._driver = None
             raise e
 
+    def verify(self):
+        """建立并验证连接 (启动阶段在线程中调用)"""
+        if self._driver is None:
+            self._connect()
+        else:
+            self._driver.verify_connectivity()
+
+    def _get_async_driver(self) -> AsyncDriver:
+        """懒加载异步驱动 (供请求路径使用，可随请求一起被取消)"""
+        if self._async_driver is None:
+            self._async_driver = AsyncGraphDatabase.driver(
+                self.uri,
+                auth=(self.user, self.password),
+                max_connection_pool_size=settings.NEO4J_POOL_SIZE
+            )
+        return self._async_driver
+
     def close(self):
         """关闭连接"""
         if self._driver:
             self._driver.close()
             logger.info("Neo4j 连接已关闭")
 
+    async def aclose(self):
+        """关闭同步 + 异步连接"""
+        self.close()
+        if self._async_driver:
+            await self._async_driver.close()
+            self._async_driver = None
+
     def execute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
         """
         执行 Cypher 查询并返回字典列表
@@ -71,6 +110,28 @@ class Neo4jManager:
             # 这里可以选择 raise e 或者返回空列表，视业务需求而定
             raise e
 
+    async def aexecute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        异步执行 Cypher 查询并返回字典列表
+
+        与 execute_query 不同，这里不会阻塞事件循环；
+        当上层请求被取消时，CancelledError 会中断会话并释放连接
+        """
+        if parameters is None:
+            parameters = {}
+
+        try:
+            async with neo4j_governor.slot():
+                result = await self._get_async_driver().execute_query(
+                    query,
+                    parameters_=parameters,
+                    database_="neo4j"
+                )
+            return [record.data() for record in result.records]
+        except Exception as e:
+            logger.error(f"❌ Cypher 执行出错:\nQuery: {query}\nError: {e}")
+            raise e
+
     # --- 👇 GraphRAG 常用辅助功能 👇 ---
 
     def clear_database(self):
@@ -82,12 +143,9 @@ class Neo4jManager:
         
     def check_health(self) -> Dict[str, Any]:
         """检查 Neo4j 连接状态"""
-        if not self._driver:
-            return {"status": "down", "error": "Driver not initialized"}
-        
         try:
-            # 验证连接
-            self._driver.verify_connectivity()
+            # 验证连接 (未连接时顺带懒加载)
+            self.verify()
             return {
                 "status": "healthy",
                 "address": self.uri
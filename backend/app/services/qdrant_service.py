@@ -3,15 +3,21 @@ from qdrant_client.http import models
 from app.services.embedding_factory import embedding_factory
 from app.core.config import settings
 from app.core.logger import logger
+from app.services.limiter import ProviderGovernor
+from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder, has_sparse_vectors, sparse_vectors_config
 import uuid
 
 from typing import List, Dict, Any, Optional
 
+qdrant_governor = ProviderGovernor("qdrant", max_concurrency=settings.QDRANT_MAX_CONCURRENCY)
+
 class QdrantManager:
     _client: QdrantClient = None
 
     def __init__(self):
         self.client = None
+        # 集合是否配置了稀疏向量 (按集合缓存，避免每次写入都 get_collection)
+        self._sparse_collections: Dict[str, bool] = {}
 
     def get_client(self):
         # 懒加载：第一次被调用时才连接
@@ -19,16 +25,32 @@ class QdrantManager:
             self._connect()
         return self.client
 
+    @property
+    def is_embedded(self) -> bool:
+        """QDRANT_URL 是本地路径 (嵌入式，带文件锁，仅限单进程) 还是 Qdrant 服务地址"""
+        return not settings.QDRANT_URL.startswith(("http://", "https://"))
+
     def _connect(self):
         try:
-            # 你的本地路径配置
-            self.client = QdrantClient(path="./qdrant_data")
-            logger.success(f"✅ Qdrant 客户端初始化成功: ./qdrant_data")
+            if not self.is_embedded:
+                self.client = QdrantClient(url=settings.QDRANT_URL, api_key=settings.QDRANT_API_KEY)
+            elif settings.SHARED_INDEX_READONLY:
+                # 多 worker 模式下嵌入式库只由启动器读写，worker 打开会与文件锁冲突
+                raise RuntimeError("共享只读模式下 worker 不允许打开嵌入式 Qdrant")
+            else:
+                self.client = QdrantClient(path=settings.QDRANT_URL)
+            logger.success(f"✅ Qdrant 客户端初始化成功: {settings.QDRANT_URL}")
         except Exception as e:
             logger.error(f"❌ Qdrant 初始化失败: {e}")
             # 抛出异常，让上层感知
             raise e
 
+    def close(self):
+        """关闭客户端 (释放嵌入式库的文件锁)"""
+        if self.client is not None:
+            self.client.close()
+            self.client = None
+
     def create_collection_if_not_exists(self, collection_name: str, vector_size: int = 4096):
         """
         创建一个集合 (类似 SQL 的 Table)
@@ -37,43 +59,65 @@ class QdrantManager:
         
         vector_size = vector_size or settings.EMBD_DIMENSIONS
         
-        if not self._client.collection_exists(collection_name):
-            self._client.create_collection(
+        client = self.get_client()
+        if not client.collection_exists(collection_name):
+            client.create_collection(
                 collection_name=collection_name,
                 vectors_config=models.VectorParams(
                     size=vector_size, 
                     distance=models.Distance.COSINE
-                )
+                ),
+                # BM25 稀疏向量 (IDF 由服务端统计)
+                sparse_vectors_config=sparse_vectors_config() if settings.SPARSE_ENABLED else None
             )
+            self._sparse_collections[collection_name] = settings.SPARSE_ENABLED
             logger.info(f"已创建新集合: {collection_name}")
         else:
             logger.info(f"集合已存在: {collection_name}")
 
+    def has_sparse(self, collection_name: str) -> bool:
+        """集合是否配置了 BM25 稀疏向量 (结果按集合缓存；backfill_sparse 追加配置后需重启生效)"""
+        if collection_name not in self._sparse_collections:
+            self._sparse_collections[collection_name] = has_sparse_vectors(self.get_client(), collection_name)
+        return self._sparse_collections[collection_name]
+
     def upsert_vectors(self, 
                        collection_name: str,
                        vectors: List[List[float]], 
                        payloads: List[Dict[str, Any]], 
-                       ids: Optional[List[str]] = None):
-        """接受向量 直接插入指定集合"""
+                       ids: Optional[List[str]] = None,
+                       texts: Optional[List[str]] = None):
+        """
+        接受向量 直接插入指定集合
+        texts: 原文，集合配置了稀疏向量时同时写入 BM25 稀疏向量
+        实体写入应走这里 (或 add_texts)：经 QdrantVectorStore 写入的点不带稀疏向量，
+        需要重新运行 python -m app.cli.backfill_sparse
+        """
         try:
             batch_size = len(vectors)
             
             # 如果没有提供 ID，则自动生成 UUID
             if ids is None:
                 ids = [str(uuid.uuid4()) for _ in range(batch_size)]
+
+            client = self.get_client()
+            with_sparse = texts is not None and self.has_sparse(collection_name)
             
             # 构造 Qdrant 需要的 PointStruct 列表
             points = [
                 models.PointStruct(
                     id=ids[i],
-                    vector=vectors[i],
+                    vector=(
+                        {"": vectors[i], SPARSE_VECTOR_NAME: bm25_encoder.encode_document(texts[i])}
+                        if with_sparse else vectors[i]
+                    ),
                     payload=payloads[i]
                 )
                 for i in range(batch_size)
             ]
 
             # 执行 Upsert 操作
-            self._client.upsert(
+            client.upsert(
                 collection_name=collection_name,
                 points=points
             )
@@ -105,7 +149,7 @@ class QdrantManager:
             vectors = embeddings_model.embed_documents(texts)
             
             # 3. 存入 Qdrant
-            self.upsert_vectors(collection_name, vectors, metadatas)
+            self.upsert_vectors(collection_name, vectors, metadatas, texts=texts)
             
         except Exception as e:
             logger.error(f"❌ add_texts 处理流程失败: {e}")
@@ -126,11 +170,15 @@ class QdrantManager:
     
     def check_health(self) -> Dict[str, Any]:
         """检查 Qdrant 集合状态"""
+        if settings.SHARED_INDEX_READONLY and self.is_embedded:
+            # 多 worker 模式下 worker 只读共享快照，不持有嵌入式库
+            return {"status": "healthy", "mode": "shared_index", "path": str(settings.SHARED_INDEX_DIR)}
         client = self.get_client() # 使用懒加载获取
         if not client:
              return {"status": "down", "error": "Client init failed"}
              
-        collection_name = "test-collection" # 你的集合名
+        # 当前实体向量空间 (ENTITY_EMBD_BACKEND) 的集合名
+        collection_name = embedding_factory.collection_name("test-collection", settings.ENTITY_EMBD_BACKEND)
         try:
             # 获取集合信息
             info = client.get_collection(collection_name)
@@ -0,0 +1,290 @@
+# app/services/recording.py
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.core.metrics import metrics
+
+
+class ReplayMissError(RuntimeError):
+    """回放模式下归档中没有与请求匹配的记录"""
+
+
+def _digest(payload: Dict[str, Any]) -> str:
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+class ProviderArchive:
+    """
+    提供商调用的录制 / 回放归档 (gzip 压缩的 JSON 行)
+    每行: {"key", "endpoint", "latency", "response", "request"}
+
+    - record: 追加写入 (多次运行产生多个 gzip 成员，读取时自动拼接)
+    - replay: 启动时整体载入；同一请求录制了多条时按顺序轮流返回，
+      没有匹配记录时记录错误日志 + 指标并抛出 ReplayMissError
+    """
+
+    def __init__(self, path: Path, mode: str, timing: str = "none", time_scale: float = 1.0):
+        self.path = Path(path)
+        self.mode = mode
+        self.timing = timing
+        self.time_scale = time_scale
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._cursor: Dict[str, int] = {}
+        self._latencies: Dict[str, List[float]] = defaultdict(list)
+        self._rng = random.Random(0)
+        self._lock = threading.Lock()
+        self._writer = None
+        if mode == "replay":
+            self._load()
+        atexit.register(self.close)
+
+    def _load(self):
+        if not self.path.exists():
+            raise FileNotFoundError(f"回放归档不存在: {self.path} (先用 PROVIDER_RECORD_MODE=record 录制)")
+        count = 0
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    entry = json.loads(line)
+                    self._entries.setdefault(entry["key"], []).append(entry)
+                    self._latencies[entry["endpoint"]].append(entry["latency"])
+                    count += 1
+        except (EOFError, gzip.BadGzipFile) as e:
+            # 录制进程被强杀时最后一个 gzip 成员可能不完整，保留已读出的部分
+            logger.warning(f"⚠️ 回放归档末尾不完整 ({e})，已载入 {count} 条")
+        logger.success(f"📼 已载入回放归档: {self.path} ({count} 条, {len(self._entries)} 个不同请求)")
+
+    # --- 录制 ---
+    def record(self, key: str, endpoint: str, latency: float, response: Any, request: Any):
+        line = json.dumps({
+            "key": key,
+            "endpoint": endpoint,
+            "latency": round(latency, 4),
+            "response": response,
+            "request": request,
+        }, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._writer is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._writer = gzip.open(self.path, "at", encoding="utf-8")
+            self._writer.write(line + "\n")
+            self.recorded += 1
+            if self.recorded % 50 == 0:
+                self._writer.flush()
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+    # --- 回放 ---
+    def lookup(self, key: str, endpoint: str, request: Any) -> Tuple[Any, float]:
+        """返回 (录制的响应, 应模拟的延迟秒数)"""
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+            else:
+                index = self._cursor.get(key, 0)
+                self._cursor[key] = index + 1
+                entry = entries[index % len(entries)]
+                self.hits += 1
+                delay = self._delay(entry)
+
+        if not entries:
+            metrics.inc("provider_replay_total", endpoint=endpoint, result="miss")
+            preview = json.dumps(request, ensure_ascii=False, default=str)[:300]
+            logger.error(f"📼❌ 回放未命中: {endpoint} key={key} 请求={preview}")
+            raise ReplayMissError(f"回放归档中没有匹配的请求: {endpoint} key={key}")
+        metrics.inc("provider_replay_total", endpoint=endpoint, result="hit")
+        return entry["response"], delay
+
+    def _delay(self, entry: Dict[str, Any]) -> float:
+        if self.timing == "original":
+            return entry["latency"] * self.time_scale
+        if self.timing == "distribution":
+            return self._rng.choice(self._latencies[entry["endpoint"]]) * self.time_scale
+        return 0.0
+
+    # --- 包装 ---
+    def wrap_chat(self, model: BaseChatModel, endpoint: str) -> BaseChatModel:
+        return RecordingChatModel(inner=model, archive=self, endpoint=endpoint)
+
+    def wrap_embeddings(self, embeddings: Embeddings, endpoint: str) -> Embeddings:
+        return RecordingEmbeddings(embeddings, self, endpoint)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "path": str(self.path),
+            "timing": self.timing,
+            "recorded": self.recorded,
+            "requests": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class RecordingChatModel(BaseChatModel):
+    """
+    包在真实 ChatModel 外面 (HedgedChatModel 之内)：
+    回放时重试、对冲、限流、指标和追踪照常工作，只是 "提供商" 换成了归档
+    """
+    inner: BaseChatModel
+    archive: Any
+    endpoint: str
+
+    @property
+    def _llm_type(self) -> str:
+        return f"recorded-{self.inner._llm_type}"
+
+    def _request(self, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "endpoint": self.endpoint,
+            "temperature": getattr(self.inner, "temperature", None),
+            "max_tokens": getattr(self.inner, "max_tokens", None),
+            "messages": [(m.type, m.content) for m in messages],
+            "stop": list(stop or ()),
+            "kwargs": kwargs,
+        }
+
+    @staticmethod
+    def _encode(result: ChatResult) -> Dict[str, Any]:
+        return {
+            "generations": [
+                {"message": message_to_dict(g.message), "generation_info": g.generation_info}
+                for g in result.generations
+            ],
+            "llm_output": result.llm_output,
+        }
+
+    @staticmethod
+    def _decode(response: Dict[str, Any]) -> ChatResult:
+        generations = [
+            ChatGeneration(message=messages_from_dict([g["message"]])[0], generation_info=g.get("generation_info"))
+            for g in response["generations"]
+        ]
+        return ChatResult(generations=generations, llm_output=response.get("llm_output"))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        request = self._request(messages, stop, kwargs)
+        key = _digest(request)
+        if self.archive.mode == "replay":
+            response, delay = self.archive.lookup(key, self.endpoint, request)
+            if delay:
+                time.sleep(delay)
+            return self._decode(response)
+
+        start = time.perf_counter()
+        result = self.inner._generate(messages, stop=stop, **kwargs)
+        self.archive.record(key, self.endpoint, time.perf_counter() - start, self._encode(result), request)
+        return result
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs: Any) -> ChatResult:
+        request = self._request(messages, stop, kwargs)
+        key = _digest(request)
+        if self.archive.mode == "replay":
+            response, delay = self.archive.lookup(key, self.endpoint, request)
+            if delay:
+                await asyncio.sleep(delay)
+            return self._decode(response)
+
+        start = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        self.archive.record(key, self.endpoint, time.perf_counter() - start, self._encode(result), request)
+        return result
+
+
+class RecordingEmbeddings(Embeddings):
+    """
+    Embedding 按单条文本录制 (微批的组合每次运行都不同)，批量调用的延迟记在批内每条文本上；
+    回放一批时取其中最大的延迟
+    """
+
+    def __init__(self, inner: Embeddings, archive: ProviderArchive, endpoint: str):
+        self.inner = inner
+        self.archive = archive
+        self.endpoint = endpoint
+
+    def _key(self, text: str) -> str:
+        return _digest({"endpoint": self.endpoint, "text": text})
+
+    def _replay(self, texts: List[str]) -> Tuple[List[List[float]], float]:
+        vectors, delay = [], 0.0
+        for text in texts:
+            vector, text_delay = self.archive.lookup(self._key(text), self.endpoint, {"text": text})
+            vectors.append(vector)
+            delay = max(delay, text_delay)
+        return vectors, delay
+
+    def _record(self, texts: List[str], vectors: List[List[float]], latency: float):
+        for text, vector in zip(texts, vectors):
+            self.archive.record(self._key(text), self.endpoint, latency, vector, {"text": text})
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.archive.mode == "replay":
+            vectors, delay = self._replay(texts)
+            if delay:
+                time.sleep(delay)
+            return vectors
+        start = time.perf_counter()
+        vectors = self.inner.embed_documents(texts)
+        self._record(texts, vectors, time.perf_counter() - start)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.archive.mode == "replay":
+            vectors, delay = self._replay(texts)
+            if delay:
+                await asyncio.sleep(delay)
+            return vectors
+        start = time.perf_counter()
+        vectors = await self.inner.aembed_documents(texts)
+        self._record(texts, vectors, time.perf_counter() - start)
+        return vectors
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+# --- 单例导出 ---
+# PROVIDER_RECORD_MODE=off 时为 None，工厂不做任何包装
+provider_archive: Optional[ProviderArchive] = (
+    ProviderArchive(
+        settings.PROVIDER_ARCHIVE_PATH,
+        settings.PROVIDER_RECORD_MODE,
+        settings.PROVIDER_REPLAY_TIMING,
+        settings.PROVIDER_REPLAY_TIME_SCALE,
+    )
+    if settings.PROVIDER_RECORD_MODE != "off" else None
+)
+
+__all__ = ["provider_archive", "ProviderArchive", "ReplayMissError"]
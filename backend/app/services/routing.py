@@ -0,0 +1,200 @@
+# app/services/routing.py
+import asyncio
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from pydantic import BaseModel, Field
+
+from app.core.config import settings
+from app.core.logger import correlation_id, logger
+from app.core.metrics import metrics
+from app.services.lexical_index import normalize_name
+from app.services.limiter import request_class
+
+# 各项特征达到该值时得分为 1 (实体数 / 图谱关系行数 / 对话轮数)
+ENTITY_SATURATION = 4
+GRAPH_SATURATION = 15
+HISTORY_SATURATION = 6
+# 影子调用的限流类别 (与 /chat/batch 相同，排在交互请求之后)
+SHADOW_REQUEST_CLASS = "batch"
+# 检索降级时的占位文本，不算图谱关系
+_EMPTY_GRAPH = {"", "无实体", "无直接关联信息"}
+
+
+class RouteDecision(BaseModel):
+    """一次请求的路由结果 (写入 AgentState.route，生成 / 校验节点共用)"""
+    tier: str = Field("complex", description="simple / complex")
+    score: float = Field(1.0, description="复杂度得分 0~1")
+    features: Dict[str, float] = Field(default_factory=dict, description="各项特征得分")
+    generation_mode: str = "smart"
+    generation_max_tokens: Optional[int] = None
+    validation_mode: str = "smart"
+    validation_max_tokens: Optional[int] = None
+    # 本次是否在后台跑影子对比
+    shadow: bool = False
+
+
+def _has_keyword(keyword: str, lowered: str) -> bool:
+    """英文关键词按单词边界匹配 (how 不匹配 show / however)，中文关键词按子串匹配"""
+    keyword = keyword.lower()
+    if keyword.isascii():
+        return re.search(rf"\b{re.escape(keyword)}\b", lowered) is not None
+    return keyword in lowered
+
+
+def question_type_score(query: str) -> float:
+    """推理类问题 1，事实类问题 0，无法判断 0.5 (关键词启发式，推理类优先)"""
+    lowered = query.lower()
+    if any(_has_keyword(k, lowered) for k in settings.ROUTING_REASONING_KEYWORDS):
+        return 1.0
+    if any(_has_keyword(k, lowered) for k in settings.ROUTING_FACTOID_KEYWORDS):
+        return 0.0
+    return 0.5
+
+
+def complexity_features(query: str, entities: List[str], graph_context: str, history_turns: int) -> Dict[str, float]:
+    graph_lines = 0 if graph_context.strip() in _EMPTY_GRAPH else len(graph_context.strip().splitlines())
+    return {
+        "entities": min(len(entities) / ENTITY_SATURATION, 1.0),
+        "graph": min(graph_lines / GRAPH_SATURATION, 1.0),
+        "question": question_type_score(query),
+        "history": min(history_turns / HISTORY_SATURATION, 1.0),
+    }
+
+
+def answer_similarity(a: str, b: str) -> float:
+    """两个回答的字符 bigram Jaccard 相似度 (归一化后比较，影子对比用的廉价质量信号)"""
+    def grams(text: str) -> Set[str]:
+        key = normalize_name(text)
+        return {key[i:i + 2] for i in range(len(key) - 1)} or ({key} if key else set())
+
+    x, y = grams(a), grams(b)
+    if not x and not y:
+        return 1.0
+    return len(x & y) / len(x | y)
+
+
+class ModelRouter:
+    """
+    按问题复杂度为生成 / 校验节点选择模型模式与输出 token 上限
+    - 复杂度 = 实体数、图谱关系数、问题类型、对话轮数的加权和 (权重见 ROUTING_WEIGHTS)
+    - 低于 ROUTING_SIMPLE_THRESHOLD 的问题视为简单问题：生成用 fast、校验用 strict，并收紧输出上限
+    - ROUTING_MODE=shadow 时仍由 smart 作答，采样的简单问题在后台用 fast 再答一次；
+      ROUTING_MODE=on 时由 fast 作答，采样的简单问题在后台用 smart 再答一次。两者的对比写入 ROUTING_SHADOW_LOG
+    """
+
+    def __init__(self):
+        self._rng = random.Random()
+        self._lock = threading.Lock()
+        # 后台影子任务 (持有引用，避免被 GC 回收)
+        self._shadow_tasks: Set[asyncio.Task] = set()
+
+    def route(self, state: Dict[str, Any]) -> RouteDecision:
+        if settings.ROUTING_MODE == "off":
+            return RouteDecision()
+
+        features = complexity_features(
+            state.get("query", ""),
+            state.get("entities") or [],
+            state.get("graph_context") or "",
+            len(state.get("messages") or []) // 2,
+        )
+        weights = settings.ROUTING_WEIGHTS
+        total = sum(weights.get(name, 0.0) for name in features) or 1.0
+        score = round(sum(value * weights.get(name, 0.0) for name, value in features.items()) / total, 4)
+        simple = score < settings.ROUTING_SIMPLE_THRESHOLD
+        tier = "simple" if simple else "complex"
+        serve_simple = simple and settings.ROUTING_MODE == "on"
+
+        decision = RouteDecision(
+            tier=tier,
+            score=score,
+            features=features,
+            generation_mode="fast" if serve_simple else "smart",
+            generation_max_tokens=settings.ROUTING_SIMPLE_MAX_TOKENS if serve_simple else None,
+            validation_mode="strict" if serve_simple else "smart",
+            # 校验输出只是一段 JSON，与档位无关
+            validation_max_tokens=settings.ROUTING_VALIDATION_MAX_TOKENS if settings.ROUTING_MODE == "on" else None,
+            shadow=simple and self._rng.random() < settings.ROUTING_SHADOW_SAMPLE_RATE,
+        )
+        metrics.inc("routing_decisions_total", tier=tier, mode=decision.generation_mode)
+        return decision
+
+    def shadow_variant(self, decision: RouteDecision) -> Dict[str, Any]:
+        """影子调用使用的 (mode, max_tokens)：与实际作答的一方相反"""
+        if decision.generation_mode == "smart":
+            return {"mode": "fast", "max_tokens": settings.ROUTING_SIMPLE_MAX_TOKENS}
+        return {"mode": "smart", "max_tokens": None}
+
+    def spawn_shadow(self, decision: RouteDecision, query: str, answer: str, latency: float, rerun) -> None:
+        """
+        在后台用另一种模型重新作答并记录对比，不影响已返回的回答
+        rerun: 无参协程工厂，返回影子回答
+        影子任务在全新的 context 中运行：不继承请求的追踪 span 与 interactive 调度类别
+        (请求结束、准入名额释放后，它不应再占用交互请求的限流名额)
+        """
+        # create_task(context=...) 需要 Python 3.11；在空 context 中调用 create_task，任务会复制这个空 context
+        task = contextvars.Context().run(
+            asyncio.create_task, self._shadow(decision, query, answer, latency, rerun, correlation_id.get())
+        )
+        self._shadow_tasks.add(task)
+        task.add_done_callback(self._shadow_tasks.discard)
+
+    async def _shadow(self, decision: RouteDecision, query: str, answer: str, latency: float, rerun, cid: str):
+        request_class.set(SHADOW_REQUEST_CLASS)
+        correlation_id.set(cid)  # 日志仍能关联到原请求
+        start = time.perf_counter()
+        try:
+            other = await rerun()
+        except Exception as e:
+            logger.warning(f"⚠️ [ROUTING] 影子调用失败: {e}")
+            metrics.inc("routing_shadow_total", result="error")
+            return
+        other_latency = time.perf_counter() - start
+
+        # 统一成 routed (fast) / smart 两侧，方便离线汇总
+        served_smart = decision.generation_mode == "smart"
+        routed, smart = (other, answer) if served_smart else (answer, other)
+        routed_s, smart_s = (other_latency, latency) if served_smart else (latency, other_latency)
+        similarity = round(answer_similarity(routed, smart), 4)
+        metrics.observe("routing_shadow_similarity", similarity, tier=decision.tier)
+        metrics.inc("routing_shadow_total", result="ok")
+        await asyncio.to_thread(self._record, {
+            "ts": round(time.time(), 3),
+            "query": query,
+            "tier": decision.tier,
+            "score": decision.score,
+            "features": decision.features,
+            "served": decision.generation_mode,
+            "similarity": similarity,
+            "routed_ms": round(routed_s * 1000, 1),
+            "smart_ms": round(smart_s * 1000, 1),
+            "routed_answer": routed,
+            "smart_answer": smart,
+        })
+        logger.debug("   - [影子对比] 相似度 {} | routed {:.0f}ms vs smart {:.0f}ms", similarity, routed_s * 1000, smart_s * 1000)
+
+    def _record(self, entry: Dict[str, Any]):
+        """追加一行影子记录 (在线程中执行，不阻塞事件循环)"""
+        line = json.dumps(entry, ensure_ascii=False)
+        try:
+            with self._lock:
+                settings.ROUTING_SHADOW_LOG.parent.mkdir(parents=True, exist_ok=True)
+                with open(settings.ROUTING_SHADOW_LOG, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            logger.warning(f"⚠️ [ROUTING] 影子记录写入失败: {e}")
+
+
+# --- 单例导出 ---
+model_router = ModelRouter()
+
+__all__ = [
+    "RouteDecision", "ModelRouter", "model_router",
+    "complexity_features", "question_type_score", "answer_similarity",
+]
@@ -0,0 +1,185 @@
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.logger import logger
+
+VECTORS_FILE = "vectors.npy"
+# 每行一个 metadata (JSON)，按行号用 PAYLOAD_OFFSETS_FILE 中的字节偏移定位
+PAYLOADS_FILE = "payloads.jsonl"
+PAYLOAD_OFFSETS_FILE = "payload_offsets.npy"
+# 按行号顺序拼接的实体名 (UTF-8)，行已按名称排序，lookup 在其上二分查找
+NAMES_FILE = "names.bin"
+NAME_OFFSETS_FILE = "name_offsets.npy"
+META_FILE = "meta.json"
+
+
+def _offsets(chunks: List[bytes]) -> np.ndarray:
+    """每段的起始字节偏移 (长度 n + 1，最后一项为总长度)"""
+    return np.concatenate(([0], np.cumsum([len(c) for c in chunks], dtype=np.int64))).astype(np.int64)
+
+
+def _map_bytes(path: Path) -> np.ndarray:
+    """只读映射整个文件 (空文件不能 mmap，返回空数组)"""
+    if path.stat().st_size == 0:
+        return np.zeros(0, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode="r")
+
+
+class SharedVectorIndex:
+    """
+    只读共享向量索引 (多 worker 模式)
+
+    - export(): 由唯一写者 (启动器主进程) 从嵌入式 Qdrant 导出，行按实体名排序 (无名称的排在最后)：
+      vectors.npy (L2 归一化的 float32 矩阵) + payloads.jsonl / names.bin (附字节偏移表) + meta.json
+    - load(): worker 以只读 mmap 打开全部数据文件，所有进程共享同一份操作系统页缓存，
+      不再在每个 worker 中解析全部 payload、建名称字典；
+      search / lookup 只解码命中的那几行 (lookup 在已排序的名称上二分查找)
+    - 注意：实体名词法索引 (LexicalIndex) 仍由每个 worker 各自构建 (紧凑的 array 结构)，
+      这部分内存随 worker 数增长
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.vectors: Optional[np.ndarray] = None
+        self._payloads = np.zeros(0, dtype=np.uint8)
+        self._payload_offsets = np.zeros(1, dtype=np.int64)
+        self._names = np.zeros(0, dtype=np.uint8)
+        self._name_offsets = np.zeros(1, dtype=np.int64)
+        self._named = 0
+
+    def __len__(self) -> int:
+        return len(self._payload_offsets) - 1
+
+    @staticmethod
+    def export(client, collection_name: str, directory: Path, batch_size: int = 1000) -> int:
+        """
+        把集合中的全部向量与 metadata 导出到 directory，返回条数
+        先写临时文件再 os.replace，正在读旧快照的进程不受影响
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        vectors, payloads = [], []
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name=collection_name,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            for p in points:
+                vector = p.vector
+                if isinstance(vector, dict):
+                    vector = next(iter(vector.values()), None)
+                if vector is None:
+                    continue
+                vectors.append(vector)
+                # QdrantVectorStore 把 metadata 存在 payload["metadata"] 下
+                payloads.append((p.payload or {}).get("metadata") or {})
+            if offset is None:
+                break
+
+        # 有名称的行按名称排序放在前面，lookup 可以二分查找
+        order = sorted(
+            range(len(payloads)),
+            key=lambda i: (0, payloads[i]["name"]) if isinstance(payloads[i].get("name"), str) else (1, ""),
+        )
+        vectors = [vectors[i] for i in order]
+        payloads = [payloads[i] for i in order]
+        named = sum(1 for p in payloads if isinstance(p.get("name"), str))
+
+        matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if len(matrix):
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix /= np.where(norms == 0, 1.0, norms)
+
+        payload_lines = [(json.dumps(p, ensure_ascii=False) + "\n").encode("utf-8") for p in payloads]
+        names = [p["name"].encode("utf-8") for p in payloads[:named]]
+        files = {
+            PAYLOADS_FILE: b"".join(payload_lines),
+            NAMES_FILE: b"".join(names),
+            META_FILE: json.dumps({
+                "collection": collection_name,
+                "count": len(payloads),
+                "named": named,
+                "dimensions": int(matrix.shape[1]) if len(matrix) else 0,
+            }).encode("utf-8"),
+        }
+        arrays = {
+            VECTORS_FILE: matrix,
+            PAYLOAD_OFFSETS_FILE: _offsets(payload_lines),
+            NAME_OFFSETS_FILE: _offsets(names),
+        }
+        for name, data in files.items():
+            (directory / (name + ".tmp")).write_bytes(data)
+        for name, array in arrays.items():
+            with open(directory / (name + ".tmp"), "wb") as f:
+                np.save(f, array)
+        # meta.json 最后替换
+        for name in [*arrays, PAYLOADS_FILE, NAMES_FILE, META_FILE]:
+            os.replace(directory / (name + ".tmp"), directory / name)
+        logger.success(f"✅ 已导出共享索引: {collection_name} -> {directory} ({len(payloads)} 条)")
+        return len(payloads)
+
+    def load(self) -> "SharedVectorIndex":
+        """以只读 mmap 方式加载 (worker 调用)"""
+        d = self.directory
+        meta = json.loads((d / META_FILE).read_text(encoding="utf-8"))
+        self.vectors = np.load(d / VECTORS_FILE, mmap_mode="r")
+        self._payloads = _map_bytes(d / PAYLOADS_FILE)
+        self._payload_offsets = np.load(d / PAYLOAD_OFFSETS_FILE, mmap_mode="r")
+        self._names = _map_bytes(d / NAMES_FILE)
+        self._name_offsets = np.load(d / NAME_OFFSETS_FILE, mmap_mode="r")
+        self._named = int(meta.get("named", 0))
+        logger.info(f"📎 已映射共享索引: {self.directory} ({len(self)} 条)")
+        return self
+
+    def payload(self, i: int) -> Dict[str, Any]:
+        """第 i 行的 metadata (按需解码)"""
+        start, end = int(self._payload_offsets[i]), int(self._payload_offsets[i + 1])
+        return json.loads(self._payloads[start:end].tobytes().decode("utf-8"))
+
+    def iter_payloads(self) -> Iterator[Dict[str, Any]]:
+        """顺序解码全部 metadata (构建词法索引用，不在内存中保留)"""
+        for i in range(len(self)):
+            yield self.payload(i)
+
+    def _name(self, i: int) -> str:
+        start, end = int(self._name_offsets[i]), int(self._name_offsets[i + 1])
+        return self._names[start:end].tobytes().decode("utf-8")
+
+    def search(self, vector: List[float], k: int) -> List[Tuple[Dict, float]]:
+        """余弦相似度 Top-K，返回 (metadata, score) 列表 (与 Qdrant COSINE 得分一致)"""
+        if self.vectors is None or not len(self.vectors):
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        scores = self.vectors @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.payload(int(i)), float(scores[i])) for i in top]
+
+    def lookup(self, name: str) -> Optional[Dict]:
+        """按实体名精确查找 metadata (在已排序的名称上二分查找)"""
+        lo, hi = 0, self._named
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._name(mid) < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._named and self._name(lo) == name:
+            return self.payload(lo)
+        return None
+
+
+__all__ = ["SharedVectorIndex"]
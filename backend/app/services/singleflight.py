@@ -0,0 +1,93 @@
+# app/services/singleflight.py
+import asyncio
+import re
+import unicodedata
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+from app.core.metrics import metrics
+
+
+def normalize_key(text: str) -> str:
+    """归一化文本键：全角转半角 (NFKC)、去首尾空白、合并空白、小写"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().lower()
+
+
+class _Call:
+    """一次进行中的共享调用"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    相同键的并发调用合并为一次 (single-flight)
+
+    - 第一个调用者 (leader) 创建共享任务，后续调用者直接等待同一个任务
+    - 异常会扇出给所有等待者
+    - 某个等待者被取消只会让它自己离开；最后一个等待者离开时共享任务才会被取消
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        singleflight_registry[name] = self
+
+    @property
+    def inflight(self) -> int:
+        return len(self._calls)
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None or call.task.done():
+            call = _Call(asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda t, k=key, c=call: self._on_done(k, c, t))
+            metrics.inc("singleflight_calls_total", group=self.name, role="leader")
+        else:
+            metrics.inc("singleflight_calls_total", group=self.name, role="shared")
+
+        call.waiters += 1
+        try:
+            # shield: 单个等待者被取消时不会连带取消共享任务
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                self._forget(key, call)
+
+    def _on_done(self, key: Hashable, call: _Call, task: asyncio.Task):
+        # 所有等待者都已离开时异常无人读取，这里读取一次避免 "never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+        self._forget(key, call)
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    def summary(self) -> Dict[str, Any]:
+        leaders = metrics.get("singleflight_calls_total", group=self.name, role="leader")
+        shared = metrics.get("singleflight_calls_total", group=self.name, role="shared")
+        total = leaders + shared
+        return {
+            "group": self.name,
+            "inflight": self.inflight,
+            "calls": total,
+            "executions": leaders,
+            "coalesced": shared,
+            "coalescing_ratio": round(shared / total, 4) if total else 0.0,
+        }
+
+
+# 所有 single-flight 分组 (name -> group)，供 monitor 查看
+singleflight_registry: Dict[str, SingleFlight] = {}
+
+
+def singleflight_summary() -> List[Dict[str, Any]]:
+    return [group.summary() for group in singleflight_registry.values()]
+
+
+__all__ = ["SingleFlight", "normalize_key", "singleflight_registry", "singleflight_summary"]
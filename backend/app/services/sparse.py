@@ -0,0 +1,139 @@
+# app/services/sparse.py
+import math
+import re
+import unicodedata
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from qdrant_client import models
+
+from app.core.config import settings
+from app.core.logger import logger
+from app.services.lexical_index import normalize_name
+
+# 集合中稀疏向量的名称 (稠密向量保持默认的无名向量，兼容 QdrantVectorStore)
+SPARSE_VECTOR_NAME = "bm25"
+
+# 连续的 CJK 字符 / 连续的字母数字
+_CJK_RUN = re.compile(r"[㐀-䶿一-鿿豈-﫿]+")
+_WORD_RUN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    面向中文的轻量分词 (不依赖词典)
+    - CJK 连续段：单字 + 相邻双字 (中文名称切分不稳定，n-gram 对切分错误不敏感)
+    - 字母数字段：整词；字母与数字混排的型号 (如 H100、FSD12) 额外拆出字母部分与数字部分
+    - 整个名称归一化后的整体也作为一个 token，精确名称 / 型号命中时得分最高
+    """
+    raw = unicodedata.normalize("NFKC", text).casefold()
+    tokens: List[str] = []
+    for run in _CJK_RUN.findall(raw):
+        tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    for word in _WORD_RUN.findall(raw):
+        tokens.append(word)
+        parts = re.findall(r"[a-z]+|[0-9]+", word)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    whole = normalize_name(text)
+    if whole:
+        tokens.append(f"={whole}")
+    return tokens
+
+
+def _token_id(token: str) -> int:
+    # 稳定哈希 (进程无关)，32 位空间冲突率可忽略
+    return zlib.crc32(token.encode("utf-8"))
+
+
+class Bm25Encoder:
+    """
+    本地计算 BM25 的词频部分，IDF 由 Qdrant 在服务端按集合统计 (SparseVectorParams(modifier=IDF))，
+    新增 / 删除文档时无需重算全部向量
+    - 文档: tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+    - 查询: 每个不同 token 权重 1 (服务端乘以 IDF)
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, avg_len: float = 8.0):
+        self.k1 = k1
+        self.b = b
+        self.avg_len = avg_len
+
+    @staticmethod
+    def _merge(weights: Dict[int, float]) -> models.SparseVector:
+        indices = sorted(weights)
+        return models.SparseVector(indices=indices, values=[weights[i] for i in indices])
+
+    def encode_document(self, text: str) -> models.SparseVector:
+        tokens = tokenize(text)
+        counts = Counter(tokens)
+        norm = self.k1 * (1 - self.b + self.b * len(tokens) / self.avg_len)
+        weights: Dict[int, float] = {}
+        for token, tf in counts.items():
+            token_id = _token_id(token)
+            weights[token_id] = weights.get(token_id, 0.0) + tf * (self.k1 + 1) / (tf + norm)
+        return self._merge(weights)
+
+    def encode_query(self, text: str) -> models.SparseVector:
+        return self._merge({_token_id(token): 1.0 for token in set(tokenize(text))})
+
+
+def sparse_vectors_config() -> Dict[str, models.SparseVectorParams]:
+    """建集合时附带的稀疏向量配置"""
+    return {SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)}
+
+
+def has_sparse_vectors(client, collection_name: str) -> bool:
+    """集合是否已配置稀疏向量"""
+    try:
+        sparse = client.get_collection(collection_name).config.params.sparse_vectors or {}
+        return SPARSE_VECTOR_NAME in sparse
+    except Exception as e:
+        logger.warning(f"读取集合稀疏向量配置失败: {e}")
+        return False
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def hybrid_query(client, collection_name: str, dense: List[float], sparse: models.SparseVector,
+                 limit: int, prefetch_limit: Optional[int] = None) -> List[Tuple[Dict, float]]:
+    """
+    稠密 + 稀疏两路召回在 Qdrant 服务端用 RRF 融合，一次调用返回 (metadata, score) 列表
+    prefetch_limit: 每一路的候选数 (候选预算)
+    RRF 分数只反映名次，不能与其他匹配层的得分比较；这里取回融合结果的稠密向量，
+    按 RRF 顺序返回、得分换成与查询向量的余弦相似度 (与纯稠密检索的得分含义一致)
+    """
+    prefetch_limit = prefetch_limit or max(limit, settings.SPARSE_PREFETCH_LIMIT)
+    response = client.query_points(
+        collection_name=collection_name,
+        prefetch=[
+            models.Prefetch(query=dense, limit=prefetch_limit),
+            models.Prefetch(query=sparse, using=SPARSE_VECTOR_NAME, limit=prefetch_limit),
+        ],
+        query=models.FusionQuery(fusion=models.Fusion.RRF),
+        limit=limit,
+        with_payload=True,
+        with_vectors=True,
+    )
+    results = []
+    for p in response.points:
+        vector = p.vector.get("") if isinstance(p.vector, dict) else p.vector
+        score = _cosine(dense, vector) if vector else 0.0
+        # QdrantVectorStore 把 metadata 存在 payload["metadata"] 下
+        results.append(((p.payload or {}).get("metadata") or {}, score))
+    return results
+
+
+# --- 单例导出 ---
+bm25_encoder = Bm25Encoder(settings.SPARSE_BM25_K1, settings.SPARSE_BM25_B, settings.SPARSE_AVG_DOC_LEN)
+
+__all__ = [
+    "SPARSE_VECTOR_NAME", "Bm25Encoder", "bm25_encoder", "tokenize",
+    "sparse_vectors_config", "has_sparse_vectors", "hybrid_query",
+]
@@ -0,0 +1,3 @@
+"""
+性能基准脚本 (手动运行，不属于单元测试)
+"""
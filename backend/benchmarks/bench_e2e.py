@@ -0,0 +1,376 @@
+"""
+离线端到端基准：用本地替身代替全部外部服务，测量真实代码路径的性能
+
+- 模拟 LLM: OpenAI 兼容的本地 HTTP 服务 (延迟可配置，见 benchmarks/fakes/llm_server.py)
+- Embedding: 哈希确定性向量 (HashEmbeddings)
+- Qdrant: 真实嵌入式库 (临时目录，预先灌入固定数据集)
+- Neo4j: 内存图存储 (FakeGraphStore)
+
+依次运行:
+  search  直接调用 HybridSearchService.search (并发 1)
+  graph   直接调用 LangGraph app.ainvoke (并发 1)
+  http    经 httpx.ASGITransport 调用 FastAPI /api/v1/chat，按 --concurrency 中的各并发度
+输出各阶段 (span) 延迟分位数、各并发度吞吐、内存占用；
+结果按 git commit 保存到 benchmarks/results/，可与基线或上一次结果对比，回归时退出码为 1
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_e2e
+    python -m benchmarks.bench_e2e --latency-scale 0          # 去掉模拟延迟，只测应用自身开销
+    python -m benchmarks.bench_e2e --compare auto             # 与上一次 (其他 commit) 的结果对比
+    python -m benchmarks.bench_e2e --compare results/abc.json --threshold 0.15
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from benchmarks.fakes.dataset import BenchDataset
+from benchmarks.fakes.environment import configure_environment, install_fakes
+from benchmarks.fakes.llm_server import MockLLMServer
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+# --- 统计 ---
+def _percentile(sorted_values: List[float], q: float) -> float:
+    """最近秩分位数 (sorted_values 已排序)"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _stats(values_ms: List[float]) -> Dict[str, float]:
+    values = sorted(values_ms)
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+        "p50": round(_percentile(values, 0.50), 2),
+        "p95": round(_percentile(values, 0.95), 2),
+        "p99": round(_percentile(values, 0.99), 2),
+    }
+
+
+def _rss_mb() -> float:
+    """当前常驻内存 (MB)，Linux 读 /proc，其他平台退回峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位是字节，Linux 是 KB
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 1024
+
+
+def _git_revision() -> Tuple[str, bool]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = bool(subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], cwd=BACKEND_DIR,
+            capture_output=True, text=True,
+        ).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+# --- 执行 ---
+async def _traced(name: str, func: Callable[[], Awaitable[Any]], **attributes):
+    """在一条独立 trace 中执行 func，返回 (trace, 结果或异常)"""
+    from app.core.tracing import tracer
+
+    root = tracer.start_trace(name, **attributes)
+
+    async def run():
+        tracer.activate(root)
+        return await func()
+
+    status, outcome = "error", None
+    try:
+        outcome = await asyncio.create_task(run())
+        status = "ok"
+    except Exception as e:
+        outcome = e
+    finally:
+        tracer.finish(root, status)
+    return (root.trace if root else None), outcome
+
+
+def _collect_spans(traces, into: Dict[str, List[float]]):
+    """按 span 名汇总耗时 (同一 trace 内同名 span 逐个计入)"""
+    for trace in traces:
+        if trace is None:
+            continue
+        for span in trace.spans:
+            into.setdefault(span.name, []).append(span.duration_ms)
+
+
+async def _run_sequential(name: str, queries: List[str], make_call) -> Tuple[Dict[str, float], list, int]:
+    latencies, traces, errors = [], [], 0
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        trace, outcome = await _traced(name, make_call(i, query))
+        latencies.append((time.perf_counter() - start) * 1000)
+        traces.append(trace)
+        if isinstance(outcome, Exception):
+            errors += 1
+    return _stats(latencies), traces, errors
+
+
+async def _run_http_level(client, queries: List[str], concurrency: int, tag: str) -> Dict[str, Any]:
+    """固定并发度下发完 queries，统计吞吐与延迟"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    pending = iter(enumerate(queries))
+
+    async def worker():
+        for i, query in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/chat", json={
+                    "query": query, "thread_id": f"bench-{tag}-{i}",
+                })
+                if response.status_code != 200:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+            except Exception as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - wall_start
+    return {
+        "concurrency": concurrency,
+        "requests": len(queries),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "errors": errors,
+        **_stats(latencies),
+    }
+
+
+async def run_suite(args, server: MockLLMServer, dataset: BenchDataset) -> Dict[str, Any]:
+    from langchain_core.messages import HumanMessage
+
+    from app.core.deadline import Deadline
+    from app.core.graph import app as agent_app
+    from app.core.startup import run_startup, startup_state
+    import app.services.hybrid_search as search_service
+
+    results: Dict[str, Any] = {"memory": {"rss_mb_start": round(_rss_mb(), 1)}}
+
+    graph_store = install_fakes(
+        dataset, args.dimensions, scale=args.latency_scale,
+        embed_latency_ms=args.embed_latency_ms, graph_latency_ms=args.graph_latency_ms,
+    )
+    start = time.perf_counter()
+    await run_startup()
+    results["startup"] = {"ms": round((time.perf_counter() - start) * 1000, 1), "status": startup_state.status}
+    if not startup_state.ready or search_service.hybrid_search_service is None:
+        raise RuntimeError(f"启动失败: {startup_state.summary()}")
+    service = search_service.hybrid_search_service
+
+    queries = dataset.queries
+    cursor = 0
+
+    def take(n: int) -> List[str]:
+        # 各阶段使用互不重叠的查询，避免跨阶段复用结果
+        nonlocal cursor
+        chunk = [queries[(cursor + i) % len(queries)] for i in range(n)]
+        cursor += n
+        return chunk
+
+    spans: Dict[str, List[float]] = {}
+
+    # 1. 检索服务
+    stats, traces, errors = await _run_sequential(
+        "bench.search", take(args.requests),
+        lambda i, q: (lambda: service.search(q)),
+    )
+    results["search"] = {**stats, "errors": errors}
+    _collect_spans(traces, spans)
+    print(f"🔎 search  p50={stats['p50']}ms p95={stats['p95']}ms")
+
+    # 2. LangGraph 整图
+    def graph_call(i: int, q: str):
+        config = {"configurable": {"thread_id": f"bench-graph-{i}", "deadline": Deadline()}}
+        return lambda: agent_app.ainvoke({"query": q, "messages": [HumanMessage(content=q)]}, config=config)
+
+    stats, traces, errors = await _run_sequential("bench.graph", take(args.requests), graph_call)
+    results["graph"] = {**stats, "errors": errors}
+    _collect_spans(traces, spans)
+    print(f"🕸️ graph   p50={stats['p50']}ms p95={stats['p95']}ms")
+
+    results["stages"] = {name: _stats(values) for name, values in sorted(spans.items())}
+
+    # 3. HTTP 接口 (各并发度)
+    import httpx
+    from app.main import app as fastapi_app
+
+    results["http"] = {}
+    transport = httpx.ASGITransport(app=fastapi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        for level in args.concurrency:
+            count = max(args.requests, level * args.requests_per_worker)
+            level_stats = await _run_http_level(client, take(count), level, f"c{level}")
+            results["http"][f"c{level}"] = level_stats
+            print(f"🌐 http c={level:<3} {level_stats['throughput_rps']} req/s "
+                  f"p50={level_stats['p50']}ms p95={level_stats['p95']}ms errors={level_stats['errors']}")
+
+    results["memory"].update({
+        "rss_mb_end": round(_rss_mb(), 1),
+        "rss_mb_peak": round(_peak_rss_mb(), 1),
+    })
+    results["backend_calls"] = {**server.calls, "graph_queries": graph_store.queries}
+    return results
+
+
+# --- 结果保存与对比 ---
+def _flatten(results: Dict[str, Any]) -> Dict[str, float]:
+    """抽取用于对比的指标: 名称 -> 数值"""
+    flat: Dict[str, float] = {}
+    for section in ("search", "graph"):
+        for q in ("p50", "p95", "p99"):
+            flat[f"{section}.{q}"] = results[section][q]
+    for name, stats in results.get("stages", {}).items():
+        for q in ("p50", "p95"):
+            flat[f"stage.{name}.{q}"] = stats[q]
+    for level, stats in results.get("http", {}).items():
+        flat[f"http.{level}.throughput_rps"] = stats["throughput_rps"]
+        flat[f"http.{level}.p95"] = stats["p95"]
+    flat["memory.rss_mb_peak"] = results["memory"]["rss_mb_peak"]
+    return flat
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            min_delta_ms: float) -> List[str]:
+    """
+    逐项对比，返回回归项列表
+    吞吐下降或延迟 / 内存上升超过 threshold (相对值) 视为回归；
+    延迟的绝对变化小于 min_delta_ms 时视为噪声
+    """
+    now, before = _flatten(current), _flatten(baseline)
+    regressions = []
+    print(f"\n📊 对比基线 {baseline['meta']['commit']} ({baseline['meta']['timestamp']})")
+    print(f"   {'指标':<44}{'基线':>12}{'当前':>12}{'变化':>10}")
+    for key in sorted(now.keys() & before.keys()):
+        old, new = before[key], now[key]
+        change = (new - old) / old if old else 0.0
+        higher_is_better = key.endswith("throughput_rps")
+        worse = -change if higher_is_better else change
+        noisy = not higher_is_better and not key.startswith("memory.") and abs(new - old) < min_delta_ms
+        flag = ""
+        if worse > threshold and not noisy:
+            flag = " ❌"
+            regressions.append(f"{key}: {old} -> {new} ({change:+.1%})")
+        elif -worse > threshold and not noisy:
+            flag = " ✅"
+        print(f"   {key:<44}{old:>12}{new:>12}{change:>+10.1%}{flag}")
+    return regressions
+
+
+def _latest_result(exclude_commit: str) -> Optional[Path]:
+    """results/ 中最近一次来自其他 commit 的结果"""
+    candidates = [
+        p for p in RESULTS_DIR.glob("*.json")
+        if not p.stem.startswith(exclude_commit)
+    ]
+    return max(candidates, key=lambda p: p.stat().st_mtime, default=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线端到端基准")
+    parser.add_argument("--requests", type=int, default=30, help="search / graph 阶段的请求数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="HTTP 阶段的并发度")
+    parser.add_argument("--requests-per-worker", type=int, default=4, help="HTTP 阶段每个并发槽位的请求数")
+    parser.add_argument("--entities", type=int, default=2000, help="向量库中的实体数")
+    parser.add_argument("--dimensions", type=int, default=256, help="向量维度")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="模拟延迟的整体缩放 (0 表示无延迟)")
+    parser.add_argument("--jitter", type=float, default=0.2, help="模拟 LLM 延迟的抖动幅度")
+    parser.add_argument("--embed-latency-ms", type=float, default=40.0)
+    parser.add_argument("--graph-latency-ms", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="额外的应用配置 (环境变量)，可重复，如 --set LIMITER_ENABLED=false")
+    parser.add_argument("--compare", help="基线结果文件，或 auto 表示上一次其他 commit 的结果")
+    parser.add_argument("--threshold", type=float, default=0.10, help="回归判定阈值 (相对变化)")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="小于该绝对变化的延迟差异视为噪声")
+    parser.add_argument("--no-save", action="store_true", help="不保存本次结果")
+    args = parser.parse_args()
+
+    overrides = dict(item.split("=", 1) for item in args.set)
+    dataset = BenchDataset(
+        entity_count=args.entities,
+        query_count=2 * args.requests + sum(max(args.requests, c * args.requests_per_worker) for c in args.concurrency),
+        seed=args.seed,
+    )
+    server = MockLLMServer(
+        dataset.core_names, dimensions=args.dimensions, scale=args.latency_scale, jitter=args.jitter,
+    ).start()
+
+    with tempfile.TemporaryDirectory(prefix="graphrag-bench-") as workdir:
+        configure_environment(server.base_url, args.dimensions, Path(workdir), overrides)
+        try:
+            results = asyncio.run(run_suite(args, server, dataset))
+        finally:
+            server.stop()
+            from app.services.qdrant_service import qdrant_manager
+            qdrant_manager.close()
+
+    commit, dirty = _git_revision()
+    results["meta"] = {
+        "commit": commit,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("compare", "no_save")},
+    }
+
+    baseline_path = None
+    if args.compare == "auto":
+        baseline_path = _latest_result(commit)
+        if baseline_path is None:
+            print("ℹ️ 没有可对比的历史结果")
+    elif args.compare:
+        baseline_path = Path(args.compare)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        out = RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+        out.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"💾 结果已保存: {out}")
+
+    if baseline_path is not None:
+        baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+        if baseline.get("meta", {}).get("args") != results["meta"]["args"]:
+            print("⚠️ 基线与本次的运行参数不同，对比结果仅供参考")
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n❌ 发现 {len(regressions)} 项性能回归:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("\n✅ 没有超过阈值的回归")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+日志开销基准：对比旧的同步日志配置与新的异步管道 (文本 / JSON，DEBUG 限流) 下，
+一次请求路径上的日志开销 (调用线程的墙钟时间与 CPU 时间)
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_logging --requests 3000
+
+每个 "请求" 模拟对话路径上的日志：5 条 INFO + 3 条 DEBUG (含实体列表 / 回答前缀)
+日志写入临时目录，不影响 logs/app.log
+
+参考结果 (loguru 0.7，3000 次请求，调用线程 CPU µs/请求):
+    legacy_sync (旧配置: DEBUG 控制台 + 同步文件)   ~360
+    loguru_enqueue (loguru 自带 enqueue=True)       ~1150  <- 需要 pickle 整条记录，因此未采用
+    async_text (新管道，DEBUG 限流)                 ~220
+    async_text_info (LOG_LEVEL=INFO)                ~175
+    async_json (LOG_JSON=true)                      ~235
+主要开销在 loguru 构造记录与格式化；新管道把写盘 / 轮转 / 压缩移出请求路径，
+并通过 DEBUG 限流与 INFO 级别避免了大部分格式化
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from app.core.logger import (
+    _AsyncSink, _DebugRateLimiter, _RotatingFile, _TEXT_FORMAT, _json_format, _add_correlation_id, correlation_id,
+)
+
+ENTITIES = ["马斯克", "SpaceX", "特斯拉", "星舰", "上海超级工厂"]
+ANSWER = "SpaceX 是马斯克于 2002 年创立的太空探索技术公司，主要产品包括猎鹰系列火箭和星舰。" * 4
+LEGACY_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | "
+                 "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>")
+
+
+def _simulate_request(i: int, legacy: bool):
+    correlation_id.set(f"req-{i}")
+    logger.info(f"收到请求: 马斯克的太空公司是什么 (ID: thread-{i})")
+    logger.info("🔍 [RETRIEVAL] 开始检索: 马斯克的太空公司是什么")
+    if legacy:
+        # 旧代码在 INFO 级别用 f-string 记录实体列表与回答前缀
+        logger.info(f"提取实体: {ENTITIES}")
+        logger.info(f"   - 找到实体: {ENTITIES}")
+    else:
+        logger.debug("提取实体: {}", ENTITIES)
+        logger.debug("   - 找到实体: {}", ENTITIES)
+    logger.info("🧠 [GENERATION] 正在生成回答...")
+    if legacy:
+        logger.info(f"初步生成回答: {ANSWER[:50]}...")
+    else:
+        logger.debug("初步生成回答: {}...", ANSWER[:50])
+    logger.info("⚖️ [VALIDATION] 正在校验...")
+    logger.info("   - 结果: PASS | 理由: 回答与上下文一致")
+
+
+def _configure(log_dir: Path, name: str):
+    logger.remove()
+    console = open(log_dir / f"{name}.console", "w", encoding="utf-8")
+    if name in ("legacy_sync", "loguru_enqueue"):
+        enqueue = name == "loguru_enqueue"
+        logger.configure(patcher=None)
+        logger.add(console, level="DEBUG", colorize=True, format=LEGACY_FORMAT, enqueue=enqueue)
+        logger.add(log_dir / f"{name}.log", level="INFO", rotation="10 MB", encoding="utf-8", enqueue=enqueue)
+        return []
+
+    logger.configure(patcher=_add_correlation_id)
+    fmt = _json_format if name.endswith("json") else _TEXT_FORMAT
+    level = "INFO" if name.endswith("info") else "DEBUG"
+    limiter = _DebugRateLimiter(10, 1.0)
+    sinks = [_AsyncSink(console, f"{name}-console"),
+             _AsyncSink(_RotatingFile(log_dir / f"{name}.log", 10 * 1024 * 1024, 10), f"{name}-file")]
+    logger.add(sinks[0], level=level, format=fmt, filter=limiter, colorize=False)
+    logger.add(sinks[1], level="INFO", format=fmt, filter=limiter, colorize=False)
+    return sinks
+
+
+def bench(requests: int):
+    scenarios = ["legacy_sync", "loguru_enqueue", "async_text", "async_text_info", "async_json"]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name in scenarios:
+            sinks = _configure(Path(tmp), name)
+            legacy = name in ("legacy_sync", "loguru_enqueue")
+            for i in range(50):
+                _simulate_request(i, legacy)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            for i in range(requests):
+                _simulate_request(i, legacy)
+            results[name] = (
+                (time.perf_counter() - wall) / requests * 1e6,
+                (time.thread_time() - cpu) / requests * 1e6,
+            )
+            logger.complete()
+            for sink in sinks:
+                sink.flush()
+            logger.remove()
+
+    baseline = results["legacy_sync"][1]
+    print(f"📝 每请求日志开销 ({requests} 次请求):")
+    for name, (wall, cpu) in results.items():
+        print(f"   {name:<16} 墙钟 {wall:7.1f} µs | 调用线程 CPU {cpu:7.1f} µs ({cpu / baseline * 100:5.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志开销基准")
+    parser.add_argument("--requests", type=int, default=3000)
+    bench(parser.parse_args().requests)
+
+
+if __name__ == "__main__":
+    main()
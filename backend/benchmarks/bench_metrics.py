@@ -0,0 +1,48 @@
+"""
+指标埋点开销基准：测量 observe / inc / timer 的单次耗时，
+并按一次对话的埋点次数估算相对请求耗时的开销占比
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_metrics --request-ms 2000
+"""
+import argparse
+import timeit
+
+from app.core.metrics import MetricsRegistry
+
+# 一次对话大致的埋点次数 (节点 3 + 后端调用约 10 + 限流 / 合并 / 计数若干)
+CALLS_PER_REQUEST = 60
+
+
+def main():
+    parser = argparse.ArgumentParser(description="指标埋点开销基准")
+    parser.add_argument("--number", type=int, default=200000, help="每项重复次数")
+    parser.add_argument("--request-ms", type=float, default=2000, help="用于估算占比的典型请求耗时 (毫秒)")
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+
+    def _timer():
+        with registry.timer("bench_seconds", node="retrieve"):
+            pass
+
+    cases = {
+        "inc": lambda: registry.inc("bench_total", backend="llm"),
+        "observe": lambda: registry.observe("bench_seconds", 0.3, node="retrieve"),
+        "timer": _timer,
+    }
+    worst = 0.0
+    for name, func in cases.items():
+        per_call_us = timeit.timeit(func, number=args.number) / args.number * 1e6
+        worst = max(worst, per_call_us)
+        print(f"   {name:<10} {per_call_us:6.2f} µs/次")
+
+    render_ms = timeit.timeit(registry.render_prometheus, number=100) / 100 * 1000
+    print(f"   {'render':<10} {render_ms:6.2f} ms/次 (抓取时)")
+
+    overhead = worst * CALLS_PER_REQUEST / (args.request_ms * 1000) * 100
+    print(f"📊 每请求约 {CALLS_PER_REQUEST} 次埋点，占 {args.request_ms:.0f}ms 请求的 {overhead:.4f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+实体匹配召回率基准：纯稠密检索 vs 稠密 + BM25 稀疏 (Qdrant 服务端 RRF 融合)
+
+数据集 = 固定数据集的实体 + 两类难例:
+  - 型号 / 编码 (如 "KX-4821")，提及时去掉连字符、改大小写或加空格
+  - 生僻人名 / 地名 (随机汉字组合)，提及时附带称谓或后缀
+每个提及都有唯一正确的实体；在相同候选预算下比较 recall@k 与单次查询耗时
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_sparse_recall --embedder factory   # 推荐：.env 中配置的真实 Embedding (ENTITY_EMBD_BACKEND)
+    python -m benchmarks.bench_sparse_recall                      # 离线：整词哈希 Embedding (word)
+    python -m benchmarks.bench_sparse_recall --budget 10 --hard 500
+
+Embedding 的选择决定结论是否有意义：
+  - factory: 真实模型，结论以它为准
+  - word:    整词哈希，对字面重叠不敏感，离线模拟 "稠密模型认不出型号 / 生僻名变体" 的下限情形
+  - hash:    字符 1~2-gram 哈希，与 BM25 的分词高度重合，两种方式都会接近满分，只用于冒烟测试
+"""
+import argparse
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from benchmarks.fakes.dataset import BenchDataset
+from benchmarks.fakes.embedder import hash_embed, word_embed
+from benchmarks.fakes.environment import configure_environment
+
+COLLECTION = "sparse-recall-bench"
+# 生僻名用字 (避开数据集里已有的常见字)
+RARE_CHARS = "鑫淼焱垚犇骉麤靐燚龘昇旻晞曦翀翯翙璟琮琰瑀璠瓒蔚菡蕤萱茗楠樾桦槿栎"
+LETTERS = "ABCDEFGHJKLMNPQRSTUVWXYZ"
+
+
+def build_cases(dataset: BenchDataset, hard: int, seed: int) -> Tuple[List[Dict[str, str]], List[Tuple[str, str]]]:
+    """返回 (全部实体, [(提及, 正确实体名)])"""
+    rng = random.Random(seed)
+    entities = list(dataset.entities)
+    cases: List[Tuple[str, str]] = [(name, name) for name in dataset.core_names]
+    seen = {e["name"] for e in entities}
+
+    while len(cases) < len(dataset.core_names) + hard:
+        if rng.random() < 0.5:
+            code = f"{''.join(rng.sample(LETTERS, 2))}-{rng.randint(100, 9999)}"
+            if code in seen:
+                continue
+            mention = rng.choice([code.replace("-", ""), code.lower(), code.replace("-", " "), f"{code}型号"])
+            entities.append({"name": code, "type": "product"})
+        else:
+            name = "".join(rng.sample(RARE_CHARS, rng.choice([2, 3])))
+            if name in seen:
+                continue
+            mention = rng.choice([name, f"{name}先生", f"{name}博士", f"{name}公司"])
+            entities.append({"name": name, "type": rng.choice(["person", "company"])})
+        seen.add(entities[-1]["name"])
+        cases.append((mention, entities[-1]["name"]))
+    return entities, cases
+
+
+def seed_collection(client, entities: List[Dict[str, str]], embed: Callable[[List[str]], List[List[float]]],
+                    dimensions: int, batch_size: int = 256):
+    from qdrant_client import models
+
+    from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder, sparse_vectors_config
+
+    client.create_collection(
+        collection_name=COLLECTION,
+        vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE),
+        sparse_vectors_config=sparse_vectors_config(),
+    )
+    for start in range(0, len(entities), batch_size):
+        batch = entities[start:start + batch_size]
+        vectors = embed([e["name"] for e in batch])
+        client.upsert(collection_name=COLLECTION, points=[
+            models.PointStruct(
+                id=start + i,
+                vector={"": vector, SPARSE_VECTOR_NAME: bm25_encoder.encode_document(e["name"])},
+                payload={"page_content": e["name"], "metadata": dict(e)},
+            )
+            for i, (e, vector) in enumerate(zip(batch, vectors))
+        ])
+
+
+def evaluate(client, cases: List[Tuple[str, str]], embed, ks: List[int], budget: int) -> Dict[str, Dict[str, float]]:
+    """两种检索方式在相同候选预算下的 recall@k 与平均耗时"""
+    from app.services.sparse import bm25_encoder, hybrid_query
+
+    max_k = max(ks)
+    vectors = embed([mention for mention, _ in cases])
+
+    def dense(vector, mention):
+        # 候选预算全部给稠密一路
+        response = client.query_points(collection_name=COLLECTION, query=vector, limit=budget, with_payload=True)
+        return [(p.payload or {}).get("metadata", {}).get("name") for p in response.points][:max_k]
+
+    def hybrid(vector, mention):
+        # 候选预算在稠密 / 稀疏两路之间平分
+        rows = hybrid_query(client, COLLECTION, vector, bm25_encoder.encode_query(mention),
+                            limit=max_k, prefetch_limit=max(1, budget // 2))
+        return [meta.get("name") for meta, _ in rows]
+
+    report = {}
+    for label, search in (("dense", dense), ("hybrid", hybrid)):
+        hits = {k: 0 for k in ks}
+        start = time.perf_counter()
+        for (mention, expected), vector in zip(cases, vectors):
+            names = search(vector, mention)
+            for k in ks:
+                hits[k] += expected in names[:k]
+        elapsed = time.perf_counter() - start
+        report[label] = {f"recall@{k}": round(hits[k] / len(cases), 4) for k in ks}
+        report[label]["avg_ms"] = round(elapsed / len(cases) * 1000, 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="稠密 vs 稠密 + BM25 混合检索的实体召回率")
+    parser.add_argument("--entities", type=int, default=2000, help="固定数据集的实体数 (含填充实体)")
+    parser.add_argument("--hard", type=int, default=300, help="难例 (型号 / 生僻名) 数量")
+    parser.add_argument("--budget", type=int, default=20, help="每次查询的候选预算")
+    parser.add_argument("--ks", default="1,3,5", help="计算 recall@k 的 k 值")
+    parser.add_argument("--dimensions", type=int, default=256, help="哈希 Embedding 维度")
+    parser.add_argument("--embedder", choices=["word", "hash", "factory"], default="word",
+                        help="word: 离线整词哈希 (对字面重叠不敏感)；hash: 字符 n-gram 哈希 (冒烟测试)；"
+                             "factory: .env 中配置的真实 Embedding")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", default=None, help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench-sparse-"))
+    if args.embedder in ("word", "hash"):
+        # 离线运行：只需要满足配置校验，不会访问任何外部服务
+        configure_environment("http://127.0.0.1:9/v1", args.dimensions, workdir)
+        dimensions = args.dimensions
+        embed_one = word_embed if args.embedder == "word" else hash_embed
+        embed = lambda texts: [embed_one(t, dimensions) for t in texts]
+    else:
+        from app.core.config import settings
+        from app.services.embedding_factory import embedding_factory
+
+        embeddings = embedding_factory.get_embedding(settings.ENTITY_EMBD_BACKEND)
+        dimensions = embedding_factory.dimensions(settings.ENTITY_EMBD_BACKEND)
+        embed = embeddings.embed_documents
+
+    from qdrant_client import QdrantClient
+
+    dataset = BenchDataset(entity_count=args.entities, query_count=1, seed=args.seed)
+    entities, cases = build_cases(dataset, args.hard, args.seed)
+    client = QdrantClient(path=str(workdir / "qdrant"))
+    try:
+        start = time.perf_counter()
+        seed_collection(client, entities, embed, dimensions)
+        print(f"📦 {len(entities)} 个实体，{len(cases)} 个提及，建库 {time.perf_counter() - start:.1f}s")
+        ks = [int(k) for k in args.ks.split(",")]
+        report = evaluate(client, cases, embed, ks, args.budget)
+    finally:
+        client.close()
+
+    print(f"🎯 候选预算 {args.budget} | Embedding: {args.embedder}")
+    for label, row in report.items():
+        cells = "  ".join(f"{key}={value}" for key, value in row.items())
+        print(f"   {label:<7} {cells}")
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "report": report}, ensure_ascii=False, indent=2),
+                                   encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+冷启动基准：测量核心模块的导入耗时与启动阶段 (run_startup) 耗时
+
+用法 (在 backend 目录下):
+    python -m benchmarks.bench_startup --runs 5
+
+每次测量都在全新的子进程中执行，避免模块缓存影响结果；输出各项的中位数
+启动耗时依赖 .env 中配置的 Neo4j / Qdrant / LLM 服务是否可用
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+IMPORT_TARGETS = [
+    "app.core.config",
+    "app.services.neo4j_service",
+    "app.services.hybrid_search",
+    "app.core.nodes.generation",
+    "app.core.nodes.validation",
+    "app.core.graph",
+    "app.main",
+]
+
+IMPORT_SNIPPET = """
+import importlib, json, time
+start = time.perf_counter()
+importlib.import_module({module!r})
+print(json.dumps({{"ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+STARTUP_SNIPPET = """
+import asyncio, json, time
+start = time.perf_counter()
+from app.core.startup import run_startup, startup_state
+imported = time.perf_counter()
+asyncio.run(run_startup())
+done = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1000,
+    "startup_ms": (done - imported) * 1000,
+    "status": startup_state.status,
+    "components": {k: v["duration_ms"] for k, v in startup_state.components.items()},
+}))
+"""
+
+
+def _run(snippet: str) -> dict:
+    """在独立子进程中执行代码片段，解析最后一行 JSON 输出"""
+    proc = subprocess.run(
+        [sys.executable, "-c", snippet],
+        cwd=BACKEND_DIR, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "子进程失败")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def bench_imports(runs: int):
+    print("📦 模块导入耗时 (中位数，含依赖):")
+    for module in IMPORT_TARGETS:
+        samples = [_run(IMPORT_SNIPPET.format(module=module))["ms"] for _ in range(runs)]
+        print(f"   {module:<32} {statistics.median(samples):8.1f} ms")
+
+
+def bench_startup(runs: int):
+    print("🚀 启动阶段耗时 (中位数):")
+    results = [_run(STARTUP_SNIPPET) for _ in range(runs)]
+    print(f"   {'import':<32} {statistics.median(r['import_ms'] for r in results):8.1f} ms")
+    print(f"   {'run_startup':<32} {statistics.median(r['startup_ms'] for r in results):8.1f} ms")
+    for name in results[0]["components"]:
+        value = statistics.median(r["components"].get(name, 0) for r in results)
+        print(f"     - {name:<30} {value:8.1f} ms")
+    print(f"   状态: {results[-1]['status']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准 (导入耗时 + 启动耗时)")
+    parser.add_argument("--runs", type=int, default=5, help="每项重复次数")
+    parser.add_argument("--skip-startup", action="store_true", help="只测导入耗时 (无外部服务时)")
+    args = parser.parse_args()
+
+    bench_imports(args.runs)
+    if not args.skip_startup:
+        bench_startup(args.runs)
+
+
+if __name__ == "__main__":
+    main()
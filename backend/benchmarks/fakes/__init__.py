@@ -0,0 +1,5 @@
+"""离线基准使用的本地替身：模拟 LLM 服务、哈希 Embedding、内存图存储与固定数据集"""
+from benchmarks.fakes.dataset import BenchDataset
+from benchmarks.fakes.embedder import HashEmbeddings, hash_embed
+
+__all__ = ["BenchDataset", "HashEmbeddings", "hash_embed"]
@@ -0,0 +1,121 @@
+"""
+离线基准的固定数据集：实体、关系与查询
+全部由固定种子生成，同一参数下每次运行完全一致
+"""
+import random
+from typing import Dict, List, Tuple
+
+# 手写的核心实体 (名称, 类型)，查询只围绕它们构造
+CORE_ENTITIES: List[Tuple[str, str]] = [
+    ("马斯克", "person"),
+    ("SpaceX", "company"),
+    ("特斯拉", "company"),
+    ("星舰", "product"),
+    ("猎鹰9号", "product"),
+    ("星链", "product"),
+    ("Model 3", "product"),
+    ("Model Y", "product"),
+    ("上海超级工厂", "location"),
+    ("柏林工厂", "location"),
+    ("德州", "location"),
+    ("Neuralink", "company"),
+    ("X", "company"),
+    ("xAI", "company"),
+    ("Grok", "product"),
+    ("OpenAI", "company"),
+    ("奥特曼", "person"),
+    ("ChatGPT", "product"),
+    ("英伟达", "company"),
+    ("黄仁勋", "person"),
+    ("H100", "product"),
+    ("台积电", "company"),
+    ("苹果", "company"),
+    ("库克", "person"),
+]
+
+CORE_RELATIONS: List[Tuple[str, str, str]] = [
+    ("马斯克", "FOUNDED", "SpaceX"),
+    ("马斯克", "CEO_OF", "特斯拉"),
+    ("马斯克", "FOUNDED", "Neuralink"),
+    ("马斯克", "OWNS", "X"),
+    ("马斯克", "FOUNDED", "xAI"),
+    ("马斯克", "CO_FOUNDED", "OpenAI"),
+    ("SpaceX", "DEVELOPS", "星舰"),
+    ("SpaceX", "OPERATES", "猎鹰9号"),
+    ("SpaceX", "OPERATES", "星链"),
+    ("星舰", "LAUNCHED_FROM", "德州"),
+    ("特斯拉", "PRODUCES", "Model 3"),
+    ("特斯拉", "PRODUCES", "Model Y"),
+    ("特斯拉", "OPERATES", "上海超级工厂"),
+    ("特斯拉", "OPERATES", "柏林工厂"),
+    ("上海超级工厂", "PRODUCES", "Model 3"),
+    ("上海超级工厂", "PRODUCES", "Model Y"),
+    ("xAI", "DEVELOPS", "Grok"),
+    ("X", "INTEGRATES", "Grok"),
+    ("奥特曼", "CEO_OF", "OpenAI"),
+    ("OpenAI", "DEVELOPS", "ChatGPT"),
+    ("黄仁勋", "CEO_OF", "英伟达"),
+    ("英伟达", "PRODUCES", "H100"),
+    ("台积电", "MANUFACTURES", "H100"),
+    ("OpenAI", "USES", "H100"),
+    ("xAI", "USES", "H100"),
+    ("库克", "CEO_OF", "苹果"),
+    ("苹果", "PARTNERS_WITH", "台积电"),
+]
+
+_TEMPLATES_ONE = [
+    "{a}是做什么的",
+    "介绍一下{a}",
+    "{a}最近有什么进展",
+    "{a}有哪些相关的公司和产品",
+]
+_TEMPLATES_TWO = [
+    "{a}和{b}的关系是什么",
+    "{a}与{b}之间有什么联系",
+    "{a}对{b}有什么影响",
+]
+_SYNTHETIC_TYPES = ["person", "company", "product", "location"]
+
+
+class BenchDataset:
+    """
+    entities: [{"name", "type"}]，前面是核心实体，后面是填充实体 (只用于撑大向量库)
+    relations: [(source, rel, target)]
+    queries: 按种子生成的查询列表 (互不相同，避免被 single-flight 合并)
+    """
+
+    def __init__(self, entity_count: int = 2000, query_count: int = 200, seed: int = 42):
+        rng = random.Random(seed)
+        self.entities: List[Dict[str, str]] = [{"name": n, "type": t} for n, t in CORE_ENTITIES]
+        filler = max(0, entity_count - len(CORE_ENTITIES))
+        for i in range(filler):
+            self.entities.append({"name": f"合成实体{i:05d}", "type": rng.choice(_SYNTHETIC_TYPES)})
+
+        self.relations: List[Tuple[str, str, str]] = list(CORE_RELATIONS)
+        names = [e["name"] for e in self.entities[len(CORE_ENTITIES):]]
+        for _ in range(filler * 2 if len(names) > 1 else 0):
+            a, b = rng.sample(names, 2)
+            self.relations.append((a, "RELATED_TO", b))
+
+        self.core_names = [n for n, _ in CORE_ENTITIES]
+        self.queries = self._build_queries(query_count, rng)
+
+    def _build_queries(self, count: int, rng: random.Random) -> List[str]:
+        queries, seen = [], set()
+        attempt = 0
+        while len(queries) < count:
+            attempt += 1
+            if rng.random() < 0.5:
+                text = rng.choice(_TEMPLATES_ONE).format(a=rng.choice(self.core_names))
+            else:
+                a, b = rng.sample(self.core_names, 2)
+                text = rng.choice(_TEMPLATES_TWO).format(a=a, b=b)
+            # 模板组合有限，超过后追加编号保证互不相同
+            if text in seen:
+                text = f"{text}（{attempt}）"
+            seen.add(text)
+            queries.append(text)
+        return queries
+
+
+__all__ = ["BenchDataset", "CORE_ENTITIES", "CORE_RELATIONS"]
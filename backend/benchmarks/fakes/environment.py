@@ -0,0 +1,120 @@
+"""
+把应用接到本地替身上
+
+用法 (顺序很重要):
+    configure_environment(...)   # 在导入任何 app 模块之前设置环境变量
+    install_fakes(...)           # 导入后、run_startup() 之前替换 Embedding / Neo4j 并灌入 Qdrant
+"""
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from benchmarks.fakes.dataset import BenchDataset
+from benchmarks.fakes.embedder import HashEmbeddings, hash_embed
+
+
+def configure_environment(llm_base_url: str, dimensions: int, workdir: Path,
+                          overrides: Optional[Dict[str, Any]] = None):
+    """
+    设置 app.core.config.settings 读取的环境变量 (必须在导入 app 之前调用)
+    overrides: 额外的配置项，如 {"LIMITER_ENABLED": False}
+    """
+    env = {
+        "LLM_BASE_URL": llm_base_url,
+        "LLM_API_KEY": "bench",
+        "EMBD_BASE_URL": llm_base_url,
+        "EMBD_API_KEY": "bench",
+        "EMBD_DIMENSIONS": dimensions,
+        "NEO4J_PASSWORD": "bench",
+        "QDRANT_URL": str(Path(workdir) / "qdrant"),
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE_LEVEL": "ERROR",
+        "TRACING_ENABLED": True,
+        "WARMUP_ENABLED": False,
+        "WORKERS": 1,
+        "SHARED_INDEX_READONLY": False,
+    }
+    env.update(overrides or {})
+    for key, value in env.items():
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        elif isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        os.environ[key] = str(value)
+
+
+def seed_qdrant(dataset: BenchDataset, dimensions: int, batch_size: int = 256) -> int:
+    """按 QdrantVectorStore 的 payload 结构把实体灌入嵌入式 Qdrant"""
+    from qdrant_client import models
+
+    from app.services.hybrid_search import entity_collection_name
+    from app.services.qdrant_service import qdrant_manager
+    from app.services.sparse import SPARSE_VECTOR_NAME, bm25_encoder, sparse_vectors_config
+
+    # 按 ENTITY_EMBD_BACKEND 取集合名 (--set ENTITY_EMBD_BACKEND=local 时写入本地向量空间的集合)
+    collection = entity_collection_name()
+    client = qdrant_manager.get_client()
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    client.create_collection(
+        collection_name=collection,
+        vectors_config=models.VectorParams(size=dimensions, distance=models.Distance.COSINE),
+        sparse_vectors_config=sparse_vectors_config(),
+    )
+    for start in range(0, len(dataset.entities), batch_size):
+        batch = dataset.entities[start:start + batch_size]
+        client.upsert(
+            collection_name=collection,
+            points=[
+                models.PointStruct(
+                    id=str(uuid.uuid5(uuid.NAMESPACE_URL, e["name"])),
+                    vector={"": hash_embed(e["name"], dimensions),
+                            SPARSE_VECTOR_NAME: bm25_encoder.encode_document(e["name"])},
+                    payload={"page_content": e["name"], "metadata": dict(e)},
+                )
+                for e in batch
+            ],
+        )
+    return len(dataset.entities)
+
+
+def install_fakes(dataset: BenchDataset, dimensions: int, scale: float = 1.0,
+                  embed_latency_ms: float = 40.0, graph_latency_ms: float = 15.0):
+    """
+    - Embedding: HashEmbeddings，仍包在 HedgedEmbeddings + embedding_governor 里
+      (不经 HTTP，避免 OpenAIEmbeddings 离线时无法加载 tiktoken 编码)
+    - Neo4j: FakeGraphStore (经 neo4j_governor)
+    - Qdrant: 真实嵌入式库，预先灌入 dataset 的实体
+    返回 FakeGraphStore 实例
+    """
+    from app.core.config import settings
+    from app.services import embedding_factory as embedding_module
+    from app.services.hedging import HedgedEmbeddings
+    import app.services.hybrid_search as hybrid_search
+    import app.services.neo4j_service as neo4j_svc
+
+    from benchmarks.fakes.graph_store import FakeGraphStore
+
+    # 本地 / 远程两个向量空间都用同一个哈希 Embedding 替身 (维度一致)
+    def get_embedding(backend: str = "remote"):
+        return HedgedEmbeddings(
+            HashEmbeddings(dimensions, latency_ms=embed_latency_ms * scale),
+            endpoint="embedding:hash",
+            hedge=settings.HEDGING_ENABLED,
+            governor=embedding_module.embedding_governor,
+        )
+
+    embedding_module.EmbeddingFactory.get_embedding = staticmethod(get_embedding)
+    embedding_module.EmbeddingFactory.dimensions = staticmethod(lambda backend="remote": dimensions)
+
+    graph = FakeGraphStore(dataset.relations, latency_ms=graph_latency_ms * scale)
+    neo4j_svc.neo4j_manager = graph
+    hybrid_search.neo4j_manager = graph
+
+    seed_qdrant(dataset, dimensions)
+    return graph
+
+
+__all__ = ["configure_environment", "install_fakes", "seed_qdrant"]
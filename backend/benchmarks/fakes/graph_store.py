@@ -0,0 +1,81 @@
+"""
+内存图存储：实现 Neo4jManager 在检索路径上用到的接口
+(verify / execute_query / aexecute_query / check_health / close / aclose)
+只理解检索用的 "按 $names 取一跳邻居" 查询 (可带 $per_name)，其他查询返回单行 {"ok": 1}
+"""
+import asyncio
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Sequence, Tuple
+
+from app.services.neo4j_service import neo4j_governor
+
+
+class FakeGraphStore:
+    """
+    latency_ms: 每次查询的固定延迟；per_row_ms: 每返回一行追加的延迟
+    查询仍经过 neo4j_governor，限流 / 指标 / 追踪与真实 Neo4j 路径一致
+    """
+
+    uri = "fake://in-memory"
+
+    def __init__(self, relations: Sequence[Tuple[str, str, str]], latency_ms: float = 0.0,
+                 per_row_ms: float = 0.0, limit: int = 15):
+        self.latency_ms = latency_ms
+        self.per_row_ms = per_row_ms
+        self.limit = limit
+        self.queries = 0
+        self._adjacency: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        for source, rel, target in relations:
+            # 查询模式是无向的 (s)-[r]-(t)，两端都要能查到
+            self._adjacency[source].append((rel, target))
+            self._adjacency[target].append((rel, source))
+
+    def _rows(self, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        names = parameters.get("names")
+        if names is None:
+            return [{"ok": 1}]
+        # per_name: 按实体分别限流 (CALL 子查询中的 LIMIT)；否则整个查询共用 limit
+        per_name = parameters.get("per_name")
+        rows = []
+        for name in names:
+            for rel, other in self._adjacency.get(name, ())[:per_name]:
+                rows.append({"source": name, "rel": rel, "target": other})
+                if per_name is None and len(rows) >= self.limit:
+                    return rows
+        return rows
+
+    def _delay(self, rows: int) -> float:
+        return (self.latency_ms + self.per_row_ms * rows) / 1000
+
+    def verify(self):
+        return None
+
+    def execute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        self.queries += 1
+        rows = self._rows(parameters or {})
+        delay = self._delay(len(rows))
+        if delay:
+            time.sleep(delay)
+        return rows
+
+    async def aexecute_query(self, query: str, parameters: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        self.queries += 1
+        async with neo4j_governor.slot():
+            rows = self._rows(parameters or {})
+            delay = self._delay(len(rows))
+            if delay:
+                await asyncio.sleep(delay)
+        return rows
+
+    def check_health(self) -> Dict[str, Any]:
+        return {"status": "healthy", "address": self.uri}
+
+    def close(self):
+        return None
+
+    async def aclose(self):
+        return None
+
+
+__all__ = ["FakeGraphStore"]
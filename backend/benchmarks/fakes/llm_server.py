@@ -0,0 +1,249 @@
+"""
+OpenAI 兼容的本地模拟服务 (/v1/chat/completions, /v1/embeddings)
+在后台线程中用 uvicorn 运行，应用代码通过 LLM_BASE_URL / EMBD_BASE_URL 指向它，
+请求走真实的 ChatOpenAI -> HTTP 客户端路径
+
+根据系统提示词识别调用类型，返回可被应用解析器接受的确定性结果:
+- extract / batch_extract: 按词表做最长匹配，返回 {"entities": [...]} / {"results": [...]}
+- validate: {"is_valid": true, ...}
+- generate: 固定长度的确定性回答
+延迟 = 基础延迟 + 每个输出 token 的延迟，再按请求内容哈希加入确定性抖动
+"""
+import asyncio
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from benchmarks.fakes.embedder import hash_embed
+
+# 各调用类型的默认延迟 (基础毫秒, 每个输出 token 的毫秒)
+DEFAULT_LATENCY: Dict[str, Tuple[float, float]] = {
+    "extract": (150.0, 1.0),
+    "batch_extract": (200.0, 1.0),
+    "validate": (250.0, 1.0),
+    "generate": (300.0, 4.0),
+    "embedding": (40.0, 0.0),
+}
+
+_QUERY_LINE = re.compile(r"查询语句：(.*)")
+_BATCH_LINE = re.compile(r"^\s*\[(\d+)\]\s*(.*)$", re.MULTILINE)
+
+
+def _fraction(text: str) -> float:
+    """文本 -> [0, 1) 的确定性小数 (用于抖动与故障注入)"""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little") / 2 ** 64
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+
+class MockLLMServer:
+    """
+    vocabulary: 实体词表 (抽取时在查询中做最长匹配)
+    latency: 覆盖 DEFAULT_LATENCY 中的项；scale 整体缩放所有延迟 (0 表示只测应用自身开销)
+    jitter: 抖动幅度 (相对值，0.2 表示 ±20%)
+    error_rate: 按请求哈希确定性地返回 429 的比例
+    """
+
+    def __init__(self, vocabulary: Iterable[str], dimensions: int,
+                 latency: Optional[Dict[str, Tuple[float, float]]] = None,
+                 scale: float = 1.0, jitter: float = 0.2, answer_tokens: int = 200,
+                 error_rate: float = 0.0):
+        # 长名优先，避免 "SpaceX" 中再匹配出 "X"
+        self.vocabulary = sorted(set(vocabulary), key=len, reverse=True)
+        self.dimensions = dimensions
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.scale = scale
+        self.jitter = jitter
+        self.answer_tokens = answer_tokens
+        self.error_rate = error_rate
+        self.calls: Dict[str, int] = {}
+        self.port: Optional[int] = None
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+        self.app = self._build_app()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+    # --- 内容生成 ---
+    def _match(self, text: str) -> List[str]:
+        found = []
+        for name in self.vocabulary:
+            if name in text:
+                found.append(name)
+                text = text.replace(name, "\0")
+        return found
+
+    @staticmethod
+    def _classify(system: str) -> str:
+        if "多条相互独立的查询" in system:
+            return "batch_extract"
+        if "信息提取助手" in system:
+            return "extract"
+        if "评分员" in system:
+            return "validate"
+        return "generate"
+
+    def _answer(self, question: str) -> str:
+        entities = self._match(question)
+        head = f"根据知识图谱，{'、'.join(entities) or '该问题'}的相关信息如下。"
+        seed = hashlib.blake2b(question.encode("utf-8"), digest_size=16).hexdigest()
+        body = ""
+        while len(head) + len(body) < self.answer_tokens * 2:
+            body += f"要点{seed[len(body) % 32]}：这是用于基准测试的确定性回答内容。"
+        return (head + body)[: self.answer_tokens * 2]
+
+    def _complete(self, kind: str, system: str, user: str) -> str:
+        if kind == "extract":
+            match = _QUERY_LINE.search(user)
+            return json.dumps({"entities": self._match(match.group(1) if match else user)}, ensure_ascii=False)
+        if kind == "batch_extract":
+            results = [
+                {"index": int(index), "entities": self._match(query)}
+                for index, query in _BATCH_LINE.findall(user)
+            ]
+            return json.dumps({"results": results}, ensure_ascii=False)
+        if kind == "validate":
+            return json.dumps({"is_valid": True, "reason": "模拟校验通过", "status": "valid"}, ensure_ascii=False)
+        return self._answer(user)
+
+    def _delay(self, kind: str, key: str, completion_tokens: int) -> float:
+        base_ms, per_token_ms = self.latency[kind]
+        spread = 1.0 + self.jitter * (2 * _fraction(key) - 1)
+        return max(0.0, (base_ms + per_token_ms * completion_tokens) * spread * self.scale / 1000)
+
+    # --- HTTP 接口 ---
+    def _build_app(self) -> FastAPI:
+        app = FastAPI()
+
+        @app.post("/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            messages = body.get("messages") or []
+            system = "\n".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+            user = str(next((m.get("content", "") for m in reversed(messages) if m.get("role") == "user"), ""))
+            kind = self._classify(system)
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+
+            key = system + user
+            if self.error_rate and _fraction("error:" + key) < self.error_rate:
+                return JSONResponse(status_code=429, content={"error": {"message": "rate limited (mock)", "type": "rate_limit"}})
+
+            content = self._complete(kind, system, user)
+            usage = {
+                "prompt_tokens": _tokens("".join(str(m.get("content", "")) for m in messages)),
+                "completion_tokens": _tokens(content),
+            }
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+            delay = self._delay(kind, key, usage["completion_tokens"])
+            model = body.get("model", "mock")
+
+            if body.get("stream"):
+                return StreamingResponse(
+                    self._stream(content, usage, model, delay, body.get("stream_options") or {}),
+                    media_type="text/event-stream",
+                )
+
+            await asyncio.sleep(delay)
+            return {
+                "id": f"chatcmpl-{hashlib.md5(key.encode('utf-8')).hexdigest()[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            }
+
+        @app.post("/v1/embeddings")
+        async def embeddings(request: Request):
+            body = await request.json()
+            inputs = body.get("input")
+            if isinstance(inputs, str) or (inputs and isinstance(inputs[0], int)):
+                inputs = [inputs]
+            self.calls["embedding"] = self.calls.get("embedding", 0) + 1
+            base_ms, per_item_ms = self.latency["embedding"]
+            await asyncio.sleep((base_ms + per_item_ms * len(inputs)) * self.scale / 1000)
+            data = [
+                {"object": "embedding", "index": i, "embedding": hash_embed(text if isinstance(text, str) else str(text), self.dimensions)}
+                for i, text in enumerate(inputs)
+            ]
+            tokens = sum(_tokens(str(t)) for t in inputs)
+            return {
+                "object": "list",
+                "data": data,
+                "model": body.get("model", "mock"),
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+
+        @app.get("/v1/models")
+        async def models():
+            return {"object": "list", "data": [{"id": "mock", "object": "model"}]}
+
+        return app
+
+    async def _stream(self, content: str, usage: Dict[str, int], model: str, delay: float,
+                      stream_options: Dict[str, Any]):
+        """把总延迟平摊到各个分片上 (首个分片承担一半，模拟首 token 延迟)"""
+        pieces = [content[i:i + 8] for i in range(0, len(content), 8)] or [""]
+        await asyncio.sleep(delay / 2)
+        step = delay / 2 / len(pieces)
+
+        def chunk(delta: Dict[str, Any], finish: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+            payload = {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+                **(extra or {}),
+            }
+            return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+        yield chunk({"role": "assistant", "content": ""})
+        for piece in pieces:
+            yield chunk({"content": piece})
+            await asyncio.sleep(step)
+        yield chunk({}, "stop")
+        if stream_options.get("include_usage"):
+            yield f"data: {json.dumps({'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'model': model, 'choices': [], 'usage': usage})}\n\n"
+        yield "data: [DONE]\n\n"
+
+    # --- 生命周期 ---
+    def start(self, timeout: float = 10.0) -> "MockLLMServer":
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, name="mock-llm-server", daemon=True)
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline or not self._thread.is_alive():
+                raise RuntimeError("模拟 LLM 服务启动失败")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+
+__all__ = ["MockLLMServer", "DEFAULT_LATENCY"]
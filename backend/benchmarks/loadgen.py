@@ -0,0 +1,407 @@
+"""
+SSE 感知的 HTTP 压测工具 (针对运行中的服务：/api/v1/chat 与 /api/v1/chat/stream)
+
+两种模式:
+  closed  固定并发：N 个虚拟用户，各自顺序执行会话 (上一条返回后才发下一条)
+  open    固定到达率：会话按 --rate (个/秒) 到达，不受服务响应速度影响；
+          延迟从 "计划发送时间" 开始计算，避免协调遗漏 (coordinated omission)
+会话: 同一会话的多轮查询共用一个 thread_id，按顺序发送 (可设置思考时间)
+
+流式接口会逐帧解析 SSE，记录:
+  ttfe        首个事件到达时间
+  retrieval_done / generation_done / validation_done  各节点事件到达时间
+  total       收到 [DONE] (或连接结束) 的时间
+
+输出 HDR 风格的分位数报告 (可用 --hgrm 写出 HdrHistogram 百分位文件)；
+--sweep 依次运行多个负载点，输出饱和曲线 (负载 -> 吞吐 / p50 / p99 / 错误率)
+
+用法 (在 backend 目录下):
+    python -m benchmarks.loadgen --mode closed --concurrency 8 --duration 60 --endpoint stream
+    python -m benchmarks.loadgen --mode open --rate 2 --duration 120 --corpus queries.jsonl --turns 3
+    python -m benchmarks.loadgen --mode open --sweep 0.5 1 2 4 8 --duration 60 --csv saturation.csv
+
+语料格式:
+  .txt    每行一条查询，空行分隔会话 (没有空行时按 --turns 条切分)
+  .jsonl  {"query": "...", "session": "可选的会话ID"}，同一 session 的行按出现顺序组成一个会话
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import random
+import sys
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+NODE_EVENTS = ("retrieval_done", "generation_done", "validation_done")
+# HDR 风格报告中的分位点
+REPORT_PERCENTILES = (50, 75, 90, 95, 99, 99.9, 99.99, 100)
+
+
+class RequestResult:
+    """一次请求的测量结果 (时间均为毫秒，相对计划发送时间)"""
+
+    __slots__ = ("endpoint", "status", "error", "total_ms", "ttfe_ms", "events", "lag_ms")
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.status: Optional[int] = None
+        self.error: Optional[str] = None
+        self.total_ms: Optional[float] = None
+        self.ttfe_ms: Optional[float] = None
+        self.events: Dict[str, float] = {}
+        # 实际发送比计划晚了多少 (开环模式下反映压测机自身是否跟得上)
+        self.lag_ms = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and self.status == 200
+
+
+# --- 语料 ---
+def load_corpus(path: Optional[str], turns: int) -> List[List[str]]:
+    """读取语料，返回会话列表 (每个会话是按顺序发送的查询列表)"""
+    if path is None:
+        from benchmarks.fakes.dataset import BenchDataset
+        queries = BenchDataset(entity_count=0, query_count=400).queries
+        return [queries[i:i + turns] for i in range(0, len(queries), turns)]
+
+    text = Path(path).read_text(encoding="utf-8")
+    if path.endswith(".jsonl"):
+        sessions: Dict[str, List[str]] = {}
+        for i, line in enumerate(l for l in text.splitlines() if l.strip()):
+            row = json.loads(line)
+            key = str(row.get("session") or f"_{i // turns}")
+            sessions.setdefault(key, []).append(row["query"])
+        return list(sessions.values())
+
+    blocks = [[q.strip() for q in block.splitlines() if q.strip()] for block in text.split("\n\n")]
+    blocks = [b for b in blocks if b]
+    if len(blocks) == 1:
+        flat = blocks[0]
+        return [flat[i:i + turns] for i in range(0, len(flat), turns)]
+    return blocks
+
+
+class SessionSource:
+    """按固定种子打乱后循环发放会话，同一种子下顺序可复现"""
+
+    def __init__(self, sessions: List[List[str]], seed: int, shuffle: bool):
+        self.sessions = list(sessions)
+        if shuffle:
+            random.Random(seed).shuffle(self.sessions)
+        self.run_id = uuid.uuid4().hex[:8]
+        self._next = 0
+
+    def take(self):
+        index = self._next
+        self._next += 1
+        queries = self.sessions[index % len(self.sessions)]
+        return f"loadgen-{self.run_id}-{index}", queries
+
+
+# --- 请求 ---
+async def send_chat(client: httpx.AsyncClient, endpoint: str, query: str, thread_id: str,
+                    scheduled: float) -> RequestResult:
+    """发送一次对话请求；scheduled 为计划发送时间 (perf_counter)"""
+    result = RequestResult(endpoint)
+    result.lag_ms = (time.perf_counter() - scheduled) * 1000
+    body = {"query": query, "thread_id": thread_id}
+
+    def elapsed() -> float:
+        return (time.perf_counter() - scheduled) * 1000
+
+    try:
+        if endpoint == "chat":
+            response = await client.post("/api/v1/chat", json=body)
+            result.status = response.status_code
+            result.ttfe_ms = result.total_ms = elapsed()
+            if response.status_code != 200:
+                result.error = f"http_{response.status_code}"
+            return result
+
+        async with client.stream("POST", "/api/v1/chat/stream", json={**body, "stream": True}) as response:
+            result.status = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                result.error = f"http_{response.status_code}"
+                result.total_ms = elapsed()
+                return result
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                now = elapsed()
+                if result.ttfe_ms is None:
+                    result.ttfe_ms = now
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                try:
+                    payload = json.loads(data)
+                except ValueError:
+                    continue
+                if payload.get("type") == "error":
+                    result.error = "stream_error"
+                status = payload.get("status")
+                if status in NODE_EVENTS:
+                    result.events[status] = now
+            result.total_ms = elapsed()
+    except httpx.HTTPError as e:
+        result.error = type(e).__name__
+        result.total_ms = elapsed()
+    return result
+
+
+async def _run_session(client, endpoint: str, thread_id: str, queries: List[str], think_ms: float,
+                       scheduled: float, results: List[RequestResult], stop_at: float):
+    """顺序执行一个会话；第一轮按计划时间计时，后续轮次从上一轮结束 (加思考时间) 起计"""
+    for turn, query in enumerate(queries):
+        if turn:
+            if think_ms:
+                await asyncio.sleep(think_ms / 1000)
+            if time.perf_counter() >= stop_at:
+                return
+            scheduled = time.perf_counter()
+        results.append(await send_chat(client, endpoint, query, thread_id, scheduled))
+
+
+async def run_closed(client, source: SessionSource, endpoint: str, concurrency: int, duration: float,
+                     think_ms: float) -> List[RequestResult]:
+    results: List[RequestResult] = []
+    stop_at = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < stop_at:
+            thread_id, queries = source.take()
+            await _run_session(client, endpoint, thread_id, queries, think_ms, time.perf_counter(), results, stop_at)
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results
+
+
+async def run_open(client, source: SessionSource, endpoint: str, rate: float, duration: float,
+                   think_ms: float, arrival: str, seed: int, max_inflight: int) -> List[RequestResult]:
+    """会话按 rate 到达 (poisson: 指数间隔；uniform: 固定间隔)，到达时间与响应无关"""
+    results: List[RequestResult] = []
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    stop_at = start + duration
+    tasks = set()
+    dropped = 0
+    next_at = start
+
+    while next_at < stop_at:
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(tasks) >= max_inflight:
+            # 压测机侧的保护：积压过多时放弃该次到达并计为错误
+            dropped += 1
+            dropped_result = RequestResult(endpoint)
+            dropped_result.error = "client_overloaded"
+            results.append(dropped_result)
+        else:
+            thread_id, queries = source.take()
+            task = asyncio.create_task(_run_session(client, endpoint, thread_id, queries, think_ms, next_at, results, stop_at))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        next_at += rng.expovariate(rate) if arrival == "poisson" else 1.0 / rate
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    if dropped:
+        print(f"⚠️ 压测机并发达到上限 {max_inflight}，丢弃了 {dropped} 次到达", file=sys.stderr)
+    return results
+
+
+# --- 报告 ---
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def _distribution(values: List[float]) -> Dict[str, float]:
+    values = sorted(values)
+    out = {"count": len(values)}
+    for p in REPORT_PERCENTILES:
+        label = "max" if p == 100 else f"p{p:g}"
+        out[label] = round(_percentile(values, p), 1)
+    out["mean"] = round(sum(values) / len(values), 1) if values else 0.0
+    return out
+
+
+def summarize(results: List[RequestResult], wall_s: float, offered: Optional[float] = None) -> Dict[str, Any]:
+    ok = [r for r in results if r.ok]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r.ok:
+            errors[r.error or f"http_{r.status}"] = errors.get(r.error or f"http_{r.status}", 0) + 1
+    metrics = {
+        "total": _distribution([r.total_ms for r in ok if r.total_ms is not None]),
+        "ttfe": _distribution([r.ttfe_ms for r in ok if r.ttfe_ms is not None]),
+    }
+    for event in NODE_EVENTS:
+        values = [r.events[event] for r in ok if event in r.events]
+        if values:
+            metrics[event] = _distribution(values)
+    lags = sorted(r.lag_ms for r in results)
+    return {
+        "offered": offered,
+        "requests": len(results),
+        "succeeded": len(ok),
+        "throughput_rps": round(len(ok) / wall_s, 3) if wall_s else 0.0,
+        "error_rate": round(1 - len(ok) / len(results), 4) if results else 0.0,
+        "errors": errors,
+        "send_lag_p99_ms": round(_percentile(lags, 99), 1),
+        "latency_ms": metrics,
+    }
+
+
+def print_report(summary: Dict[str, Any]):
+    print(f"\n📊 请求 {summary['requests']} | 成功 {summary['succeeded']} | "
+          f"吞吐 {summary['throughput_rps']} req/s | 错误率 {summary['error_rate']:.2%} {summary['errors'] or ''}")
+    columns = [("p50" if p == 50 else "max" if p == 100 else f"p{p:g}") for p in REPORT_PERCENTILES]
+    print(f"   {'(ms)':<17}" + "".join(f"{c:>10}" for c in columns) + f"{'count':>8}")
+    for name, dist in summary["latency_ms"].items():
+        if not dist["count"]:
+            continue
+        print(f"   {name:<17}" + "".join(f"{dist[c]:>10}" for c in columns) + f"{dist['count']:>8}")
+    if summary["send_lag_p99_ms"] > 50:
+        print(f"⚠️ 发送延后 p99={summary['send_lag_p99_ms']}ms，压测机可能跟不上计划到达率")
+
+
+def write_hgrm(values: List[float], path: str, ticks_per_half: int = 5):
+    """
+    以 HdrHistogram 百分位输出格式写出 (可直接用 HdrHistogram 的在线绘图工具对比)
+    列: Value(ms) Percentile TotalCount 1/(1-Percentile)
+    """
+    values = sorted(values)
+    n = len(values)
+    lines = [f"{'Value':>12} {'Percentile':>14} {'TotalCount':>10} {'1/(1-Percentile)':>14}", ""]
+    percentile, half = 0.0, 0.5
+    while n:
+        # 每一个 "剩余一半" 区间内取 ticks_per_half 个点，越接近尾部越密
+        for _ in range(ticks_per_half):
+            index = min(n - 1, int(percentile * n))
+            inverse = f"{1 / (1 - percentile):14.2f}" if percentile < 1 else ""
+            lines.append(f"{values[index]:12.3f} {percentile:14.12f} {index + 1:10d} {inverse}")
+            percentile += half / ticks_per_half
+        half /= 2
+        if n * half < 1:
+            break
+    lines.append(f"{values[-1]:12.3f} {1.0:14.12f} {n:10d}" if n else "")
+    lines.append(f"#[Mean    = {sum(values) / n if n else 0:12.3f}]")
+    lines.append(f"#[Max     = {values[-1] if n else 0:12.3f}, Total count    = {n:12d}]")
+    Path(path).write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+def find_knee(curve: List[Dict[str, Any]]) -> Optional[float]:
+    """饱和点：第一个 p99 超过最低负载点 2 倍，或吞吐不足负载 90% (开环) 的负载点"""
+    if not curve:
+        return None
+    base = curve[0]["latency_ms"]["total"]["p99"] or None
+    for point in curve[1:]:
+        p99 = point["latency_ms"]["total"]["p99"]
+        starved = point["mode"] == "open" and point["throughput_rps"] < 0.9 * point["offered_rps"]
+        if (base and p99 > 2 * base) or starved or point["error_rate"] > 0.01:
+            return point["offered"]
+    return None
+
+
+# --- 入口 ---
+async def run_point(args, source: SessionSource, load: float) -> Dict[str, Any]:
+    timeout = httpx.Timeout(args.timeout, connect=10.0)
+    limits = httpx.Limits(max_connections=args.max_inflight, max_keepalive_connections=args.max_inflight)
+    headers = {"X-Tenant-ID": args.tenant} if args.tenant else None
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout, limits=limits, headers=headers) as client:
+        start = time.perf_counter()
+        if args.mode == "closed":
+            results = await run_closed(client, source, args.endpoint, int(load), args.duration, args.think_ms)
+        else:
+            results = await run_open(client, source, args.endpoint, load, args.duration, args.think_ms,
+                                     args.arrival, args.seed, args.max_inflight)
+        wall = time.perf_counter() - start
+
+    summary = summarize(results, wall, offered=load)
+    summary["mode"] = args.mode
+    # 开环模式下的请求到达率 = 会话到达率 x 平均轮数
+    turns = sum(len(s) for s in source.sessions) / len(source.sessions)
+    summary["offered_rps"] = round(load * turns, 3) if args.mode == "open" else None
+    summary["_raw"] = results
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE 感知的 HTTP 压测工具")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="服务地址")
+    parser.add_argument("--endpoint", choices=["chat", "stream"], default="stream")
+    parser.add_argument("--mode", choices=["closed", "open"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4, help="closed: 虚拟用户数")
+    parser.add_argument("--rate", type=float, default=1.0, help="open: 会话到达率 (个/秒)")
+    parser.add_argument("--arrival", choices=["poisson", "uniform"], default="poisson", help="open: 到达间隔分布")
+    parser.add_argument("--sweep", type=float, nargs="+", help="饱和曲线：依次运行的并发度 (closed) 或到达率 (open)")
+    parser.add_argument("--duration", type=float, default=60, help="每个负载点的持续时间 (秒)")
+    parser.add_argument("--corpus", help="查询语料 (.txt / .jsonl)，默认使用内置的基准查询")
+    parser.add_argument("--turns", type=int, default=1, help="未分组语料中每个会话的轮数")
+    parser.add_argument("--think-ms", type=float, default=0, help="同一会话两轮之间的思考时间")
+    parser.add_argument("--seed", type=int, default=42, help="语料顺序与到达间隔的随机种子")
+    parser.add_argument("--no-shuffle", action="store_true", help="按语料原始顺序发放会话")
+    parser.add_argument("--tenant", help="X-Tenant-ID 请求头")
+    parser.add_argument("--timeout", type=float, default=120, help="单个请求超时 (秒)")
+    parser.add_argument("--max-inflight", type=int, default=512, help="压测机最大并发连接数")
+    parser.add_argument("--hgrm", help="把 total 延迟分布写成 HdrHistogram 百分位文件 (sweep 时按负载点加后缀)")
+    parser.add_argument("--json", help="把报告写入 JSON 文件")
+    parser.add_argument("--csv", help="把饱和曲线写入 CSV 文件")
+    args = parser.parse_args()
+
+    sessions = load_corpus(args.corpus, max(1, args.turns))
+    if not sessions:
+        parser.error("语料为空")
+    points = args.sweep or [args.concurrency if args.mode == "closed" else args.rate]
+
+    curve = []
+    for load in points:
+        source = SessionSource(sessions, args.seed, shuffle=not args.no_shuffle)
+        label = f"并发 {int(load)}" if args.mode == "closed" else f"到达率 {load}/s"
+        print(f"\n🚀 {args.mode} | {args.endpoint} | {label} | {args.duration:g}s")
+        summary = asyncio.run(run_point(args, source, load))
+        raw = summary.pop("_raw")
+        print_report(summary)
+        if args.hgrm:
+            path = args.hgrm if len(points) == 1 else f"{Path(args.hgrm).with_suffix('')}-{load:g}.hgrm"
+            write_hgrm([r.total_ms for r in raw if r.ok and r.total_ms is not None], path)
+        curve.append(summary)
+
+    if len(curve) > 1:
+        print(f"\n📈 饱和曲线 ({args.mode})")
+        print(f"   {'负载':>8}{'吞吐 req/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'ttfe p99':>10}{'错误率':>8}")
+        for point in curve:
+            total, ttfe = point["latency_ms"]["total"], point["latency_ms"]["ttfe"]
+            print(f"   {point['offered']:>8g}{point['throughput_rps']:>12}{total['p50']:>10}"
+                  f"{total['p99']:>10}{ttfe['p99']:>10}{point['error_rate']:>8.2%}")
+        knee = find_knee(curve)
+        print(f"   饱和点: {knee:g}" if knee is not None else "   未观察到饱和")
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["mode", "offered", "throughput_rps", "error_rate",
+                             "p50_ms", "p90_ms", "p99_ms", "ttfe_p50_ms", "ttfe_p99_ms"])
+            for point in curve:
+                total, ttfe = point["latency_ms"]["total"], point["latency_ms"]["ttfe"]
+                writer.writerow([point["mode"], point["offered"], point["throughput_rps"], point["error_rate"],
+                                 total["p50"], total["p90"], total["p99"], ttfe["p50"], ttfe["p99"]])
+    if args.json:
+        Path(args.json).write_text(json.dumps({"args": vars(args), "points": curve}, ensure_ascii=False, indent=2),
+                                   encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()